@@ -0,0 +1,119 @@
+"""Count the objects allocated when a closing trade sweeps many lots"""
+
+from decimal import Decimal
+import sys
+import timeit
+from typing import Callable
+
+from jetblack_pnl.core import (
+    SplitTrade,
+    TradingPnl,
+    add_trade,
+    add_trades,
+)
+from jetblack_pnl.impl.simple import (
+    MatchedPool,
+    Security,
+    Trade,
+    UnmatchedPool,
+)
+
+
+class PopOnlyFifo:
+    """A FIFO pool without consume, peek or reduce, so the algorithm falls
+    back to pop and insert."""
+
+    def __init__(self) -> None:
+        self._pool = UnmatchedPool.Fifo()
+
+    def append(self, opening, context):
+        self._pool.append(opening, context)
+
+    def insert(self, opening, context):
+        self._pool.insert(opening, context)
+
+    def pop(self, closing, context):
+        return self._pool.pop(closing, context)
+
+    def has(self, closing, context):
+        return self._pool.has(closing, context)
+
+    def pool(self, context):
+        return self._pool.pool(context)
+
+
+class ReduceOnlyFifo(PopOnlyFifo):
+    """A FIFO pool with peek and reduce, but without consume."""
+
+    def peek(self, closing, context):
+        return self._pool.peek(closing, context)
+
+    def reduce(self, quantity, closing, context):
+        self._pool.reduce(quantity, closing, context)
+
+
+def count_allocations(func: Callable[[], object]) -> dict[str, int]:
+    """Count the split trades and P/L objects created by a function"""
+    counts = {'SplitTrade': 0, 'TradingPnl': 0}
+    split_trade_code = SplitTrade.__init__.__code__
+    trading_pnl_code = TradingPnl.__new__.__code__
+
+    def profile(frame, event, _arg):
+        if event == 'call':
+            if frame.f_code is split_trade_code:
+                counts['SplitTrade'] += 1
+            elif frame.f_code is trading_pnl_code:
+                counts['TradingPnl'] += 1
+
+    sys.setprofile(profile)
+    try:
+        func()
+    finally:
+        sys.setprofile(None)
+    return counts
+
+
+def make_position(lots: int, pool_factory: Callable[[], object]):
+    security = Security("AAPL", 1, False)
+    unmatched = pool_factory()
+    matched = MatchedPool()
+    pnl = add_trades(
+        TradingPnl(Decimal(0), Decimal(0), Decimal(0)),
+        [Trade(1, 100 + i % 7, i) for i in range(lots)],
+        security,
+        unmatched,  # type: ignore
+        matched,
+        None
+    )
+    return pnl, security, unmatched, matched
+
+
+def sweep(lots: int, pool_factory: Callable[[], object]) -> Callable[[], TradingPnl]:
+    pnl, security, unmatched, matched = make_position(lots, pool_factory)
+    sell = Trade(Decimal("0.5") - lots, 105, lots)
+    return lambda: add_trade(pnl, sell, security, unmatched, matched, None)  # type: ignore
+
+
+def main() -> None:
+    lots = 500
+    print(f"one sell sweeping {lots} lots")
+    print(f"SplitTrade size: {sys.getsizeof(SplitTrade(Decimal(1), None))} bytes, "
+          f"has __dict__: {hasattr(SplitTrade(Decimal(1), None), '__dict__')}")
+    for name, factory in (
+        ('pop/insert', PopOnlyFifo),
+        ('in place', ReduceOnlyFifo),
+        ('consume', UnmatchedPool.Fifo),
+    ):
+        counts = count_allocations(sweep(lots, factory))
+        elapsed = min(
+            timeit.timeit(sweep(lots, factory), number=1)
+            for _ in range(5)
+        )
+        print(
+            f"{name:>10}: SplitTrade={counts['SplitTrade']:>4} "
+            f"TradingPnl={counts['TradingPnl']:>4} time={elapsed * 1000:.2f}ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
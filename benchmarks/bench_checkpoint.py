@@ -0,0 +1,83 @@
+"""Compare replaying a trade history with restoring a checkpoint"""
+
+from io import BytesIO
+import os
+import random
+import sys
+import tempfile
+import time
+
+from jetblack_pnl.core import NullMatchedPool
+from jetblack_pnl.impl.simple import (
+    Book,
+    LazyPnlBookStore,
+    Security,
+    SimplePnlBook,
+    Trade,
+    UnmatchedPool,
+    load_checkpoint,
+    save_checkpoint,
+)
+
+
+def make_trades(count: int, positions: int) -> list[tuple[Security, Book, Trade]]:
+    rng = random.Random(42)
+    securities = [Security(f"SEC{i}", 1, False) for i in range(positions // 10)]
+    books = [Book(f"BOOK{i}") for i in range(10)]
+    return [
+        (
+            rng.choice(securities),
+            rng.choice(books),
+            Trade(
+                rng.choice((-1, 1)) * rng.randint(1, 100),
+                f"{rng.randint(9000, 11000) / 100}",
+                i
+            )
+        )
+        for i in range(count)
+    ]
+
+
+def replay(trades: list[tuple[Security, Book, Trade]]) -> SimplePnlBook:
+    pnl_book = SimplePnlBook(
+        lambda security, book, context: NullMatchedPool(),
+        lambda security, book, context: UnmatchedPool.DequeFifo()
+    )
+    for security, book, trade in trades:
+        pnl_book.add_trade(security, book, trade, None)
+    return pnl_book
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    trades = make_trades(count, 10_000)
+
+    start = time.perf_counter()
+    pnl_book = replay(trades)
+    print(f"replay {count} trades: {time.perf_counter() - start:6.2f}s")
+
+    file = BytesIO()
+    start = time.perf_counter()
+    save_checkpoint(pnl_book.store, file)  # type: ignore
+    print(
+        f"save checkpoint:    {time.perf_counter() - start:6.2f}s "
+        f"{len(file.getvalue()) / 2 ** 20:6.1f} MiB"
+    )
+
+    file.seek(0)
+    start = time.perf_counter()
+    load_checkpoint(file)
+    print(f"load checkpoint:    {time.perf_counter() - start:6.2f}s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'book.ckpt')
+        with open(path, 'wb') as output:
+            output.write(file.getvalue())
+        start = time.perf_counter()
+        store = LazyPnlBookStore(path)
+        print(f"open lazily:        {time.perf_counter() - start:6.2f}s")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Compare the memory held by a large FIFO pool in objects and in columns
+
+Both pools keep the trades, which are included in the measurement. The
+columnar pool saves the split trade and decimal remaining quantity of each
+lot.
+"""
+
+from decimal import Decimal
+import sys
+import time
+import tracemalloc
+
+from jetblack_pnl.core import SplitTrade
+from jetblack_pnl.impl.simple import Trade, UnmatchedPool
+
+
+def make_lots(count: int) -> list[SplitTrade[Trade]]:
+    return [
+        SplitTrade(
+            Decimal(100 + i % 50),
+            Trade(100 + i % 50, f"{100 + i % 97}.25", i)
+        )
+        for i in range(count)
+    ]
+
+
+def measure(name: str, count: int, build) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    pool = build(count)
+    elapsed = time.perf_counter() - start
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:>12}: {len(pool):>9} lots {size / 2 ** 20:8.1f} MiB "
+        f"{size / count:6.0f} bytes/lot {elapsed:6.2f}s"
+    )
+
+
+def build_fifo(count: int) -> UnmatchedPool.Fifo:
+    unmatched = UnmatchedPool.Fifo()
+    for opening in make_lots(count):
+        unmatched.append(opening, None)
+    return unmatched
+
+
+def build_columnar(count: int) -> UnmatchedPool.ColumnarFifo:
+    unmatched = UnmatchedPool.ColumnarFifo()
+    for opening in make_lots(count):
+        unmatched.append(opening, None)
+    return unmatched
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    measure('Fifo', count, build_fifo)
+    measure('ColumnarFifo', count, build_columnar)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Compare a global lock with striped locks as the thread count grows
+
+The store sleeps briefly on each read and write, standing in for a store
+which releases the GIL during I/O, such as the sqlite implementations.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import time
+
+from jetblack_pnl.core import ConcurrentPnlBook, PnlBook
+from jetblack_pnl.impl.simple import (
+    Book,
+    MatchedPool,
+    PnlBookStore,
+    Security,
+    Trade,
+    UnmatchedPool,
+)
+
+IO_DELAY = 0.0002
+
+
+class IOBoundPnlBookStore(PnlBookStore):
+
+    def get(self, security, book, context):
+        time.sleep(IO_DELAY)
+        return super().get(security, book, context)
+
+    def set(self, security, book, trade, pnl, unmatched, matched, context):
+        time.sleep(IO_DELAY)
+        super().set(security, book, trade, pnl, unmatched, matched, context)
+
+
+class GlobalLockPnlBook(PnlBook):
+    """The book behind a single lock"""
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self._global_lock = Lock()
+
+    def add_trade(self, security, book, trade, context):
+        with self._global_lock:
+            return super().add_trade(security, book, trade, context)
+
+
+def run(book_type, threads: int, trades_per_thread: int) -> float:
+    pnl_book = book_type(
+        IOBoundPnlBookStore(),
+        lambda security, book, context: MatchedPool(),
+        lambda security, book, context: UnmatchedPool.Fifo()
+    )
+    tech = Book('tech')
+
+    def work(index: int) -> None:
+        security = Security(f"SEC{index}", 1, False)
+        for i in range(trades_per_thread):
+            pnl_book.add_trade(security, tech, Trade(1 if i % 2 else -1, 100), None)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(work, range(threads)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    trades_per_thread = 200
+    for threads in (1, 2, 4, 8, 16):
+        global_lock = run(GlobalLockPnlBook, threads, trades_per_thread)
+        striped = run(ConcurrentPnlBook, threads, trades_per_thread)
+        total = threads * trades_per_thread
+        print(
+            f"{threads:>3} threads: global lock {total / global_lock:8.0f} trades/s, "
+            f"striped {total / striped:8.0f} trades/s"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Compare replaying a tape in one process and in a process pool"""
+
+import os
+import random
+import sys
+import time
+
+from jetblack_pnl.core import replay_parallel
+from jetblack_pnl.impl.simple import (
+    Book,
+    PnlBookStore,
+    Security,
+    SimplePnlBook,
+    Trade,
+)
+
+
+def make_tape(count: int) -> list[tuple[Security, Book, Trade]]:
+    rng = random.Random(0)
+    securities = [Security(f"SEC{i}", 1, False) for i in range(200)]
+    books = [Book(f"BOOK{i}") for i in range(10)]
+    return [
+        (
+            rng.choice(securities),
+            rng.choice(books),
+            Trade(rng.choice([-1, 1]) * rng.randint(1, 5), rng.randint(90, 110), key)
+        )
+        for key in range(count)
+    ]
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    tape = make_tape(count)
+
+    start = time.perf_counter()
+    pnl_book = SimplePnlBook()
+    for security, book, trade in tape:
+        pnl_book.add_trade(security, book, trade, None)
+    serial = time.perf_counter() - start
+    print(f"serial: {serial:.2f}s")
+
+    for partitions in sorted({2, 4, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        replay_parallel(SimplePnlBook, tape, PnlBookStore(), None, partitions)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{partitions:>3} partitions: {elapsed:.2f}s "
+            f"speedup={serial / elapsed:.1f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark scaled integer arithmetic against decimal arithmetic"""
+
+from decimal import Decimal
+import random
+import timeit
+
+from jetblack_pnl.core import (
+    ScaledPnl,
+    ScaledSecurity,
+    ScaledTrade,
+    TradingPnl,
+    add_scaled_trades,
+    add_trades,
+)
+from jetblack_pnl.impl.simple import (
+    MatchedPool,
+    Security,
+    Trade,
+    UnmatchedPool,
+)
+
+
+class ListMatchedPool(MatchedPool):
+    """A matched pool which appends in place, so the benchmark measures the
+    arithmetic rather than copying the pool."""
+
+    def __init__(self) -> None:
+        super().__init__([])
+
+    def append(self, closing_quantity, opening_trade, closing_trade, context):
+        self._pool.append(  # type: ignore
+            (closing_quantity, opening_trade, closing_trade)
+        )
+
+
+def make_trades(count: int, seed: int = 42) -> list[Trade]:
+    rng = random.Random(seed)
+    return [
+        Trade(
+            Decimal(rng.randint(-500, 500)).scaleb(-2),
+            Decimal(rng.randint(9_000_000, 11_000_000)).scaleb(-4),
+            i
+        )
+        for i in range(count)
+    ]
+
+
+def run_decimal(security: Security, trades: list[Trade]) -> TradingPnl:
+    return add_trades(
+        TradingPnl(Decimal(0), Decimal(0), Decimal(0)),
+        trades,
+        security,
+        UnmatchedPool.Fifo(),
+        ListMatchedPool(),
+        None
+    )
+
+
+def run_scaled(
+        scaled_security: ScaledSecurity,
+        trades: list[ScaledTrade[Trade]]
+) -> TradingPnl:
+    pnl = add_scaled_trades(
+        ScaledPnl(0, 0, 0),
+        trades,
+        scaled_security,
+        UnmatchedPool.Fifo(),
+        ListMatchedPool(),
+        None
+    )
+    return scaled_security.unscale_pnl(pnl)
+
+
+def main() -> None:
+    security = Security("AAPL", 100, False, price_scale=4, quantity_scale=2)
+    trades = make_trades(20_000)
+
+    scaled_security = ScaledSecurity(security)
+    scaled_trades = [scaled_security.scale_trade(trade) for trade in trades]
+
+    assert run_decimal(security, trades) == run_scaled(
+        scaled_security,
+        scaled_trades
+    )
+
+    decimal_time = min(timeit.repeat(
+        lambda: run_decimal(security, trades), number=1, repeat=5))
+    scaled_time = min(timeit.repeat(
+        lambda: run_scaled(scaled_security, scaled_trades), number=1, repeat=5))
+    conversion_time = min(timeit.repeat(
+        lambda: [scaled_security.scale_trade(trade) for trade in trades],
+        number=1,
+        repeat=5
+    ))
+
+    print(f"trades:     {len(trades)}")
+    print(f"decimal:    {decimal_time:.3f}s")
+    print(f"scaled:     {scaled_time:.3f}s")
+    print(f"speedup:    {decimal_time / scaled_time:.2f}x")
+    print(f"conversion: {conversion_time:.3f}s (once, on ingestion)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,35 +1,102 @@
 """Core P/L"""
 
-from .algorithm import add_trade
+from .algorithm import add_counted_trade, add_trade, add_trades, iter_add_trades
+from .async_pnl_book import AsyncPnlBook
+from .average_cost import AverageCostPool, add_average_cost_trade
 from .book import IBook
-from .matched_pool import IMatchedPool
+from .concurrent_pnl_book import ConcurrentPnlBook
+from .instrumentation import (
+    BookMetrics,
+    MetricsCollector,
+    TradeMetrics,
+    instrumented_add_trade,
+)
+from .matched_pool import IMatchedPool, NullMatchedPool, SummaryMatchedPool
+from .parallel_replay import replay_parallel
 from .pnl_book import PnlBook
 from .pnl_book_store import IPnlBookStore
+from .scaled import (
+    IScaledSecurity,
+    ScaledPnl,
+    ScaledSecurity,
+    ScaledTrade,
+    add_scaled_trade,
+    add_scaled_trades,
+    from_scaled,
+    iter_add_scaled_trades,
+    to_scaled,
+)
 from .security import ISecurity
 from .split_trade import SplitTrade
+from .subscriptions import PnlChange, PnlPublisher, Subscription
 from .trade import ITrade
 from .trading_pnl import PnlStrip, TradingPnl
-from .unmatched_pool import IUnmatchedPool
+from .unmatched_pool import (
+    IUnmatchedPool,
+    IConsumableUnmatchedPool,
+    IReducibleUnmatchedPool,
+    ISnapshotUnmatchedPool,
+)
+from .what_if import WhatIf, snapshot_unmatched_pool, what_if_trades
 
 __all__ = [
+    'add_counted_trade',
     'add_trade',
+    'add_trades',
+    'iter_add_trades',
+
+    'AsyncPnlBook',
+
+    'AverageCostPool',
+    'add_average_cost_trade',
 
     'IBook',
 
+    'ConcurrentPnlBook',
+
+    'BookMetrics',
+    'MetricsCollector',
+    'TradeMetrics',
+    'instrumented_add_trade',
+
     'IMatchedPool',
+    'NullMatchedPool',
+    'SummaryMatchedPool',
 
     'PnlBook',
+    'replay_parallel',
     'IPnlBookStore',
 
     'PnlStrip',
 
+    'IScaledSecurity',
+    'ScaledPnl',
+    'ScaledSecurity',
+    'ScaledTrade',
+    'add_scaled_trade',
+    'add_scaled_trades',
+    'from_scaled',
+    'iter_add_scaled_trades',
+    'to_scaled',
+
     'ISecurity',
 
     'SplitTrade',
 
+    'PnlChange',
+    'PnlPublisher',
+    'Subscription',
+
     'ITrade',
 
     'TradingPnl',
 
     'IUnmatchedPool',
+    'IConsumableUnmatchedPool',
+    'IReducibleUnmatchedPool',
+    'ISnapshotUnmatchedPool',
+
+    'WhatIf',
+    'snapshot_unmatched_pool',
+    'what_if_trades',
 ]
@@ -36,13 +36,45 @@ match.
 """
 
 from decimal import Decimal
+from typing import Iterable, Iterator, cast
 
-from .matched_pool import IMatchedPool
+from .average_cost import AverageCostPool, add_average_cost_trade
+from .matched_pool import IMatchedPool, NullMatchedPool
 from .security import ISecurity
 from .split_trade import SplitTrade
 from .trade import ITrade
 from .trading_pnl import TradingPnl
-from .unmatched_pool import IUnmatchedPool
+from .unmatched_pool import (
+    IUnmatchedPool,
+    IConsumableUnmatchedPool,
+    IReducibleUnmatchedPool,
+)
+
+
+_CAPABILITIES: dict[type, tuple[bool, bool]] = {}
+
+
+def _capabilities(unmatched: IUnmatchedPool) -> tuple[bool, bool]:
+    """Find whether a pool can consume and reduce opening trades.
+
+    The pool interfaces are protocols, and checking a protocol inspects each
+    of its members, so the result is kept for each type of pool.
+
+    Args:
+        unmatched (IUnmatchedPool): The pool of unmatched trades.
+
+    Returns:
+        tuple[bool, bool]: Whether the pool is consumable, and whether it is
+            reducible.
+    """
+    kind = type(unmatched)
+    capabilities = _CAPABILITIES.get(kind)
+    if capabilities is None:
+        capabilities = _CAPABILITIES[kind] = (
+            isinstance(unmatched, IConsumableUnmatchedPool),
+            isinstance(unmatched, IReducibleUnmatchedPool),
+        )
+    return capabilities
 
 
 def _extend_position[TradeT: ITrade, SecurityT: ISecurity, ContextT](
@@ -83,129 +115,145 @@ def _extend_position[TradeT: ITrade, SecurityT: ISecurity, ContextT](
     )
 
 
-def _find_opening_trade[TradeT: ITrade, ContextT](
-        closing_trade: SplitTrade[TradeT],
-        unmatched: IUnmatchedPool[TradeT, ContextT],
-        context: ContextT
-) -> tuple[SplitTrade[TradeT], SplitTrade[TradeT], SplitTrade[TradeT] | None]:
-    # Select an opening trade.
-    opening_trade = unmatched.pop(closing_trade, context)
-
-    if abs(closing_trade.remaining_quantity) > abs(opening_trade.remaining_quantity):
-
-        # The closing trade is larger than the opening trade.
-        # Split the closing trade into two: one of the same size as the opening
-        # trade, and a second with the unmatched quantity.
-
-        matched_opening_trade = opening_trade
-        matched_closing_trade = SplitTrade(
-            -opening_trade.remaining_quantity,
-            closing_trade.trade,
-        )
-        unmatched_closing_trade = SplitTrade(
-            closing_trade.remaining_quantity - -opening_trade.remaining_quantity,
-            closing_trade.trade,
-        )
-
-    elif abs(closing_trade.remaining_quantity) < abs(opening_trade.remaining_quantity):
-
-        # The closing trade is smaller than the opening trade.
-        # Split the opening trade into two: one of the same size as the closing
-        # trade, and the second with the unmatched quantity. Return the unmatched
-        # opening trade to the pool.
-
-        matched_opening_trade = SplitTrade(
-            -closing_trade.remaining_quantity,
-            opening_trade.trade,
-        )
-        matched_closing_trade = closing_trade
-        unmatched_opening_trade = SplitTrade(
-            opening_trade.remaining_quantity + closing_trade.remaining_quantity,
-            opening_trade.trade,
-        )
-        unmatched.insert(unmatched_opening_trade, context)
-
-        # As the entire closing trade has been filled there is no unmatched.
-        unmatched_closing_trade = None
-
-    else:
-
-        # The closing trade quantity matches the opening trade quantity exactly.
-        matched_opening_trade = opening_trade
-        matched_closing_trade = closing_trade
-        unmatched_closing_trade = None
-
-    return matched_closing_trade, matched_opening_trade, unmatched_closing_trade
-
-
-def _match[TradeT: ITrade, SecurityT: ISecurity, ContextT](
+def _reduce_position[TradeT: ITrade, SecurityT: ISecurity, ContextT](
         pnl: TradingPnl,
-        closing_trade: SplitTrade[TradeT],
-        sec: ISecurity[SecurityT],
+        closing: SplitTrade[TradeT],
+        sec: SecurityT,
         unmatched: IUnmatchedPool[TradeT, ContextT],
         matched: IMatchedPool[TradeT, ContextT],
         context: ContextT
-) -> tuple[SplitTrade[TradeT] | None, TradingPnl]:
-    closing_trade, opening_trade, unmatched_opening_trade = _find_opening_trade(
-        closing_trade,
-        unmatched,
-        context
-    )
-
-    assert opening_trade.remaining_quantity == -closing_trade.remaining_quantity
-    matched.append(
-        closing_trade.remaining_quantity,
-        opening_trade.trade,
-        closing_trade.trade,
-        context
-    )
+) -> tuple[TradingPnl, int]:
+    """Reduce a position.
 
-    # Note that the open will have the opposite sign to the close.
-    close_value = (
-        closing_trade.remaining_quantity * sec.contract_size * closing_trade.trade.price
-    )
-    open_cost = -(
-        opening_trade.remaining_quantity * sec.contract_size * opening_trade.trade.price
-    )
+    This happens for:
 
-    pnl = TradingPnl(
-        pnl.quantity - opening_trade.remaining_quantity,
-        pnl.cost - open_cost,
-        pnl.realized + (open_cost - close_value),
-    )
+    * A sell from a long position.
+    * A buy from a short position.
 
-    return unmatched_opening_trade, pnl
+    Opening trades are taken from the unmatched pool until the closing trade
+    is exhausted. Pools which can consume or reduce opening trades in bulk or
+    in place are used through those methods. The P/L is accumulated in local
+    variables, and the closing trade is only split if it is larger than the
+    position.
 
+    Args:
+        pnl (TradingPnl): The current P/L.
+        closing (SplitTrade[TradeT]): The closing trade.
+        sec (SecurityT): The security.
+        unmatched (IUnmatchedPool[TradeT, ContextT]): The pool of unmatched trades.
+        matched (IMatchedPool[TradeT, ContextT]): The pool of matched trades.
+        context (ContextT): Some application context.
 
-def _reduce_position[TradeT: ITrade, SecurityT: ISecurity, ContextT](
-        pnl: TradingPnl,
-        closing: SplitTrade[TradeT] | None,
-        sec: SecurityT,
-        unmatched: IUnmatchedPool[TradeT, ContextT],
-        matched: IMatchedPool[TradeT, ContextT],
-        context: ContextT
-) -> TradingPnl:
-    while closing is not None and closing.remaining_quantity != 0 and unmatched.has(closing, context):
-        closing, pnl = _match(
-            pnl,
-            closing,
-            sec,
-            unmatched,
-            matched,
-            context
-        )
+    Returns:
+        tuple[TradingPnl, int]: The new P/L, and the number of opening lots
+            matched.
+    """
+    quantity, cost, realized = pnl
+    lots = 0
+    remaining = closing.remaining_quantity
+    closing_trade = closing.trade
+    close_price = closing_trade.price
+    contract_size = sec.contract_size
+    is_recording = not isinstance(matched, NullMatchedPool)
+    is_consumable, is_reducible = _capabilities(unmatched)
+    consumable = (
+        cast(IConsumableUnmatchedPool[TradeT, ContextT], unmatched)
+        if is_consumable
+        else None
+    )
+    reducible = (
+        cast(IReducibleUnmatchedPool[TradeT, ContextT], unmatched)
+        if is_reducible
+        else None
+    )
 
-    if closing is not None and closing.remaining_quantity != 0:
-        pnl = _add_pnl_trade(
+    if consumable is not None:
+        # The pool provides all the opening trades at once, splitting the
+        # last if necessary.
+        openings = iter(consumable.consume(remaining, closing, context))
+
+    while remaining != 0:
+        if consumable is not None:
+            opening = next(openings, None)
+            if opening is None:
+                break
+            matched_quantity = opening.remaining_quantity
+
+        elif not unmatched.has(closing, context):
+            break
+
+        else:
+            if reducible is not None:
+                opening = reducible.peek(closing, context)
+            else:
+                opening = unmatched.pop(closing, context)
+            opening_quantity = opening.remaining_quantity
+
+            if abs(remaining) < abs(opening_quantity):
+
+                # The closing trade is smaller than the opening trade. Only
+                # part of the opening trade is matched, and the rest stays in
+                # the pool.
+
+                matched_quantity = -remaining
+                if reducible is not None:
+                    reducible.reduce(matched_quantity, closing, context)
+                else:
+                    unmatched.insert(
+                        SplitTrade(
+                            opening_quantity - matched_quantity,
+                            opening.trade
+                        ),
+                        context
+                    )
+
+            else:
+
+                # The closing trade is larger than, or the same size as, the
+                # opening trade. The whole of the opening trade is matched,
+                # and any remaining closing quantity goes on to the next
+                # opening trade.
+
+                matched_quantity = opening_quantity
+                if reducible is not None:
+                    reducible.reduce(matched_quantity, closing, context)
+
+        if is_recording:
+            matched.append(
+                -matched_quantity,
+                opening.trade,
+                closing_trade,
+                context
+            )
+
+        # Note that the open will have the opposite sign to the close.
+        close_value = -matched_quantity * contract_size * close_price
+        open_cost = -(matched_quantity * contract_size * opening.trade.price)
+
+        quantity -= matched_quantity
+        cost -= open_cost
+        realized += open_cost - close_value
+        remaining += matched_quantity
+        lots += 1
+
+    pnl = TradingPnl(quantity, cost, realized)
+
+    if remaining != 0:
+        pnl, more = _add_pnl_trade(
             pnl,
-            closing,
+            (
+                closing
+                if remaining == closing.remaining_quantity
+                else SplitTrade(remaining, closing_trade)
+            ),
             sec,
             unmatched,
             matched,
             context
         )
+        lots += more
 
-    return pnl
+    return pnl, lots
 
 
 def _add_pnl_trade[TradeT: ITrade, SecurityT: ISecurity, ContextT](
@@ -215,7 +263,7 @@ def _add_pnl_trade[TradeT: ITrade, SecurityT: ISecurity, ContextT](
         unmatched: IUnmatchedPool[TradeT, ContextT],
         matched: IMatchedPool[TradeT, ContextT],
         context: ContextT
-) -> TradingPnl:
+) -> tuple[TradingPnl, int]:
     if (
         # We are flat
         pnl.quantity == 0 or
@@ -230,7 +278,7 @@ def _add_pnl_trade[TradeT: ITrade, SecurityT: ISecurity, ContextT](
             sec,
             unmatched,
             context
-        )
+        ), 0
     else:
         return _reduce_position(
             pnl,
@@ -262,8 +310,39 @@ def add_trade[TradeT: ITrade, SecurityT: ISecurity, ContextT](
         matched: IMatchedPool[TradeT, ContextT],
         context: ContextT
 ) -> TradingPnl:
+    return add_counted_trade(pnl, trd, sec, unmatched, matched, context)[0]
+
+
+def add_counted_trade[TradeT: ITrade, SecurityT: ISecurity, ContextT](
+        pnl: TradingPnl,
+        trd: TradeT,
+        sec: SecurityT,
+        unmatched: IUnmatchedPool[TradeT, ContextT],
+        matched: IMatchedPool[TradeT, ContextT],
+        context: ContextT
+) -> tuple[TradingPnl, int]:
+    """Add a trade as `add_trade` does, also counting the opening lots it
+    matched.
+
+    The lots are counted by the algorithm, so the count does not depend on
+    the matched pool recording the matches.
+
+    Args:
+        pnl (TradingPnl): The current P/L.
+        trd (TradeT): The trade.
+        sec (SecurityT): The security.
+        unmatched (IUnmatchedPool[TradeT, ContextT]): The pool of unmatched trades.
+        matched (IMatchedPool[TradeT, ContextT]): The pool of matched trades.
+        context (ContextT): Some application context.
+
+    Returns:
+        tuple[TradingPnl, int]: The new P/L, and the number of opening lots
+            matched, which is zero for cash and average cost positions.
+    """
     if sec.is_cash:
-        return _add_cash_trade(pnl, trd)
+        return _add_cash_trade(pnl, trd), 0
+    elif isinstance(unmatched, AverageCostPool):
+        return add_average_cost_trade(pnl, trd, sec), 0
     else:
         return _add_pnl_trade(
             pnl,
@@ -273,3 +352,75 @@ def add_trade[TradeT: ITrade, SecurityT: ISecurity, ContextT](
             matched,
             context
         )
+
+
+def iter_add_trades[TradeT: ITrade, SecurityT: ISecurity, ContextT](
+        pnl: TradingPnl,
+        trades: Iterable[TradeT],
+        sec: SecurityT,
+        unmatched: IUnmatchedPool[TradeT, ContextT],
+        matched: IMatchedPool[TradeT, ContextT],
+        context: ContextT
+) -> Iterator[TradingPnl]:
+    """Add a sequence of trades to a position, yielding the P/L after each
+    trade.
+
+    The type of security is checked once for the whole sequence, rather than
+    for each trade.
+
+    Args:
+        pnl (TradingPnl): The current P/L.
+        trades (Iterable[TradeT]): The trades to add in order.
+        sec (SecurityT): The security.
+        unmatched (IUnmatchedPool[TradeT, ContextT]): The pool of unmatched trades.
+        matched (IMatchedPool[TradeT, ContextT]): The pool of matched trades.
+        context (ContextT): Some application context.
+
+    Yields:
+        TradingPnl: The P/L after each trade.
+    """
+    if sec.is_cash:
+        for trd in trades:
+            pnl = _add_cash_trade(pnl, trd)
+            yield pnl
+    elif isinstance(unmatched, AverageCostPool):
+        for trd in trades:
+            pnl = add_average_cost_trade(pnl, trd, sec)
+            yield pnl
+    else:
+        for trd in trades:
+            pnl, _lots = _add_pnl_trade(
+                pnl,
+                SplitTrade(trd.quantity, trd),
+                sec,
+                unmatched,
+                matched,
+                context
+            )
+            yield pnl
+
+
+def add_trades[TradeT: ITrade, SecurityT: ISecurity, ContextT](
+        pnl: TradingPnl,
+        trades: Iterable[TradeT],
+        sec: SecurityT,
+        unmatched: IUnmatchedPool[TradeT, ContextT],
+        matched: IMatchedPool[TradeT, ContextT],
+        context: ContextT
+) -> TradingPnl:
+    """Add a sequence of trades to a position.
+
+    Args:
+        pnl (TradingPnl): The current P/L.
+        trades (Iterable[TradeT]): The trades to add in order.
+        sec (SecurityT): The security.
+        unmatched (IUnmatchedPool[TradeT, ContextT]): The pool of unmatched trades.
+        matched (IMatchedPool[TradeT, ContextT]): The pool of matched trades.
+        context (ContextT): Some application context.
+
+    Returns:
+        TradingPnl: The P/L after the last trade.
+    """
+    for current in iter_add_trades(pnl, trades, sec, unmatched, matched, context):
+        pnl = current
+    return pnl
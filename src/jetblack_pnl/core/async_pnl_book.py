@@ -0,0 +1,205 @@
+"""An asyncio front end for a P/L book"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, AsyncIterable, AsyncIterator
+
+from .book import IBook
+from .pnl_book import PnlBook
+from .security import ISecurity
+from .trade import ITrade
+from .trading_pnl import TradingPnl
+
+type _Pending = tuple[Any, Any, asyncio.Future[TradingPnl]]
+
+
+def _add_batch(
+        pnl_book: PnlBook[Any, Any, Any, Any],
+        security: Any,
+        book: Any,
+        trades: list[Any],
+        context: Any
+) -> tuple[list[TradingPnl], BaseException | None]:
+    """Add a batch of trades, returning the P/L for each trade added before
+    any error"""
+    pnls: list[TradingPnl] = []
+    try:
+        for pnl in pnl_book.iter_add_trades(security, book, trades, context):
+            pnls.append(pnl)
+    except Exception as error:
+        return pnls, error
+    return pnls, None
+
+
+class AsyncPnlBook[SecurityT: ISecurity, BookT: IBook, TradeT: ITrade, ContextT]:
+    """An asyncio front end for a P/L book.
+
+    Trades are queued by security and book key, and each key is processed
+    strictly in the order its trades were submitted. The trades waiting for a
+    key are added to the book in a single batch on an executor, so the event
+    loop is not blocked by the matching or by the store. If a trade in a
+    batch fails, its error is raised to that trade alone, and the trades
+    after it are added in a later batch.
+
+    Batches for different keys may run at the same time on different
+    threads, so the book and its store must allow different keys to be
+    used from different threads. Use an executor with a single worker if
+    they do not.
+    """
+
+    def __init__(
+            self,
+            pnl_book: PnlBook[SecurityT, BookT, TradeT, ContextT],
+            executor: Executor | None = None,
+            max_batch: int = 1000
+    ) -> None:
+        """Create the front end.
+
+        Args:
+            pnl_book (PnlBook[SecurityT, BookT, TradeT, ContextT]): The book.
+            executor (Executor | None, optional): The executor to add the
+                trades on. Defaults to the default executor of the event
+                loop.
+            max_batch (int, optional): The largest number of trades added in
+                a batch. Defaults to 1000.
+        """
+        self._pnl_book = pnl_book
+        self._executor = executor
+        self._max_batch = max_batch
+        self._queues: dict[tuple[Any, Any], deque[_Pending]] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    @property
+    def pnl_book(self) -> PnlBook[SecurityT, BookT, TradeT, ContextT]:
+        """The underlying book"""
+        return self._pnl_book
+
+    def _submit(
+            self,
+            security: SecurityT,
+            book: BookT,
+            trade: TradeT,
+            context: ContextT
+    ) -> asyncio.Future[TradingPnl]:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[TradingPnl] = loop.create_future()
+        key = (security.key, book.key)
+        queue = self._queues.get(key)
+        if queue is not None:
+            queue.append((trade, context, future))
+            return future
+
+        queue = self._queues[key] = deque([(trade, context, future)])
+        task = loop.create_task(self._drain(key, security, book, queue))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return future
+
+    async def _drain(
+            self,
+            key: tuple[Any, Any],
+            security: SecurityT,
+            book: BookT,
+            queue: deque[_Pending]
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while queue:
+                # Batch the waiting trades which share a context.
+                context = queue[0][1]
+                batch: list[_Pending] = []
+                while queue and len(batch) < self._max_batch and queue[0][1] is context:
+                    batch.append(queue.popleft())
+
+                pnls, error = await loop.run_in_executor(
+                    self._executor,
+                    _add_batch,
+                    self._pnl_book,
+                    security,
+                    book,
+                    [trade for trade, _, _ in batch],
+                    context
+                )
+                # Writing the store after the last trade may also fail, in
+                # which case the error belongs to the last trade.
+                failed = (
+                    len(batch) if error is None
+                    else min(len(pnls), len(batch) - 1)
+                )
+                for (_, _, future), pnl in zip(batch[:failed], pnls):
+                    if not future.done():
+                        future.set_result(pnl)
+                if error is not None:
+                    # Only the trade which failed gets the error. The trades
+                    # after it were not added, so they go back on the queue.
+                    _, _, future = batch[failed]
+                    if not future.done():
+                        future.set_exception(error)
+                    queue.extendleft(reversed(batch[failed + 1:]))
+        finally:
+            del self._queues[key]
+            for _, _, future in queue:
+                if not future.done():
+                    future.cancel()
+
+    async def add_trade(
+        self,
+        security: SecurityT,
+        book: BookT,
+        trade: TradeT,
+        context: ContextT
+    ) -> TradingPnl:
+        """Add a trade.
+
+        Args:
+            security (SecurityT): The security.
+            book (BookT): The book.
+            trade (TradeT): The trade.
+            context (ContextT): Some application context.
+
+        Returns:
+            TradingPnl: The P/L after the trade.
+        """
+        return await self._submit(security, book, trade, context)
+
+    async def stream(
+        self,
+        security: SecurityT,
+        book: BookT,
+        trades: AsyncIterable[TradeT],
+        context: ContextT
+    ) -> AsyncIterator[TradingPnl]:
+        """Add trades as they arrive, yielding the P/L after each trade.
+
+        Trades are submitted as soon as they arrive, so trades which arrive
+        while a batch is being added are batched together.
+
+        Args:
+            security (SecurityT): The security.
+            book (BookT): The book.
+            trades (AsyncIterable[TradeT]): The trades.
+            context (ContextT): Some application context.
+
+        Yields:
+            TradingPnl: The P/L after each trade.
+        """
+        pending: asyncio.Queue[asyncio.Future[TradingPnl] | None] = asyncio.Queue(
+            self._max_batch
+        )
+
+        async def feed() -> None:
+            try:
+                async for trade in trades:
+                    await pending.put(self._submit(security, book, trade, context))
+            finally:
+                await pending.put(None)
+
+        feeder = asyncio.create_task(feed())
+        try:
+            while (future := await pending.get()) is not None:
+                yield await future
+            await feeder
+        finally:
+            if not feeder.done():
+                feeder.cancel()
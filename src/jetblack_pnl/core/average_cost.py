@@ -0,0 +1,121 @@
+"""Average cost accounting
+
+Rather than matching closing trades with opening trades, the position can be
+treated as a single holding at the average cost. A trade which extends the
+position adds to the quantity and cost. A trade which reduces the position
+releases cost in proportion to the quantity closed, realizing the difference
+from the closing value. A trade which takes the position through flat closes
+the whole position, and opens a new one with the remainder.
+
+Each trade is a constant time update and no lots are kept. The average cost is
+held exactly while the position is extended. When part of a position is
+closed the released cost is a division, so is subject to the precision of the
+decimal context.
+
+Average cost accounting is selected for a position by using an
+`AverageCostPool` as its unmatched pool.
+"""
+
+from decimal import Decimal
+from typing import Sequence
+
+from .security import ISecurity
+from .split_trade import SplitTrade
+from .trade import ITrade
+from .trading_pnl import TradingPnl
+from .unmatched_pool import IUnmatchedPool
+
+
+class AverageCostPool[TradeT: ITrade, ContextT](IUnmatchedPool[TradeT, ContextT]):
+    """An unmatched pool which selects average cost accounting.
+
+    The pool holds no trades. When the algorithm is given this pool it updates
+    the P/L directly rather than matching trades.
+    """
+
+    def append(self, opening: SplitTrade[TradeT], context: ContextT) -> None:
+        raise TypeError("an average cost pool holds no trades")
+
+    def insert(self, opening: SplitTrade[TradeT], context: ContextT) -> None:
+        raise TypeError("an average cost pool holds no trades")
+
+    def pop(
+            self,
+            closing: SplitTrade[TradeT],
+            context: ContextT
+    ) -> SplitTrade[TradeT]:
+        raise TypeError("an average cost pool holds no trades")
+
+    def has(self, closing: SplitTrade[TradeT], context: ContextT) -> bool:
+        return False
+
+    def snapshot(self) -> 'AverageCostPool[TradeT, ContextT]':
+        """The pool holds nothing, so is its own snapshot"""
+        return self
+
+    def pool(self, context: ContextT) -> Sequence[SplitTrade[TradeT]]:
+        return ()
+
+    def __len__(self) -> int:
+        return 0
+
+    def __eq__(self, value: object) -> bool:
+        return isinstance(value, AverageCostPool)
+
+    def __repr__(self) -> str:
+        return "AverageCostPool()"
+
+
+def add_average_cost_trade[TradeT: ITrade, SecurityT: ISecurity](
+        pnl: TradingPnl,
+        trd: TradeT,
+        sec: SecurityT
+) -> TradingPnl:
+    """Add a trade to a position using average cost accounting.
+
+    Args:
+        pnl (TradingPnl): The current P/L.
+        trd (TradeT): The trade.
+        sec (SecurityT): The security.
+
+    Returns:
+        TradingPnl: The new P/L.
+    """
+    quantity, cost, realized = pnl
+    trade_quantity = trd.quantity
+
+    if (
+        # We are flat
+        quantity == 0 or
+        # We are long and buying, or short and selling.
+        (quantity > 0) == (trade_quantity > 0)
+    ):
+        return TradingPnl(
+            quantity + trade_quantity,
+            cost - trade_quantity * sec.contract_size * trd.price,
+            realized
+        )
+
+    # The closing quantity can be no larger than the position.
+    closing_quantity = (
+        trade_quantity
+        if abs(trade_quantity) <= abs(quantity)
+        else -quantity
+    )
+    close_value = closing_quantity * sec.contract_size * trd.price
+    open_cost = (
+        cost
+        if closing_quantity == -quantity
+        else -cost * closing_quantity / quantity
+    )
+    quantity += closing_quantity
+    cost -= open_cost
+    realized += open_cost - close_value
+
+    opening_quantity = trade_quantity - closing_quantity
+    if opening_quantity != 0:
+        # The trade went through flat; the remainder opens a new position.
+        quantity = opening_quantity
+        cost = -opening_quantity * sec.contract_size * trd.price
+
+    return TradingPnl(quantity, cost, realized)
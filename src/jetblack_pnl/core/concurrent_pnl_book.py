@@ -0,0 +1,176 @@
+"""A P/L book which may be used from many threads"""
+
+from threading import Lock
+from typing import Callable, Iterable, Iterator
+
+from .book import IBook
+from .instrumentation import TradeMetrics
+from .matched_pool import IMatchedPool
+from .pnl_book import PnlBook
+from .pnl_book_store import IPnlBookStore
+from .security import ISecurity
+from .subscriptions import PnlPublisher
+from .trade import ITrade
+from .trading_pnl import TradingPnl
+from .unmatched_pool import IUnmatchedPool, ISnapshotUnmatchedPool
+from .what_if import WhatIf
+
+
+class ConcurrentPnlBook[
+    SecurityT: ISecurity,
+    BookT: IBook,
+    TradeT: ITrade,
+    ContextT
+](PnlBook[SecurityT, BookT, TradeT, ContextT]):
+    """A P/L book with a lock for each stripe of security and book keys.
+
+    Each security and book key maps to one of a fixed number of locks, so
+    trades for different keys usually proceed in parallel while trades for
+    the same key are serialized. The store must allow different keys to be
+    read and written from different threads.
+    """
+
+    def __init__(
+            self,
+            store: IPnlBookStore[SecurityT, BookT, TradeT, ContextT],
+            matched_factory: Callable[
+                [SecurityT, BookT, ContextT],
+                IMatchedPool[TradeT, ContextT]
+            ],
+            unmatched_factory: Callable[
+                [SecurityT, BookT, ContextT],
+                IUnmatchedPool[TradeT, ContextT]
+            ],
+            observer: Callable[
+                [SecurityT, BookT, TradeMetrics],
+                None
+            ] | None = None,
+            stripes: int = 64,
+            publisher: PnlPublisher | None = None
+    ) -> None:
+        """Create the book.
+
+        Args:
+            store (IPnlBookStore[SecurityT, BookT, TradeT, ContextT]): The
+                store for the positions.
+            matched_factory (Callable[[SecurityT, BookT, ContextT], IMatchedPool[TradeT, ContextT]]):
+                Creates the matched pool for a new position.
+            unmatched_factory (Callable[[SecurityT, BookT, ContextT], IUnmatchedPool[TradeT, ContextT]]):
+                Creates the unmatched pool for a new position.
+            observer (Callable[[SecurityT, BookT, TradeMetrics], None] | None, optional):
+                If given, trades are added with instrumentation and the
+                metrics are reported to the observer. Defaults to None.
+            stripes (int, optional): The number of locks. Defaults to 64.
+            publisher (PnlPublisher | None, optional): The publisher of
+                changes in P/L, which may be shared between books. Defaults
+                to a new publisher.
+        """
+        super().__init__(
+            store,
+            matched_factory,
+            unmatched_factory,
+            observer,
+            publisher
+        )
+        self._locks = [Lock() for _ in range(stripes)]
+
+    def _lock(self, security: SecurityT, book: BookT) -> Lock:
+        return self._locks[hash((security.key, book.key)) % len(self._locks)]
+
+    def get(
+            self,
+            security: SecurityT,
+            book: BookT,
+            context: ContextT
+    ) -> tuple[TradingPnl, IUnmatchedPool[TradeT, ContextT], IMatchedPool[TradeT, ContextT]]:
+        """Get a position.
+
+        The pools of the position are changed in place by other threads
+        adding trades, so where the unmatched pool supports snapshots a
+        snapshot is returned, taken under the lock. Otherwise the pool
+        itself is returned, and must only be read while no trades are added
+        for the security and book. The matched pool is returned as held.
+
+        Args:
+            security (SecurityT): The security.
+            book (BookT): The book.
+            context (ContextT): Some application context.
+
+        Returns:
+            tuple[TradingPnl, IUnmatchedPool[TradeT, ContextT], IMatchedPool[TradeT, ContextT]]:
+                The P/L, the unmatched pool and the matched pool.
+        """
+        with self._lock(security, book):
+            pnl, unmatched, matched = super().get(security, book, context)
+            if isinstance(unmatched, ISnapshotUnmatchedPool):
+                unmatched = unmatched.snapshot()
+            return pnl, unmatched, matched
+
+    def add_trade(
+        self,
+        security: SecurityT,
+        book: BookT,
+        trade: TradeT,
+        context: ContextT
+    ) -> TradingPnl:
+        with self._lock(security, book):
+            return super().add_trade(security, book, trade, context)
+
+    def iter_add_trades(
+        self,
+        security: SecurityT,
+        book: BookT,
+        trades: Iterable[TradeT],
+        context: ContextT
+    ) -> Iterator[TradingPnl]:
+        """Add a sequence of trades for a single security and book, yielding
+        the P/L after each trade.
+
+        Unlike the generator of `PnlBook`, this is eager: every trade is
+        added under the lock for the security and book when the first P/L is
+        requested, and the lock is released before any P/L is yielded.
+        Closing the generator early does not stop the remaining trades from
+        being added. A consumer may add trades for the same key while
+        iterating, and abandoning the generator holds no lock.
+
+        Args:
+            security (SecurityT): The security.
+            book (BookT): The book.
+            trades (Iterable[TradeT]): The trades to add in order.
+            context (ContextT): Some application context.
+
+        Yields:
+            TradingPnl: The P/L after each trade.
+        """
+        with self._lock(security, book):
+            pnls = list(super().iter_add_trades(security, book, trades, context))
+        yield from pnls
+
+    def add_trades(
+        self,
+        security: SecurityT,
+        book: BookT,
+        trades: Iterable[TradeT],
+        context: ContextT
+    ) -> TradingPnl:
+        with self._lock(security, book):
+            return super().add_trades(security, book, trades, context)
+
+    def what_if(
+        self,
+        security: SecurityT,
+        book: BookT,
+        trades: Iterable[TradeT],
+        context: ContextT
+    ) -> WhatIf[TradeT]:
+        with self._lock(security, book):
+            return super().what_if(security, book, trades, context)
+
+    def _what_if_position(
+            self,
+            security: SecurityT,
+            book: BookT,
+            context: ContextT
+    ) -> tuple[TradingPnl, IUnmatchedPool[TradeT, ContextT]]:
+        with self._lock(security, book):
+            return super()._what_if_position(security, book, context)
@@ -0,0 +1,135 @@
+"""A vectorized FIFO replay of a trade history
+
+When the P/L for a complete trade history is recalculated there is no need to
+process the trades one at a time. For FIFO matching the problem can be solved
+with cumulative sums.
+
+Each trade is split into a closing part, which reduces the current position,
+and an opening part, which extends it. A trade which takes the position through
+flat has both. Because every flat position has matched all of its opening
+quantity, the n-th unit of closing quantity is always matched with the n-th
+unit of opening quantity. The matches are therefore found by merging the
+cumulative opening and closing quantities, and locating each breakpoint with a
+binary search.
+
+The results are the same as adding the trades one at a time with
+`add_trade` using a FIFO unmatched pool. Trades with a quantity of zero are
+ignored.
+
+This module requires numpy. The quantities and prices should be integers
+(see `jetblack_pnl.core.scaled`) for the results to be exact.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+from .trading_pnl import TradingPnl
+
+
+class FifoReplay(NamedTuple):
+    """The result of a FIFO replay.
+
+    The trade indices refer to the position of the trade in the arrays passed
+    to `replay_fifo`.
+    """
+    pnl: TradingPnl
+    unmatched_index: NDArray
+    """The indices of the trades with unmatched quantity in FIFO order"""
+    unmatched_quantity: NDArray
+    """The remaining quantities of the unmatched trades"""
+    matched_quantity: NDArray
+    """The closing quantity of each match"""
+    matched_opening_index: NDArray
+    """The index of the opening trade of each match"""
+    matched_closing_index: NDArray
+    """The index of the closing trade of each match"""
+
+
+def replay_fifo(
+        quantities: ArrayLike,
+        prices: ArrayLike,
+        contract_size: int | float = 1
+) -> FifoReplay:
+    """Calculate the FIFO P/L for a trade history.
+
+    Args:
+        quantities (ArrayLike): The signed trade quantities.
+        prices (ArrayLike): The trade prices.
+        contract_size (int | float, optional): The contract size of the
+            security. Defaults to 1.
+
+    Returns:
+        FifoReplay: The P/L, unmatched trades and matched trades.
+    """
+    quantity = np.asarray(quantities)
+    price = np.asarray(prices)
+    if quantity.shape != price.shape or quantity.ndim != 1:
+        raise ValueError("quantities and prices must be 1d and the same length")
+
+    position = np.cumsum(quantity)
+    previous = position - quantity
+    size = np.abs(quantity)
+
+    # The part of each trade which reduces the position, and the part which
+    # extends it.
+    is_reducing = np.sign(quantity) == -np.sign(previous)
+    closing_size = np.where(
+        is_reducing,
+        np.minimum(size, np.abs(previous)),
+        0
+    )
+    opening_size = size - closing_size
+
+    opening_index = np.flatnonzero(opening_size)
+    closing_index = np.flatnonzero(closing_size)
+    opening_end = np.cumsum(opening_size[opening_index])
+    closing_end = np.cumsum(closing_size[closing_index])
+    total_closed = closing_end[-1] if len(closing_end) else 0
+
+    # Every change of opening or closing trade is a breakpoint between
+    # matches.
+    breakpoints = np.union1d(
+        opening_end[opening_end <= total_closed],
+        closing_end
+    )
+    match_size = np.diff(breakpoints, prepend=0)
+    matched_opening_index = opening_index[
+        np.searchsorted(opening_end, breakpoints, side='left')
+    ]
+    matched_closing_index = closing_index[
+        np.searchsorted(closing_end, breakpoints, side='left')
+    ]
+    matched_quantity = np.sign(quantity[matched_closing_index]) * match_size
+
+    # Any opening quantity beyond the total closed remains unmatched.
+    is_open = opening_end > total_closed
+    unmatched_index = opening_index[is_open]
+    unmatched_size = opening_end[is_open] - np.maximum(
+        opening_end[is_open] - opening_size[unmatched_index],
+        total_closed
+    )
+    unmatched_quantity = np.sign(quantity[unmatched_index]) * unmatched_size
+
+    realized = np.sum(
+        matched_quantity * contract_size * (
+            price[matched_opening_index] - price[matched_closing_index]
+        )
+    )
+    cost = -np.sum(unmatched_quantity * contract_size * price[unmatched_index])
+
+    pnl = TradingPnl._make((
+        position[-1].item() if len(position) else 0,
+        cost.item(),
+        realized.item(),
+    ))
+
+    return FifoReplay(
+        pnl,
+        unmatched_index,
+        unmatched_quantity,
+        matched_quantity,
+        matched_opening_index,
+        matched_closing_index,
+    )
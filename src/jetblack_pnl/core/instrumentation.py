@@ -0,0 +1,321 @@
+"""Instrumentation of the P/L algorithm
+
+`instrumented_add_trade` adds a trade in the same way as `add_trade`, and
+reports what the algorithm did to an observer: how many lots were matched,
+how many were split, the length of the unmatched pool before and after, and
+the time spent in the pools and overall. The lengths, and so the splits, are
+only known for pools which have a length; the lots of other pools are not
+read to count them.
+
+The pools are wrapped in proxies which count and time each call. The
+uninstrumented `add_trade` is unchanged, so instrumentation costs nothing
+when it is not used.
+"""
+
+from collections import Counter
+from decimal import Decimal
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Literal,
+    Mapping,
+    NamedTuple,
+    Sequence,
+    Sized,
+)
+
+from .algorithm import add_trade
+from .average_cost import AverageCostPool
+from .matched_pool import IMatchedPool, NullMatchedPool
+from .security import ISecurity
+from .split_trade import SplitTrade
+from .trade import ITrade
+from .trading_pnl import TradingPnl
+from .unmatched_pool import IUnmatchedPool
+
+type TradeKind = Literal['extend', 'reduce', 'flip']
+
+
+class TradeMetrics(NamedTuple):
+    """What the algorithm did when adding a trade"""
+    kind: TradeKind
+    """Whether the trade extended, reduced or flipped the position"""
+    lots: int
+    """The number of opening lots matched"""
+    splits: int | None
+    """The number of opening lots which were partly matched, or None if the
+    unmatched pool has no length"""
+    pool_before: int | None
+    """The length of the unmatched pool before the trade, or None if the pool
+    has no length"""
+    pool_after: int | None
+    """The length of the unmatched pool after the trade, or None if the pool
+    has no length"""
+    pool_time: float
+    """The seconds spent in the pools"""
+    total_time: float
+    """The seconds spent adding the trade"""
+
+    @property
+    def arithmetic_time(self) -> float:
+        """The seconds spent outside the pools"""
+        return self.total_time - self.pool_time
+
+
+class _InstrumentedUnmatchedPool:
+    """A proxy which counts the lots taken from a pool and times each call.
+
+    The optional methods of the pool are only available if the pool has them,
+    so the algorithm chooses the same strategy as it would for the pool.
+    """
+
+    def __init__(self, pool: IUnmatchedPool[Any, Any]) -> None:
+        self._pool = pool
+        self.lots = 0
+        self.elapsed = 0.0
+
+    def append(self, opening: SplitTrade[Any], context: Any) -> None:
+        start = perf_counter()
+        self._pool.append(opening, context)
+        self.elapsed += perf_counter() - start
+
+    def insert(self, opening: SplitTrade[Any], context: Any) -> None:
+        start = perf_counter()
+        self._pool.insert(opening, context)
+        self.elapsed += perf_counter() - start
+
+    def pop(self, closing: SplitTrade[Any], context: Any) -> SplitTrade[Any]:
+        start = perf_counter()
+        opening = self._pool.pop(closing, context)
+        self.elapsed += perf_counter() - start
+        self.lots += 1
+        return opening
+
+    def has(self, closing: SplitTrade[Any], context: Any) -> bool:
+        start = perf_counter()
+        result = self._pool.has(closing, context)
+        self.elapsed += perf_counter() - start
+        return result
+
+    def pool(self, context: Any) -> Sequence[SplitTrade[Any]]:
+        return self._pool.pool(context)
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self._pool, name)
+        if name == 'consume':
+            def consume(
+                    quantity: Decimal,
+                    closing: SplitTrade[Any],
+                    context: Any
+            ) -> Sequence[SplitTrade[Any]]:
+                start = perf_counter()
+                taken = method(quantity, closing, context)
+                self.elapsed += perf_counter() - start
+                self.lots += len(taken)
+                return taken
+            return consume
+        if name == 'peek':
+            def peek(closing: SplitTrade[Any], context: Any) -> SplitTrade[Any]:
+                start = perf_counter()
+                opening = method(closing, context)
+                self.elapsed += perf_counter() - start
+                return opening
+            return peek
+        if name == 'reduce':
+            def reduce(
+                    quantity: Decimal,
+                    closing: SplitTrade[Any],
+                    context: Any
+            ) -> None:
+                start = perf_counter()
+                method(quantity, closing, context)
+                self.elapsed += perf_counter() - start
+                self.lots += 1
+            return reduce
+        return method
+
+
+class _InstrumentedMatchedPool:
+    """A proxy which times the calls to a matched pool"""
+
+    def __init__(self, pool: IMatchedPool[Any, Any]) -> None:
+        self._pool = pool
+        self.elapsed = 0.0
+
+    def append(
+            self,
+            closing_quantity: Decimal,
+            opening_trade: Any,
+            closing_trade: Any,
+            context: Any
+    ) -> None:
+        start = perf_counter()
+        self._pool.append(closing_quantity, opening_trade, closing_trade, context)
+        self.elapsed += perf_counter() - start
+
+    def pool(self, context: Any) -> Sequence[tuple[Decimal, Any, Any]]:
+        return self._pool.pool(context)
+
+
+def _pool_length(pool: IUnmatchedPool[Any, Any]) -> int | None:
+    """The length of a pool, or None if it has none.
+
+    The lots of a pool without a length are not read, as for a database pool
+    that would cost more than adding the trade.
+    """
+    return len(pool) if isinstance(pool, Sized) else None
+
+
+def _trade_kind(before: Decimal, trade: Decimal, after: Decimal) -> TradeKind:
+    if before == 0 or (before > 0) == (trade > 0):
+        return 'extend'
+    if after == 0 or (after > 0) == (before > 0):
+        return 'reduce'
+    return 'flip'
+
+
+def instrumented_add_trade[TradeT: ITrade, SecurityT: ISecurity, ContextT](
+        pnl: TradingPnl,
+        trd: TradeT,
+        sec: SecurityT,
+        unmatched: IUnmatchedPool[TradeT, ContextT],
+        matched: IMatchedPool[TradeT, ContextT],
+        context: ContextT,
+        observer: Callable[[TradeMetrics], None]
+) -> TradingPnl:
+    """Add a trade to a position, reporting what the algorithm did.
+
+    Args:
+        pnl (TradingPnl): The current P/L.
+        trd (TradeT): The trade.
+        sec (SecurityT): The security.
+        unmatched (IUnmatchedPool[TradeT, ContextT]): The pool of unmatched trades.
+        matched (IMatchedPool[TradeT, ContextT]): The pool of matched trades.
+        context (ContextT): Some application context.
+        observer (Callable[[TradeMetrics], None]): Called with the metrics
+            for the trade.
+
+    Returns:
+        TradingPnl: The new P/L.
+    """
+    start = perf_counter()
+    pool_before = _pool_length(unmatched)
+
+    # The algorithm checks for these pools by type, so they are not wrapped.
+    instrumented_unmatched = (
+        None
+        if isinstance(unmatched, AverageCostPool)
+        else _InstrumentedUnmatchedPool(unmatched)
+    )
+    instrumented_matched = (
+        None
+        if isinstance(matched, NullMatchedPool)
+        else _InstrumentedMatchedPool(matched)
+    )
+
+    result = add_trade(
+        pnl,
+        trd,
+        sec,
+        unmatched if instrumented_unmatched is None else instrumented_unmatched,  # type: ignore
+        matched if instrumented_matched is None else instrumented_matched,  # type: ignore
+        context
+    )
+
+    pool_after = _pool_length(unmatched)
+    pool_time = (
+        (0.0 if instrumented_unmatched is None else instrumented_unmatched.elapsed) +
+        (0.0 if instrumented_matched is None else instrumented_matched.elapsed)
+    )
+    lots = 0 if instrumented_unmatched is None else instrumented_unmatched.lots
+    kind = _trade_kind(pnl.quantity, trd.quantity, result.quantity)
+    # Lots which were matched but are still in the pool were split.
+    splits: int | None = None
+    if not lots:
+        splits = 0
+    elif pool_before is not None and pool_after is not None:
+        opened = 0 if kind == 'reduce' else 1
+        splits = max(lots - (pool_before - pool_after + opened), 0)
+    total_time = perf_counter() - start
+
+    observer(
+        TradeMetrics(
+            kind,
+            lots,
+            splits,
+            pool_before,
+            pool_after,
+            pool_time,
+            total_time
+        )
+    )
+    return result
+
+
+def _bucket(value: int) -> int:
+    """The power of two histogram bucket for a count"""
+    return 0 if value <= 0 else 1 << (value.bit_length() - 1)
+
+
+class BookMetrics:
+    """The metrics collected for a book.
+
+    The histograms are keyed by the lower bound of a power of two bucket, so
+    a count of 5 is in bucket 4, which holds counts from 4 to 7. The splits
+    and pool lengths only include the trades where they were known.
+    """
+
+    def __init__(self) -> None:
+        self.trades = 0
+        self.splits = 0
+        self.pool_time = 0.0
+        self.total_time = 0.0
+        self.kinds: Counter[TradeKind] = Counter()
+        self.lots: Counter[int] = Counter()
+        self.pool_length: Counter[int] = Counter()
+
+    def add(self, metrics: TradeMetrics) -> None:
+        """Add the metrics of a trade.
+
+        Args:
+            metrics (TradeMetrics): The metrics.
+        """
+        self.trades += 1
+        if metrics.splits is not None:
+            self.splits += metrics.splits
+        self.pool_time += metrics.pool_time
+        self.total_time += metrics.total_time
+        self.kinds[metrics.kind] += 1
+        self.lots[_bucket(metrics.lots)] += 1
+        if metrics.pool_before is not None:
+            self.pool_length[_bucket(metrics.pool_before)] += 1
+
+    def __repr__(self) -> str:
+        return (
+            f"BookMetrics(trades={self.trades}, kinds={dict(self.kinds)}, "
+            f"lots={dict(self.lots)}, pool_length={dict(self.pool_length)})"
+        )
+
+
+class MetricsCollector:
+    """An observer for a `PnlBook` which collects metrics for each book"""
+
+    def __init__(self) -> None:
+        self._books: dict[Any, BookMetrics] = {}
+
+    @property
+    def books(self) -> Mapping[Any, BookMetrics]:
+        """The metrics keyed by book key"""
+        return self._books
+
+    def __call__(
+            self,
+            security: ISecurity,
+            book: Any,
+            metrics: TradeMetrics
+    ) -> None:
+        book_metrics = self._books.get(book.key)
+        if book_metrics is None:
+            book_metrics = self._books[book.key] = BookMetrics()
+        book_metrics.add(metrics)
@@ -0,0 +1,174 @@
+"""Vectorized mark to market of many positions
+
+`TradingPnl.strip` marks a single position with decimal arithmetic. When many
+positions are marked on every price snapshot the positions can be gathered
+once into contiguous arrays, so each snapshot only rewrites the price column
+and recalculates the unrealized P/L.
+
+The arrays hold 64 bit floats, so the results are approximate. Use
+`TradingPnl.strip` where exact decimal results are required.
+
+This module requires numpy.
+"""
+
+from decimal import Decimal
+from typing import Any, Iterable, Mapping, NamedTuple
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+from .book import IBook
+from .pnl_book_store import IPnlBookStore
+from .security import ISecurity
+from .trading_pnl import TradingPnl
+
+
+class MarkedPositions(NamedTuple):
+    """The columns of the marked positions.
+
+    Row i of every column is for the security and book in row i of
+    `PositionMarker.keys`.
+    """
+    quantity: NDArray[np.float64]
+    avg_cost: NDArray[np.float64]
+    price: NDArray[np.float64]
+    realized: NDArray[np.float64]
+    unrealized: NDArray[np.float64]
+
+
+def _read_only(array: NDArray[np.float64]) -> NDArray[np.float64]:
+    """A view of an array which cannot be written through"""
+    view = array.view()
+    view.setflags(write=False)
+    return view
+
+
+class PositionMarker[SecurityT: ISecurity, BookT: IBook]:
+    """Mark many positions to market with numpy.
+
+    The columns returned by `mark` are read only views of the arrays of the
+    marker. The price and unrealized columns are overwritten by the next call
+    to `mark`, so copy them to keep them.
+    """
+
+    def __init__(
+            self,
+            positions: Iterable[tuple[SecurityT, BookT, TradingPnl]]
+    ) -> None:
+        """Gather the positions into arrays.
+
+        Args:
+            positions (Iterable[tuple[SecurityT, BookT, TradingPnl]]): The
+                security, book and P/L of each position.
+        """
+        keys: list[tuple[Any, Any]] = []
+        security_index: dict[Any, int] = {}
+        position_security: list[int] = []
+        quantity: list[Decimal] = []
+        cost: list[Decimal] = []
+        realized: list[Decimal] = []
+        contract_size: list[Decimal] = []
+
+        for security, book, pnl in positions:
+            keys.append((security.key, book.key))
+            position_security.append(
+                security_index.setdefault(security.key, len(security_index))
+            )
+            quantity.append(pnl.quantity)
+            cost.append(pnl.cost)
+            realized.append(pnl.realized)
+            contract_size.append(security.contract_size)
+
+        self._keys = tuple(keys)
+        self._security_keys = tuple(security_index)
+        self._security_index = np.array(position_security, dtype=np.intp)
+
+        self._quantity = np.array(quantity, dtype=np.float64)
+        self._cost = np.array(cost, dtype=np.float64)
+        self._realized = np.array(realized, dtype=np.float64)
+        self._exposure = self._quantity * np.array(contract_size, dtype=np.float64)
+        self._avg_cost = np.divide(
+            -self._cost,
+            self._exposure,
+            out=np.zeros_like(self._cost),
+            where=self._exposure != 0
+        )
+
+        self._price = np.empty_like(self._quantity)
+        self._unrealized = np.empty_like(self._quantity)
+
+        self._marked = MarkedPositions(
+            _read_only(self._quantity),
+            _read_only(self._avg_cost),
+            _read_only(self._price),
+            _read_only(self._realized),
+            _read_only(self._unrealized),
+        )
+
+    @classmethod
+    def from_store[ContextT](
+            cls,
+            store: IPnlBookStore[SecurityT, BookT, Any, ContextT],
+            keys: Iterable[tuple[SecurityT, BookT]],
+            context: ContextT
+    ) -> 'PositionMarker[SecurityT, BookT]':
+        """Gather the current positions from a store.
+
+        Args:
+            store (IPnlBookStore[SecurityT, BookT, Any, ContextT]): The store.
+            keys (Iterable[tuple[SecurityT, BookT]]): The securities and books
+                of the positions. Positions not in the store are skipped.
+            context (ContextT): Some application context.
+
+        Returns:
+            PositionMarker[SecurityT, BookT]: The position marker.
+        """
+        return cls(
+            (security, book, store.get(security, book, context)[0])
+            for security, book in keys
+            if store.has(security, book, context)
+        )
+
+    @property
+    def keys(self) -> tuple[tuple[Any, Any], ...]:
+        """The security and book keys of the positions"""
+        return self._keys
+
+    @property
+    def security_keys(self) -> tuple[Any, ...]:
+        """The distinct security keys, in the order used by `mark_array`"""
+        return self._security_keys
+
+    def mark_array(self, prices: ArrayLike) -> MarkedPositions:
+        """Mark the positions with prices ordered by `security_keys`.
+
+        Args:
+            prices (ArrayLike): The price of each security.
+
+        Returns:
+            MarkedPositions: The marked positions.
+        """
+        np.take(
+            np.asarray(prices, dtype=np.float64),
+            self._security_index,
+            out=self._price
+        )
+        np.multiply(self._exposure, self._price, out=self._unrealized)
+        np.add(self._unrealized, self._cost, out=self._unrealized)
+        return self._marked
+
+    def mark(self, prices: Mapping[Any, Decimal | float | int]) -> MarkedPositions:
+        """Mark the positions with prices keyed by security key.
+
+        Securities without a price are marked with NaN.
+
+        Args:
+            prices (Mapping[Any, Decimal | float | int]): The prices.
+
+        Returns:
+            MarkedPositions: The marked positions.
+        """
+        return self.mark_array([
+            float(prices.get(key, np.nan))
+            for key in self._security_keys
+        ])
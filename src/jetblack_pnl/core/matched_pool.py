@@ -24,3 +24,83 @@ class IMatchedPool[TradeT: ITrade, ContextT](Protocol):
             context: ContextT
     ) -> Sequence[tuple[Decimal, TradeT, TradeT]]:
         ...
+
+
+class NullMatchedPool[TradeT: ITrade, ContextT](IMatchedPool[TradeT, ContextT]):
+    """A matched pool which records nothing.
+
+    When the algorithm is given this pool it does not report the matches at
+    all.
+    """
+
+    def append(
+        self,
+        closing_quantity: Decimal,
+        opening_trade: TradeT,
+        closing_trade: TradeT,
+        context: ContextT
+    ) -> None:
+        pass
+
+    def pool(
+            self,
+            context: ContextT
+    ) -> Sequence[tuple[Decimal, TradeT, TradeT]]:
+        return ()
+
+    def __len__(self) -> int:
+        return 0
+
+    def __eq__(self, value: object) -> bool:
+        return isinstance(value, NullMatchedPool)
+
+    def __repr__(self) -> str:
+        return "NullMatchedPool()"
+
+
+class SummaryMatchedPool[TradeT: ITrade, ContextT](IMatchedPool[TradeT, ContextT]):
+    """A matched pool which only keeps a count of the matches and the total
+    quantity matched."""
+
+    def __init__(self, count: int = 0, quantity: Decimal = Decimal(0)) -> None:
+        self._count = count
+        self._quantity = quantity
+
+    @property
+    def count(self) -> int:
+        """The number of matches"""
+        return self._count
+
+    @property
+    def quantity(self) -> Decimal:
+        """The total absolute quantity matched"""
+        return self._quantity
+
+    def append(
+        self,
+        closing_quantity: Decimal,
+        opening_trade: TradeT,
+        closing_trade: TradeT,
+        context: ContextT
+    ) -> None:
+        self._count += 1
+        self._quantity += abs(closing_quantity)
+
+    def pool(
+            self,
+            context: ContextT
+    ) -> Sequence[tuple[Decimal, TradeT, TradeT]]:
+        return ()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __eq__(self, value: object) -> bool:
+        return (
+            isinstance(value, SummaryMatchedPool) and
+            value.count == self.count and
+            value.quantity == self.quantity
+        )
+
+    def __repr__(self) -> str:
+        return f"SummaryMatchedPool(count={self._count}, quantity={self._quantity})"
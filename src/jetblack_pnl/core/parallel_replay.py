@@ -0,0 +1,141 @@
+"""Parallel replay of trades
+
+The P/L of each security and book is independent of the others, so a tape of
+trades can be partitioned by security and book, and the partitions replayed
+in separate processes. The order of the trades for each security and book is
+kept.
+
+The book factory, the context, and the securities, books, trades and pools
+are sent between processes, so must be picklable.
+
+The store does not say which trade it last recorded for a position, so a
+position held before the replay is set in the store of a worker with no
+trade. The store of the worker must accept a trade of None.
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+import os
+from typing import Any, Callable, Iterable
+
+from .book import IBook
+from .matched_pool import IMatchedPool
+from .pnl_book import PnlBook
+from .pnl_book_store import IPnlBookStore
+from .security import ISecurity
+from .trade import ITrade
+from .trading_pnl import TradingPnl
+from .unmatched_pool import IUnmatchedPool
+
+type _Position = tuple[
+    Any,
+    Any,
+    Any,
+    TradingPnl,
+    IUnmatchedPool[Any, Any],
+    IMatchedPool[Any, Any]
+]
+
+
+def _replay_partition(
+        book_factory: Callable[[], PnlBook[Any, Any, Any, Any]],
+        initial: list[_Position],
+        trades: list[tuple[Any, Any, Any]],
+        context: Any
+) -> list[_Position]:
+    """Replay the trades of a partition in a worker.
+
+    Args:
+        book_factory (Callable[[], PnlBook[Any, Any, Any, Any]]): Creates
+            the book for the worker.
+        initial (list[_Position]): The positions held before the replay,
+            which have no trade.
+        trades (list[tuple[Any, Any, Any]]): The security, book and trade of
+            each trade in order.
+        context (Any): Some application context.
+
+    Returns:
+        list[_Position]: The positions after the replay.
+    """
+    pnl_book = book_factory()
+    for security, book, trade, pnl, unmatched, matched in initial:
+        pnl_book.store.set(security, book, trade, pnl, unmatched, matched, context)
+
+    # Every position with a trade in the partition is returned.
+    last: dict[tuple[Any, Any], tuple[Any, Any, Any]] = {}
+    for security, book, trade in trades:
+        pnl_book.add_trade(security, book, trade, context)
+        last[(security.key, book.key)] = (security, book, trade)
+
+    return [
+        (security, book, trade, *pnl_book.get(security, book, context))
+        for security, book, trade in last.values()
+    ]
+
+
+def replay_parallel[SecurityT: ISecurity, BookT: IBook, TradeT: ITrade, ContextT](
+        book_factory: Callable[[], PnlBook[SecurityT, BookT, TradeT, ContextT]],
+        trades: Iterable[tuple[SecurityT, BookT, TradeT]],
+        store: IPnlBookStore[SecurityT, BookT, TradeT, ContextT],
+        context: ContextT,
+        partitions: int | None = None,
+        executor: Executor | None = None
+) -> None:
+    """Replay trades in parallel, partitioned by security and book.
+
+    Positions already in the store are sent to the workers with their
+    trades, and the positions after the replay are written back to the
+    store with the last trade of each. A position is set in the store of a
+    worker with a trade of None before its first trade is added.
+
+    Args:
+        book_factory (Callable[[], PnlBook[SecurityT, BookT, TradeT, ContextT]]):
+            Creates an empty book in each worker. This must be picklable,
+            for example a module level function or class.
+        trades (Iterable[tuple[SecurityT, BookT, TradeT]]): The security,
+            book and trade of each trade in order.
+        store (IPnlBookStore[SecurityT, BookT, TradeT, ContextT]): The store
+            to update.
+        context (ContextT): Some application context.
+        partitions (int | None, optional): The number of partitions.
+            Defaults to the number of CPUs.
+        executor (Executor | None, optional): The executor to run the
+            partitions. Defaults to a process pool with a worker for each
+            partition.
+    """
+    count = partitions or os.cpu_count() or 1
+    initial: list[list[_Position]] = [[] for _ in range(count)]
+    partitioned: list[list[tuple[Any, Any, Any]]] = [[] for _ in range(count)]
+    seen: set[tuple[Any, Any]] = set()
+
+    for security, book, trade in trades:
+        key = (security.key, book.key)
+        index = hash(key) % count
+        if key not in seen:
+            seen.add(key)
+            if store.has(security, book, context):
+                initial[index].append(
+                    (security, book, None, *store.get(security, book, context))
+                )
+        partitioned[index].append((security, book, trade))
+
+    owns_executor = executor is None
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=count)
+    try:
+        futures = [
+            executor.submit(
+                _replay_partition,
+                book_factory,
+                initial[index],
+                partitioned[index],
+                context
+            )
+            for index in range(count)
+            if partitioned[index]
+        ]
+        for future in futures:
+            for security, book, trade, pnl, unmatched, matched in future.result():
+                store.set(security, book, trade, pnl, unmatched, matched, context)
+    finally:
+        if owns_executor:
+            executor.shutdown()
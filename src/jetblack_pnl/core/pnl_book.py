@@ -1,17 +1,39 @@
 """A P/L book"""
 
+from concurrent.futures import Executor
 from decimal import Decimal
-from typing import Callable
+from typing import Any, Callable, Iterable, Iterator, Sequence
 
-from .algorithm import add_trade
+from .algorithm import add_counted_trade
+from .instrumentation import TradeMetrics, instrumented_add_trade
 
 from .book import IBook
 from .matched_pool import IMatchedPool
 from .pnl_book_store import IPnlBookStore
 from .security import ISecurity
+from .subscriptions import PnlChange, PnlPublisher, Subscription
 from .trade import ITrade
 from .trading_pnl import TradingPnl
 from .unmatched_pool import IUnmatchedPool
+from .what_if import WhatIf, snapshot_unmatched_pool, what_if_trades
+
+
+def _what_if_job[TradeT: ITrade](
+        job: tuple[
+            TradingPnl,
+            Sequence[TradeT],
+            ISecurity,
+            IUnmatchedPool[TradeT, Any],
+            Any
+        ]
+) -> WhatIf[TradeT]:
+    """Evaluate a candidate of `PnlBook.what_if_many`.
+
+    This is a module level function of picklable arguments, so it may be
+    run by a process pool.
+    """
+    pnl, trades, security, unmatched, context = job
+    return what_if_trades(pnl, trades, security, unmatched, context)
 
 
 class PnlBook[SecurityT: ISecurity, BookT: IBook, TradeT: ITrade, ContextT]:
@@ -27,11 +49,71 @@ class PnlBook[SecurityT: ISecurity, BookT: IBook, TradeT: ITrade, ContextT]:
             unmatched_factory: Callable[
                 [SecurityT, BookT, ContextT],
                 IUnmatchedPool[TradeT, ContextT]
-            ]
+            ],
+            observer: Callable[
+                [SecurityT, BookT, TradeMetrics],
+                None
+            ] | None = None,
+            publisher: PnlPublisher | None = None
     ) -> None:
+        """Create the book.
+
+        Args:
+            store (IPnlBookStore[SecurityT, BookT, TradeT, ContextT]): The
+                store for the positions.
+            matched_factory (Callable[[SecurityT, BookT, ContextT], IMatchedPool[TradeT, ContextT]]):
+                Creates the matched pool for a new position.
+            unmatched_factory (Callable[[SecurityT, BookT, ContextT], IUnmatchedPool[TradeT, ContextT]]):
+                Creates the unmatched pool for a new position.
+            observer (Callable[[SecurityT, BookT, TradeMetrics], None] | None, optional):
+                If given, trades are added with instrumentation and the
+                metrics are reported to the observer. Defaults to None.
+            publisher (PnlPublisher | None, optional): The publisher of
+                changes in P/L, which may be shared between books. Defaults
+                to a new publisher.
+        """
         self._matched_factory = matched_factory
         self._unmatched_factory = unmatched_factory
         self._store = store
+        self._observer = observer
+        self._publisher = PnlPublisher() if publisher is None else publisher
+
+    @property
+    def store(self) -> IPnlBookStore[SecurityT, BookT, TradeT, ContextT]:
+        """The store of the positions"""
+        return self._store
+
+    @property
+    def publisher(self) -> PnlPublisher:
+        """The publisher of changes in P/L"""
+        return self._publisher
+
+    def subscribe(
+            self,
+            security_key: Any | None = None,
+            book_key: Any | None = None,
+            notify: Callable[[], None] | None = None
+    ) -> Subscription:
+        """Subscribe to the changes in P/L made by adding trades.
+
+        A change is published once a trade has been added and the position
+        stored. A sequence of trades added together publishes one change when
+        the position is stored after the last trade. The changes are
+        coalesced by security and book until they are read.
+
+        Args:
+            security_key (Any | None, optional): If given, only changes to
+                this security are received. Defaults to None.
+            book_key (Any | None, optional): If given, only changes to this
+                book are received. Defaults to None.
+            notify (Callable[[], None] | None, optional): Called by the
+                thread adding trades when a change arrives and none were
+                waiting. It must not block. Defaults to None.
+
+        Returns:
+            Subscription: The subscription.
+        """
+        return self._publisher.subscribe(security_key, book_key, notify)
 
     def get(
             self,
@@ -41,6 +123,62 @@ class PnlBook[SecurityT: ISecurity, BookT: IBook, TradeT: ITrade, ContextT]:
     ) -> tuple[TradingPnl, IUnmatchedPool[TradeT, ContextT], IMatchedPool[TradeT, ContextT]]:
         return self._store.get(security, book, context)
 
+    def _get_or_create(
+            self,
+            security: SecurityT,
+            book: BookT,
+            context: ContextT
+    ) -> tuple[TradingPnl, IUnmatchedPool[TradeT, ContextT], IMatchedPool[TradeT, ContextT]]:
+        if self._store.has(security, book, context):
+            return self._store.get(security, book, context)
+        else:
+            return (
+                TradingPnl(Decimal(0), Decimal(0), Decimal(0)),
+                self._unmatched_factory(security, book, context),
+                self._matched_factory(security, book, context),
+            )
+
+    def _add_trade(
+            self,
+            pnl: TradingPnl,
+            security: SecurityT,
+            book: BookT,
+            trade: TradeT,
+            unmatched: IUnmatchedPool[TradeT, ContextT],
+            matched: IMatchedPool[TradeT, ContextT],
+            context: ContextT
+    ) -> tuple[TradingPnl, int]:
+        """Add a trade, returning the P/L and the number of opening lots
+        matched"""
+        observer = self._observer
+        if observer is None:
+            return add_counted_trade(
+                pnl,
+                trade,
+                security,
+                unmatched,
+                matched,
+                context
+            )
+
+        lots = 0
+
+        def report(metrics: TradeMetrics) -> None:
+            nonlocal lots
+            lots = metrics.lots
+            observer(security, book, metrics)
+
+        result = instrumented_add_trade(
+            pnl,
+            trade,
+            security,
+            unmatched,
+            matched,
+            context,
+            report
+        )
+        return result, lots
+
     def add_trade(
         self,
         security: SecurityT,
@@ -48,14 +186,189 @@ class PnlBook[SecurityT: ISecurity, BookT: IBook, TradeT: ITrade, ContextT]:
         trade: TradeT,
         context: ContextT
     ) -> TradingPnl:
-        if self._store.has(security, book, context):
-            pnl, unmatched, matched = self._store.get(security, book, context)
-        else:
-            pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
-            unmatched = self._unmatched_factory(security, book, context)
-            matched = self._matched_factory(security, book, context)
-
-        pnl = add_trade(pnl, trade, security, unmatched, matched, context)
+        previous, unmatched, matched = self._get_or_create(security, book, context)
+        publishing = self._publisher.active
+        pnl, lots = self._add_trade(
+            previous,
+            security,
+            book,
+            trade,
+            unmatched,
+            matched,
+            context
+        )
         self._store.set(security, book, trade, pnl,
                         unmatched, matched, context)
+        if publishing:
+            self._publisher.publish(PnlChange(security, book, previous, pnl, lots))
+        return pnl
+
+    def iter_add_trades(
+        self,
+        security: SecurityT,
+        book: BookT,
+        trades: Iterable[TradeT],
+        context: ContextT
+    ) -> Iterator[TradingPnl]:
+        """Add a sequence of trades for a single security and book, yielding
+        the P/L after each trade.
+
+        The store is read once before the first trade, and written once with
+        the last trade when the generator is exhausted or closed. A single
+        change for all the trades is then published.
+
+        Args:
+            security (SecurityT): The security.
+            book (BookT): The book.
+            trades (Iterable[TradeT]): The trades to add in order.
+            context (ContextT): Some application context.
+
+        Yields:
+            TradingPnl: The P/L after each trade.
+        """
+        return self._iter_add_trades(security, book, trades, context)
+
+    def _iter_add_trades(
+        self,
+        security: SecurityT,
+        book: BookT,
+        trades: Iterable[TradeT],
+        context: ContextT
+    ) -> Iterator[TradingPnl]:
+        previous, unmatched, matched = self._get_or_create(security, book, context)
+        publishing = self._publisher.active
+        pnl = previous
+        lots = 0
+        last_trade: TradeT | None = None
+        try:
+            for trade in trades:
+                pnl, trade_lots = self._add_trade(
+                    pnl,
+                    security,
+                    book,
+                    trade,
+                    unmatched,
+                    matched,
+                    context
+                )
+                lots += trade_lots
+                last_trade = trade
+                yield pnl
+        finally:
+            if last_trade is not None:
+                self._store.set(security, book, last_trade, pnl,
+                                unmatched, matched, context)
+                if publishing:
+                    self._publisher.publish(
+                        PnlChange(security, book, previous, pnl, lots)
+                    )
+
+    def add_trades(
+        self,
+        security: SecurityT,
+        book: BookT,
+        trades: Iterable[TradeT],
+        context: ContextT
+    ) -> TradingPnl:
+        """Add a sequence of trades for a single security and book.
+
+        The store is read once before the first trade, and written once with
+        the last trade.
+
+        Args:
+            security (SecurityT): The security.
+            book (BookT): The book.
+            trades (Iterable[TradeT]): The trades to add in order.
+            context (ContextT): Some application context.
+
+        Returns:
+            TradingPnl: The P/L after the last trade.
+        """
+        pnl: TradingPnl | None = None
+        for pnl in self._iter_add_trades(security, book, trades, context):
+            pass
+        if pnl is None:
+            pnl, _unmatched, _matched = self._get_or_create(
+                security,
+                book,
+                context
+            )
         return pnl
+
+    def what_if(
+        self,
+        security: SecurityT,
+        book: BookT,
+        trades: Iterable[TradeT],
+        context: ContextT
+    ) -> WhatIf[TradeT]:
+        """Evaluate hypothetical trades for a single security and book
+        without changing the position.
+
+        The trades are added in order to a snapshot of the position, and the
+        snapshot is discarded.
+
+        Args:
+            security (SecurityT): The security.
+            book (BookT): The book.
+            trades (Iterable[TradeT]): The hypothetical trades in order.
+            context (ContextT): Some application context.
+
+        Raises:
+            TypeError: If the unmatched pool does not support snapshots.
+
+        Returns:
+            WhatIf[TradeT]: The P/L and matches the trades would produce.
+        """
+        pnl, unmatched, _matched = self._get_or_create(security, book, context)
+        return what_if_trades(pnl, trades, security, unmatched, context)
+
+    def _what_if_position(
+            self,
+            security: SecurityT,
+            book: BookT,
+            context: ContextT
+    ) -> tuple[TradingPnl, IUnmatchedPool[TradeT, ContextT]]:
+        """The P/L of a position and a snapshot of its unmatched pool"""
+        pnl, unmatched, _matched = self._get_or_create(security, book, context)
+        return pnl, snapshot_unmatched_pool(unmatched)
+
+    def what_if_many(
+        self,
+        candidates: Iterable[tuple[SecurityT, BookT, Sequence[TradeT]]],
+        context: ContextT,
+        executor: Executor | None = None
+    ) -> list[WhatIf[TradeT]]:
+        """Evaluate candidate batches of hypothetical trades, each against
+        the current positions.
+
+        Each candidate has its own snapshot, so the candidates do not affect
+        each other and may be evaluated in parallel. The positions are read,
+        and their snapshots taken, in the calling thread. The executor is
+        given the P/L, trades, security, snapshot and context of each
+        candidate, which must be picklable for a process pool, but not the
+        book or its store.
+
+        Args:
+            candidates (Iterable[tuple[SecurityT, BookT, Sequence[TradeT]]]):
+                The security, book and trades of each candidate.
+            context (ContextT): Some application context.
+            executor (Executor | None, optional): If given, the candidates
+                are evaluated on the executor. Defaults to None.
+
+        Raises:
+            TypeError: If an unmatched pool does not support snapshots.
+
+        Returns:
+            list[WhatIf[TradeT]]: The outcome of each candidate in order.
+        """
+        if executor is None:
+            return [
+                self.what_if(security, book, trades, context)
+                for security, book, trades in candidates
+            ]
+        jobs = []
+        for security, book, trades in candidates:
+            pnl, unmatched = self._what_if_position(security, book, context)
+            jobs.append((pnl, trades, security, unmatched, context))
+        return list(executor.map(_what_if_job, jobs))
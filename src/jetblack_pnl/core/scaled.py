@@ -0,0 +1,461 @@
+"""Scaled integer arithmetic for P/L
+
+When the number of decimal places used for the prices and quantities of a
+security is known in advance, the values can be held as plain integers in
+"scaled units" (the value multiplied by a power of ten). Addition, subtraction
+and multiplication of integers are exact, so matching in scaled units produces
+the same results as the decimal path.
+
+The scaled values are used throughout the matching: the trades in the pools,
+the split trades, the matched quantities and the P/L, which is held in a
+`ScaledPnl`. A `ScaledSecurity` converts between the two representations at
+the API boundary. The pools only add, subtract and compare the quantities of
+their lots, so the pools of the decimal path hold scaled lots unchanged.
+
+Matching in scaled units takes the same steps as the decimal path, so only
+the arithmetic is cheaper. `benchmarks/bench_scaled.py` measures the gain.
+
+* Quantities are held with `quantity_scale` decimal places.
+* Prices are held with `price_scale` decimal places.
+* Costs and realized P/L are held with `price_scale + quantity_scale` decimal
+  places.
+"""
+
+from decimal import Decimal
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Protocol,
+    Sequence,
+    cast,
+    runtime_checkable,
+)
+
+from .algorithm import _capabilities
+from .average_cost import AverageCostPool
+from .matched_pool import IMatchedPool, NullMatchedPool
+from .security import ISecurity
+from .split_trade import SplitTrade
+from .trade import ITrade
+from .trading_pnl import TradingPnl
+from .unmatched_pool import (
+    IUnmatchedPool,
+    IConsumableUnmatchedPool,
+    IReducibleUnmatchedPool,
+)
+
+
+@runtime_checkable
+class IScaledSecurity[KeyT](ISecurity[KeyT], Protocol):
+    """A security which declares the precision of its prices and quantities"""
+
+    @property
+    def price_scale(self) -> int:
+        """The number of decimal places used for prices"""
+
+    @property
+    def quantity_scale(self) -> int:
+        """The number of decimal places used for quantities"""
+
+
+def to_scaled(value: Decimal | int, scale: int) -> int:
+    """Convert a value to scaled units.
+
+    Args:
+        value (Decimal | int): The value to convert.
+        scale (int): The number of decimal places.
+
+    Raises:
+        ValueError: If the value has more decimal places than the scale.
+
+    Returns:
+        int: The value in scaled units.
+    """
+    scaled = Decimal(value).scaleb(scale)
+    result = int(scaled)
+    if result != scaled:
+        raise ValueError(
+            f"{value} cannot be represented with {scale} decimal places"
+        )
+    return result
+
+
+def from_scaled(value: int, scale: int) -> Decimal:
+    """Convert a value from scaled units.
+
+    Args:
+        value (int): The value in scaled units.
+        scale (int): The number of decimal places.
+
+    Returns:
+        Decimal: The value.
+    """
+    return Decimal(value).scaleb(-scale)
+
+
+class ScaledPnl(NamedTuple):
+    """A trading P/L in scaled units.
+
+    The quantity has the quantity scale of the security, and the cost and
+    realized P/L have the sum of the price and quantity scales.
+    """
+    quantity: int
+    cost: int
+    realized: int
+
+
+class ScaledTrade[TradeT: ITrade]:
+    """A trade with the quantity and price in scaled units"""
+
+    __slots__ = ('_trade', '_quantity', '_price')
+
+    def __init__(self, trade: TradeT, quantity: int, price: int) -> None:
+        self._trade = trade
+        self._quantity = quantity
+        self._price = price
+
+    @property
+    def key(self) -> Any:
+        """The key of the underlying trade"""
+        return self._trade.key
+
+    @property
+    def quantity(self) -> int:
+        """The quantity in scaled units"""
+        return self._quantity
+
+    @property
+    def price(self) -> int:
+        """The price in scaled units"""
+        return self._price
+
+    @property
+    def trade(self) -> TradeT:
+        """The underlying trade"""
+        return self._trade
+
+    def __eq__(self, value: object) -> bool:
+        return (
+            isinstance(value, ScaledTrade) and
+            value.quantity == self.quantity and
+            value.price == self.price and
+            value.trade == self.trade
+        )
+
+    def __repr__(self) -> str:
+        return repr(self._trade)
+
+
+class ScaledSecurity[KeyT]:
+    """A view of a security for scaled integer arithmetic.
+
+    The contract size must be integral.
+    """
+
+    __slots__ = (
+        '_security',
+        '_contract_size',
+        '_price_scale',
+        '_quantity_scale',
+        '_cost_scale',
+    )
+
+    def __init__(self, security: IScaledSecurity[KeyT]) -> None:
+        self._security = security
+        self._contract_size = to_scaled(security.contract_size, 0)
+        self._price_scale = security.price_scale
+        self._quantity_scale = security.quantity_scale
+        self._cost_scale = security.price_scale + security.quantity_scale
+
+    @property
+    def key(self) -> KeyT:
+        """The key for the security"""
+        return self._security.key
+
+    @property
+    def contract_size(self) -> int:
+        """The contract size as an integer"""
+        return self._contract_size
+
+    @property
+    def is_cash(self) -> bool:
+        """True if the security is cash"""
+        return self._security.is_cash
+
+    @property
+    def security(self) -> IScaledSecurity[KeyT]:
+        """The underlying security"""
+        return self._security
+
+    def scale_trade[TradeT: ITrade](self, trade: TradeT) -> ScaledTrade[TradeT]:
+        """Convert a trade to scaled units.
+
+        Args:
+            trade (TradeT): The trade.
+
+        Returns:
+            ScaledTrade[TradeT]: The trade in scaled units.
+        """
+        return ScaledTrade(
+            trade,
+            to_scaled(trade.quantity, self._quantity_scale),
+            to_scaled(trade.price, self._price_scale)
+        )
+
+    def scale_pnl(self, pnl: TradingPnl) -> ScaledPnl:
+        """Convert a decimal P/L to scaled units"""
+        return ScaledPnl(
+            to_scaled(pnl.quantity, self._quantity_scale),
+            to_scaled(pnl.cost, self._cost_scale),
+            to_scaled(pnl.realized, self._cost_scale),
+        )
+
+    def unscale_pnl(self, pnl: ScaledPnl) -> TradingPnl:
+        """Convert a P/L in scaled units to decimals"""
+        return TradingPnl(
+            from_scaled(pnl.quantity, self._quantity_scale),
+            from_scaled(pnl.cost, self._cost_scale),
+            from_scaled(pnl.realized, self._cost_scale),
+        )
+
+    def unscale_lot(
+            self,
+            lot: SplitTrade[Any]
+    ) -> SplitTrade[Any]:
+        """Convert an unmatched lot in scaled units to decimals"""
+        return SplitTrade(
+            from_scaled(_scaled_quantity(lot), self._quantity_scale),
+            lot.trade.trade
+        )
+
+    def unscale_match[TradeT: ITrade](
+            self,
+            match: tuple[Decimal, ScaledTrade[TradeT], ScaledTrade[TradeT]]
+    ) -> tuple[Decimal, TradeT, TradeT]:
+        """Convert a matched pool entry in scaled units to decimals"""
+        closing_quantity, opening_trade, closing_trade = match
+        return (
+            from_scaled(cast(int, closing_quantity), self._quantity_scale),
+            opening_trade.trade,
+            closing_trade.trade
+        )
+
+
+def _scaled_lot(quantity: int, trade: ScaledTrade[Any]) -> SplitTrade[Any]:
+    """Make a lot of a trade in scaled units.
+
+    The pools only add, subtract and compare the quantities of their lots,
+    so a lot holds a scaled quantity where a decimal is declared.
+    """
+    return SplitTrade(cast(Decimal, quantity), trade)
+
+
+def _scaled_quantity(lot: SplitTrade[Any]) -> int:
+    """The remaining quantity of a lot in scaled units"""
+    return cast(int, lot.remaining_quantity)
+
+
+def _take_scaled_lots[ContextT](
+        remaining: int,
+        closing: SplitTrade[Any],
+        unmatched: IUnmatchedPool[Any, ContextT],
+        context: ContextT
+) -> Sequence[SplitTrade[Any]]:
+    """Take the opening lots which match a closing quantity from a pool.
+
+    Args:
+        remaining (int): The closing quantity in scaled units.
+        closing (SplitTrade[Any]): The closing lot.
+        unmatched (IUnmatchedPool[Any, ContextT]): The pool of unmatched
+            scaled trades.
+        context (ContextT): Some application context.
+
+    Returns:
+        Sequence[SplitTrade[Any]]: The matched lots, the last of which is
+            split if it was larger than the closing quantity.
+    """
+    is_consumable, is_reducible = _capabilities(unmatched)
+    if is_consumable:
+        return cast(IConsumableUnmatchedPool[Any, ContextT], unmatched).consume(
+            cast(Decimal, remaining),
+            closing,
+            context
+        )
+
+    reducible = cast(IReducibleUnmatchedPool[Any, ContextT], unmatched)
+    taken: list[SplitTrade[Any]] = []
+    while remaining != 0 and unmatched.has(closing, context):
+        if is_reducible:
+            opening = reducible.peek(closing, context)
+        else:
+            opening = unmatched.pop(closing, context)
+        opening_quantity = _scaled_quantity(opening)
+        matched_quantity = (
+            -remaining
+            if abs(remaining) < abs(opening_quantity)
+            else opening_quantity
+        )
+        if is_reducible:
+            reducible.reduce(cast(Decimal, matched_quantity), closing, context)
+        elif matched_quantity != opening_quantity:
+            unmatched.insert(
+                _scaled_lot(opening_quantity - matched_quantity, opening.trade),
+                context
+            )
+        taken.append(
+            opening
+            if matched_quantity == opening_quantity
+            else _scaled_lot(matched_quantity, opening.trade)
+        )
+        remaining += matched_quantity
+    return taken
+
+
+def add_scaled_trade[TradeT: ITrade, KeyT, ContextT](
+        pnl: ScaledPnl,
+        trd: ScaledTrade[TradeT],
+        sec: ScaledSecurity[KeyT],
+        unmatched: IUnmatchedPool[Any, ContextT],
+        matched: IMatchedPool[Any, ContextT],
+        context: ContextT
+) -> ScaledPnl:
+    """Add a trade to a position held in scaled units.
+
+    Trades are converted with `ScaledSecurity.scale_trade` when they enter
+    the system, so the conversion is not repeated when trades are replayed.
+    A trade which reduces the position is matched with the lots of the
+    unmatched pool, and any part left over opens a position on the other
+    side.
+
+    Args:
+        pnl (ScaledPnl): The current P/L in scaled units.
+        trd (ScaledTrade[TradeT]): The trade in scaled units.
+        sec (ScaledSecurity[KeyT]): The scaled view of the security.
+        unmatched (IUnmatchedPool[Any, ContextT]): The pool of unmatched
+            scaled trades.
+        matched (IMatchedPool[Any, ContextT]): The pool of matched scaled
+            trades.
+        context (ContextT): Some application context.
+
+    Raises:
+        TypeError: If the unmatched pool is an `AverageCostPool`. Releasing
+            cost at the average is a division, so cannot be held exactly in
+            scaled units.
+
+    Returns:
+        ScaledPnl: The P/L in scaled units.
+    """
+    if isinstance(unmatched, AverageCostPool):
+        raise TypeError("average cost accounting is not supported in scaled units")
+
+    quantity, cost, realized = pnl
+    remaining = trd.quantity
+
+    if sec.is_cash:
+        # Cash trades are always realized.
+        return ScaledPnl(
+            0,
+            0,
+            realized + remaining * 10 ** sec.security.price_scale
+        )
+
+    contract_size = sec.contract_size
+    close_price = trd.price
+
+    if quantity != 0 and (quantity > 0) != (remaining > 0):
+        # The trade reduces the position.
+        is_recording = not isinstance(matched, NullMatchedPool)
+        for opening in _take_scaled_lots(
+                remaining,
+                _scaled_lot(remaining, trd),
+                unmatched,
+                context
+        ):
+            matched_quantity = _scaled_quantity(opening)
+            if is_recording:
+                matched.append(
+                    cast(Decimal, -matched_quantity),
+                    opening.trade,
+                    trd,
+                    context
+                )
+            open_cost = matched_quantity * contract_size * opening.trade.price
+            quantity -= matched_quantity
+            cost += open_cost
+            realized += matched_quantity * contract_size * close_price - open_cost
+            remaining += matched_quantity
+
+    if remaining != 0:
+        # The trade extends the position, or what is left of it opens a
+        # position on the other side.
+        unmatched.append(_scaled_lot(remaining, trd), context)
+        quantity += remaining
+        cost -= remaining * contract_size * close_price
+
+    return ScaledPnl(quantity, cost, realized)
+
+
+def iter_add_scaled_trades[TradeT: ITrade, KeyT, ContextT](
+        pnl: ScaledPnl,
+        trades: Iterable[ScaledTrade[TradeT]],
+        sec: ScaledSecurity[KeyT],
+        unmatched: IUnmatchedPool[Any, ContextT],
+        matched: IMatchedPool[Any, ContextT],
+        context: ContextT
+) -> Iterator[ScaledPnl]:
+    """Add a sequence of trades to a position held in scaled units, yielding
+    the P/L after each trade.
+
+    Args:
+        pnl (ScaledPnl): The current P/L in scaled units.
+        trades (Iterable[ScaledTrade[TradeT]]): The trades in scaled units.
+        sec (ScaledSecurity[KeyT]): The scaled view of the security.
+        unmatched (IUnmatchedPool[Any, ContextT]): The pool of unmatched
+            scaled trades.
+        matched (IMatchedPool[Any, ContextT]): The pool of matched scaled
+            trades.
+        context (ContextT): Some application context.
+
+    Yields:
+        ScaledPnl: The P/L in scaled units after each trade.
+    """
+    for trd in trades:
+        pnl = add_scaled_trade(pnl, trd, sec, unmatched, matched, context)
+        yield pnl
+
+
+def add_scaled_trades[TradeT: ITrade, KeyT, ContextT](
+        pnl: ScaledPnl,
+        trades: Iterable[ScaledTrade[TradeT]],
+        sec: ScaledSecurity[KeyT],
+        unmatched: IUnmatchedPool[Any, ContextT],
+        matched: IMatchedPool[Any, ContextT],
+        context: ContextT
+) -> ScaledPnl:
+    """Add a sequence of trades to a position held in scaled units.
+
+    Args:
+        pnl (ScaledPnl): The current P/L in scaled units.
+        trades (Iterable[ScaledTrade[TradeT]]): The trades in scaled units.
+        sec (ScaledSecurity[KeyT]): The scaled view of the security.
+        unmatched (IUnmatchedPool[Any, ContextT]): The pool of unmatched
+            scaled trades.
+        matched (IMatchedPool[Any, ContextT]): The pool of matched scaled
+            trades.
+        context (ContextT): Some application context.
+
+    Returns:
+        ScaledPnl: The P/L in scaled units after the last trade.
+    """
+    for current in iter_add_scaled_trades(
+            pnl,
+            trades,
+            sec,
+            unmatched,
+            matched,
+            context
+    ):
+        pnl = current
+    return pnl
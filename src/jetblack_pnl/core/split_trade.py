@@ -9,6 +9,8 @@ from .trade import ITrade
 class SplitTrade[TradeT: ITrade]:
     """A split trade can or has been split from a larger trade"""
 
+    __slots__ = ('_remaining_quantity', '_trade')
+
     def __init__(
             self,
             remaining_quantity: Decimal,
@@ -0,0 +1,223 @@
+"""Subscriptions to changes in P/L
+
+A `PnlBook` publishes a change once it has stored the position after adding
+a trade, or a sequence of trades for one security and book. The change gives
+the security, the book, the P/L before and after, and the number of lots
+matched.
+Subscribers register with a `PnlPublisher`, optionally for a single security,
+book, or security and book.
+
+Each subscription coalesces its changes by security and book key. A slow
+reader sees the latest P/L of each key changed since its last read, rather
+than every change, and publishing never waits for a reader.
+
+Subscriptions are indexed by their filter, so publishing a change only visits
+the subscriptions which want it.
+"""
+
+from threading import Lock
+from typing import Any, Callable, NamedTuple
+
+from .book import IBook
+from .security import ISecurity
+from .trading_pnl import TradingPnl
+
+
+class PnlChange[SecurityT: ISecurity, BookT: IBook](NamedTuple):
+    """A change in the P/L of a security and book"""
+    security: SecurityT
+    """The security"""
+    book: BookT
+    """The book"""
+    previous: TradingPnl
+    """The P/L before the change"""
+    pnl: TradingPnl
+    """The P/L after the change"""
+    lots: int
+    """The number of opening lots matched"""
+
+
+class Subscription:
+    """A subscription to changes in P/L.
+
+    Changes are held until they are read. A change to a key which already
+    has a change waiting is merged into it, keeping the earlier previous P/L
+    and the later P/L, and adding the lots matched.
+    """
+
+    def __init__(
+            self,
+            publisher: 'PnlPublisher',
+            security_key: Any | None,
+            book_key: Any | None,
+            notify: Callable[[], None] | None
+    ) -> None:
+        self._publisher = publisher
+        self._security_key = security_key
+        self._book_key = book_key
+        self._notify = notify
+        self._lock = Lock()
+        self._pending: dict[tuple[Any, Any], PnlChange[Any, Any]] = {}
+        self._coalesced = 0
+
+    @property
+    def security_key(self) -> Any | None:
+        """The key of the security subscribed to, or None for all"""
+        return self._security_key
+
+    @property
+    def book_key(self) -> Any | None:
+        """The key of the book subscribed to, or None for all"""
+        return self._book_key
+
+    @property
+    def pending(self) -> int:
+        """The number of keys with a change waiting to be read"""
+        return len(self._pending)
+
+    @property
+    def coalesced(self) -> int:
+        """The number of changes merged into a change already waiting"""
+        return self._coalesced
+
+    def _push(self, key: tuple[Any, Any], change: PnlChange[Any, Any]) -> None:
+        with self._lock:
+            waiting = self._pending.get(key)
+            if waiting is None:
+                self._pending[key] = change
+                wake = len(self._pending) == 1
+            else:
+                self._pending[key] = change._replace(
+                    previous=waiting.previous,
+                    lots=waiting.lots + change.lots
+                )
+                self._coalesced += 1
+                wake = False
+        if wake and self._notify is not None:
+            self._notify()
+
+    def read(self) -> list[PnlChange[Any, Any]]:
+        """Take the waiting changes.
+
+        Returns:
+            list[PnlChange[Any, Any]]: A change for each key changed since
+                the last read, in the order the keys first changed.
+        """
+        with self._lock:
+            changes = list(self._pending.values())
+            self._pending = {}
+        return changes
+
+    def close(self) -> None:
+        """Stop receiving changes"""
+        self._publisher.unsubscribe(self)
+
+
+type _Index = dict[Any, tuple[Subscription, ...]]
+
+
+class PnlPublisher:
+    """Dispatches changes in P/L to subscriptions.
+
+    The subscriptions are indexed by security key, book key, and security
+    and book key. Publishing looks up each index once, and may run while
+    other threads subscribe and unsubscribe.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._all: tuple[Subscription, ...] = ()
+        self._by_security: _Index = {}
+        self._by_book: _Index = {}
+        self._by_key: _Index = {}
+        self._count = 0
+
+    @property
+    def active(self) -> bool:
+        """True if there are any subscriptions"""
+        return self._count > 0
+
+    def subscribe(
+            self,
+            security_key: Any | None = None,
+            book_key: Any | None = None,
+            notify: Callable[[], None] | None = None
+    ) -> Subscription:
+        """Subscribe to changes.
+
+        Args:
+            security_key (Any | None, optional): If given, only changes to
+                this security are received. Defaults to None.
+            book_key (Any | None, optional): If given, only changes to this
+                book are received. Defaults to None.
+            notify (Callable[[], None] | None, optional): Called by the
+                publishing thread when a change arrives and none were
+                waiting. It must not block. Defaults to None.
+
+        Returns:
+            Subscription: The subscription.
+        """
+        subscription = Subscription(self, security_key, book_key, notify)
+        with self._lock:
+            # The indices are replaced rather than changed, so publishing
+            # needs no lock.
+            index, key = self._index(security_key, book_key)
+            if index is None:
+                self._all = (*self._all, subscription)
+            else:
+                index[key] = (*index.get(key, ()), subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscription.
+
+        Args:
+            subscription (Subscription): The subscription.
+        """
+        with self._lock:
+            index, key = self._index(
+                subscription.security_key,
+                subscription.book_key
+            )
+            subscriptions = self._all if index is None else index.get(key, ())
+            if subscription not in subscriptions:
+                return
+            remaining = tuple(s for s in subscriptions if s is not subscription)
+            if index is None:
+                self._all = remaining
+            elif remaining:
+                index[key] = remaining
+            else:
+                del index[key]
+            self._count -= 1
+
+    def _index(
+            self,
+            security_key: Any | None,
+            book_key: Any | None
+    ) -> tuple[_Index | None, Any]:
+        if security_key is None and book_key is None:
+            return None, None
+        if book_key is None:
+            return self._by_security, security_key
+        if security_key is None:
+            return self._by_book, book_key
+        return self._by_key, (security_key, book_key)
+
+    def publish(self, change: PnlChange[Any, Any]) -> None:
+        """Publish a change to the subscriptions which want it.
+
+        Args:
+            change (PnlChange[Any, Any]): The change.
+        """
+        security_key, book_key = change.security.key, change.book.key
+        key = (security_key, book_key)
+        for subscriptions in (
+            self._all,
+            self._by_security.get(security_key, ()),
+            self._by_book.get(book_key, ()),
+            self._by_key.get(key, ()),
+        ):
+            for subscription in subscriptions:
+                subscription._push(key, change)
@@ -1,6 +1,7 @@
 """An interface for an unmatched pool.
 """
 
+from decimal import Decimal
 from typing import Protocol, Sequence, runtime_checkable
 
 from .split_trade import SplitTrade
@@ -41,3 +42,92 @@ class IUnmatchedPool[TradeT: ITrade, ContextT](Protocol):  # type: ignore
 
     def pool(self, context: ContextT) -> Sequence[SplitTrade[TradeT]]:
         ...
+
+
+@runtime_checkable
+class IReducibleUnmatchedPool[TradeT: ITrade, ContextT](  # type: ignore
+    IUnmatchedPool[TradeT, ContextT],
+    Protocol
+):
+    """A pool of unmatched trades which can reduce the next opening trade in
+    place.
+
+    When a pool supports this the algorithm uses `peek` and `reduce` rather
+    than `pop` followed by `insert` to partially match an opening trade.
+    """
+
+    def peek(
+            self,
+            closing: SplitTrade[TradeT],
+            context: ContextT
+    ) -> SplitTrade[TradeT]:
+        """Return the opening trade the next `pop` would return without
+        removing it."""
+
+    def reduce(
+            self,
+            quantity: Decimal,
+            closing: SplitTrade[TradeT],
+            context: ContextT
+    ) -> None:
+        """Reduce the remaining quantity of the opening trade returned by
+        `peek`, removing it if nothing remains.
+
+        The quantity has the same sign as the opening trade.
+        """
+
+
+@runtime_checkable
+class IConsumableUnmatchedPool[TradeT: ITrade, ContextT](  # type: ignore
+    IUnmatchedPool[TradeT, ContextT],
+    Protocol
+):
+    """A pool of unmatched trades which can provide all the opening trades for
+    a closing trade in a single operation.
+
+    When a pool supports this the algorithm uses `consume` in preference to
+    taking the opening trades one at a time.
+    """
+
+    def consume(
+            self,
+            quantity: Decimal,
+            closing: SplitTrade[TradeT],
+            context: ContextT
+    ) -> Sequence[SplitTrade[TradeT]]:
+        """Remove and return the opening trades to match a closing quantity.
+
+        The opening trades are returned in the order they would have been
+        popped. If the last opening trade is larger than required it is split,
+        and the unmatched part is returned to the pool. If the pool holds less
+        than the closing quantity all of the opening trades are returned.
+
+        Args:
+            quantity (Decimal): The closing quantity.
+            closing (SplitTrade[TradeT]): The closing trade.
+            context (ContextT): Some application context.
+
+        Returns:
+            Sequence[SplitTrade[TradeT]]: The matched opening trades.
+        """
+
+
+@runtime_checkable
+class ISnapshotUnmatchedPool[TradeT: ITrade, ContextT](  # type: ignore
+    IUnmatchedPool[TradeT, ContextT],
+    Protocol
+):
+    """A pool of unmatched trades which can take a snapshot of itself.
+
+    A what-if evaluation matches hypothetical trades against a snapshot, and
+    cannot be made against a pool without this.
+    """
+
+    def snapshot(self) -> IUnmatchedPool[TradeT, ContextT]:
+        """Take a snapshot of the pool.
+
+        Returns:
+            IUnmatchedPool[TradeT, ContextT]: A pool of the same type which
+                is unaffected by later changes to this pool, and which does
+                not affect this pool when changed.
+        """
@@ -0,0 +1,111 @@
+"""What-if evaluation of hypothetical trades
+
+A what-if evaluation adds trades to a snapshot of a position and returns the
+P/L and the matches they would produce, leaving the position unchanged. The
+matches are recorded in a fresh list, so the matched pool of the position is
+never touched.
+
+The position is evaluated against a snapshot of its unmatched pool, so the
+pool must support `snapshot`. The cost depends on the pool. The persistent
+pools of the simple implementation take a snapshot in O(1) and each lot
+touched costs O(log N). The FIFO pool shares its list of lots with the
+snapshot, and each pool holds its own changes, so a snapshot is O(1). The
+LIFO and best and worst price pools share a tuple, which is copied on the
+first change to either pool, which is O(N). The other pools of the simple
+implementation copy their lots when the snapshot is taken, which is O(N).
+Pools which cannot take a snapshot, such as those held in a database, cannot
+be evaluated, as a copy might write to the database.
+"""
+
+from decimal import Decimal
+from typing import Iterable, NamedTuple, Sequence
+
+from .algorithm import add_trade
+from .matched_pool import IMatchedPool
+from .security import ISecurity
+from .trade import ITrade
+from .trading_pnl import TradingPnl
+from .unmatched_pool import IUnmatchedPool, ISnapshotUnmatchedPool
+
+
+class WhatIf[TradeT: ITrade](NamedTuple):
+    """The outcome of hypothetical trades"""
+    pnl: TradingPnl
+    """The P/L after the last trade"""
+    pnls: tuple[TradingPnl, ...]
+    """The P/L after each trade"""
+    matches: tuple[tuple[Decimal, TradeT, TradeT], ...]
+    """The matches the trades would make, as (closing quantity, opening
+    trade, closing trade)"""
+
+
+class _RecordingMatchedPool[TradeT: ITrade, ContextT](IMatchedPool[TradeT, ContextT]):
+    """A matched pool which collects the matches of an evaluation"""
+
+    def __init__(self) -> None:
+        self.matches: list[tuple[Decimal, TradeT, TradeT]] = []
+
+    def append(
+            self,
+            closing_quantity: Decimal,
+            opening_trade: TradeT,
+            closing_trade: TradeT,
+            context: ContextT
+    ) -> None:
+        self.matches.append((closing_quantity, opening_trade, closing_trade))
+
+    def pool(self, context: ContextT) -> Sequence[tuple[Decimal, TradeT, TradeT]]:
+        return self.matches
+
+
+def snapshot_unmatched_pool[TradeT: ITrade, ContextT](
+        unmatched: IUnmatchedPool[TradeT, ContextT]
+) -> IUnmatchedPool[TradeT, ContextT]:
+    """Take a copy of an unmatched pool which can be changed independently.
+
+    Args:
+        unmatched (IUnmatchedPool[TradeT, ContextT]): The pool.
+
+    Raises:
+        TypeError: If the pool does not support snapshots.
+
+    Returns:
+        IUnmatchedPool[TradeT, ContextT]: The snapshot of the pool.
+    """
+    if not isinstance(unmatched, ISnapshotUnmatchedPool):
+        raise TypeError(
+            f"cannot take a snapshot of a '{type(unmatched).__name__}' pool"
+        )
+    return unmatched.snapshot()
+
+
+def what_if_trades[TradeT: ITrade, SecurityT: ISecurity, ContextT](
+        pnl: TradingPnl,
+        trades: Iterable[TradeT],
+        sec: SecurityT,
+        unmatched: IUnmatchedPool[TradeT, ContextT],
+        context: ContextT
+) -> WhatIf[TradeT]:
+    """Evaluate trades against a position without changing it.
+
+    Args:
+        pnl (TradingPnl): The current P/L.
+        trades (Iterable[TradeT]): The hypothetical trades in order.
+        sec (SecurityT): The security.
+        unmatched (IUnmatchedPool[TradeT, ContextT]): The pool of unmatched
+            trades, which is not changed.
+        context (ContextT): Some application context.
+
+    Raises:
+        TypeError: If the unmatched pool does not support snapshots.
+
+    Returns:
+        WhatIf[TradeT]: The P/L and matches the trades would produce.
+    """
+    overlay = snapshot_unmatched_pool(unmatched)
+    matched: _RecordingMatchedPool[TradeT, ContextT] = _RecordingMatchedPool()
+    pnls: list[TradingPnl] = []
+    for trade in trades:
+        pnl = add_trade(pnl, trade, sec, overlay, matched, context)
+        pnls.append(pnl)
+    return WhatIf(pnl, tuple(pnls), tuple(matched.matches))
@@ -1,19 +1,42 @@
 """A simple implementation for demonstrating and testing the P&L algorithm"""
 
 from .book import Book
-from .matched_pool import MatchedPool
+from .checkpoint import (
+    LazyPnlBookStore,
+    load_checkpoint,
+    restore_matched_pool,
+    restore_unmatched_pool,
+    save_checkpoint,
+)
+from .matched_pool import (
+    ChunkedMatchedPool,
+    MatchedPool,
+    MatchSummary,
+    SummarizingMatchedPool,
+)
 from .pnl_book_store import PnlBookStore
 from .pnl_book import SimplePnlBook
 from .security import Security
-from .trade import Trade
+from .spilling_pnl_book_store import SpillingPnlBookStore
+from .trade import CoalescedTrade, Trade
 from .unmatched_pools import UnmatchedPool
 
 __all__ = [
     "Book",
+    "ChunkedMatchedPool",
+    "CoalescedTrade",
+    "LazyPnlBookStore",
     "PnlBookStore",
     "SimplePnlBook",
     "Security",
+    "SpillingPnlBookStore",
     "Trade",
     "MatchedPool",
+    "MatchSummary",
+    "SummarizingMatchedPool",
     "UnmatchedPool",
+    "load_checkpoint",
+    "restore_matched_pool",
+    "restore_unmatched_pool",
+    "save_checkpoint",
 ]
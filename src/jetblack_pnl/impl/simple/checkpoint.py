@@ -0,0 +1,844 @@
+"""Checkpoints of a simple P/L book store
+
+A checkpoint holds the P/L, the unmatched lots and optionally the matches of
+every position in a compact binary file, so a book can be restored without
+replaying its trades. The file is made of fixed width records, so a position
+can be decoded without reading the positions before it.
+
+The layout is little endian:
+
+    header      magic, version, flags and the number of records in each
+                section
+    strings     the uint32 offset of each string and of the end, followed
+                by the UTF-8 text
+    trades      a record for each trade
+    parts       the uint32 trade index of each trade in a coalesced lot
+    positions   a record for each position
+    lots        a record for each unmatched lot
+    matches     a record for each match, if written
+
+Strings and trades are written once and referred to by index, so a trade held
+in several lots and matches is stored once, and is shared again when
+restored. A decimal is written as a signed 64 bit coefficient and a 16 bit
+exponent. A decimal which does not fit, or a negative zero, is written as a
+string.
+
+The options of a pool, and the totals and summaries of a matched pool which
+does not keep its matches, are written as a JSON string. The pools are
+recreated by factories which are given the name of the type of the saved
+pool, its contents and this state. The default factories recreate the pools
+of this package.
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+import json
+import mmap
+import struct
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    ItemsView,
+    Iterator,
+    Mapping,
+    Sequence,
+    TypeAlias,
+)
+
+from ...core import (
+    AverageCostPool,
+    IMatchedPool,
+    IUnmatchedPool,
+    NullMatchedPool,
+    SplitTrade,
+    SummaryMatchedPool,
+    TradingPnl,
+)
+
+from .book import Book
+from .matched_pool import (
+    ChunkedMatchedPool,
+    Match,
+    MatchedPool,
+    MatchSummary,
+    SummarizingMatchedPool,
+)
+from .pnl_book_store import PnlBookStore
+from .security import Security
+from .trade import CoalescedTrade, Trade
+from .types import BookKey, Context, SecurityKey
+from .unmatched_pools import UnmatchedPool, _select_none
+
+VERSION = 2
+"""The version of the checkpoint format written"""
+
+Key: TypeAlias = tuple[SecurityKey, BookKey]
+Entry: TypeAlias = tuple[
+    TradingPnl,
+    IUnmatchedPool[Trade, Context],
+    IMatchedPool[Trade, Context]
+]
+UnmatchedFactory: TypeAlias = Callable[
+    [str, Sequence[SplitTrade[Trade]], Mapping[str, Any]],
+    IUnmatchedPool[Trade, Context]
+]
+MatchedFactory: TypeAlias = Callable[
+    [str, Sequence[Match], Mapping[str, Any]],
+    IMatchedPool[Trade, Context]
+]
+
+_MAGIC = b'JBPK'
+_WITH_MATCHES = 1
+
+_HEADER = struct.Struct('<4sHHIIIIII')
+_OFFSET = struct.Struct('<I')
+_SPAN = struct.Struct('<II')
+# flags, quantity, price, key, timestamp, first part, part count
+_TRADE = struct.Struct('<BqhqhqiII')
+# security, book, quantity, cost, realized, unmatched type, matched type,
+# unmatched state, matched state, first lot, lot count, first match, match
+# count
+_POSITION = struct.Struct('<IIqhqhqhIIiiIIII')
+# remaining quantity, trade
+_LOT = struct.Struct('<qhI')
+# closing quantity, opening trade, closing trade
+_MATCH = struct.Struct('<qhII')
+
+_HAS_KEY = 1
+_COALESCED = 2
+
+_NO_STRING = -1
+_STRING_EXPONENT = -2 ** 15
+_MIN_COEFFICIENT = -2 ** 63
+_MAX_COEFFICIENT = 2 ** 63 - 1
+
+
+_COALESCING = (
+    UnmatchedPool.Fifo,
+    UnmatchedPool.Lifo,
+    UnmatchedPool.BestPrice,
+    UnmatchedPool.WorstPrice,
+    UnmatchedPool.DequeFifo,
+    UnmatchedPool.DequeLifo,
+    UnmatchedPool.PersistentFifo,
+    UnmatchedPool.PersistentLifo,
+)
+
+
+def _unmatched_state(unmatched: IUnmatchedPool[Trade, Context]) -> dict[str, Any]:
+    """The options of an unmatched pool of this package"""
+    if isinstance(unmatched, _COALESCING):
+        return {'coalesce': True} if unmatched._coalesce else {}
+    if isinstance(unmatched, UnmatchedPool.ColumnarFifo):
+        return {'quantity_scale': unmatched._quantity_scale}
+    if isinstance(unmatched, UnmatchedPool.TaxMinimizing):
+        period = unmatched._holding_period
+        return {
+            'holding_period': [period.days, period.seconds, period.microseconds]
+        }
+    if isinstance(unmatched, UnmatchedPool.SpecificId):
+        # A selector is code, so only the fact that there is one is kept.
+        return {} if unmatched._selector is _select_none else {'selector': True}
+    return {}
+
+
+def _summaries(summaries: Mapping[Any, MatchSummary]) -> list[list[Any]]:
+    return [
+        [key, str(quantity), str(realized), matches, first, last]
+        for key, (quantity, realized, matches, first, last) in summaries.items()
+    ]
+
+
+def _matched_state(
+        matched: IMatchedPool[Trade, Context],
+        matches: Sequence[Match]
+) -> dict[str, Any]:
+    """The options and totals of a matched pool of this package, less those
+    of the matches written"""
+    if isinstance(matched, ChunkedMatchedPool):
+        return {
+            'max_matches': matched.max_matches,
+            'since_key': matched.since_key,
+            'chunk_size': matched.chunk_size,
+            'count': matched.count - len(matches),
+            'quantity': str(
+                matched.quantity -
+                sum((abs(quantity) for quantity, _, _ in matches), Decimal(0))
+            ),
+        }
+    if isinstance(matched, SummaryMatchedPool):
+        return {'count': matched.count, 'quantity': str(matched.quantity)}
+    if isinstance(matched, SummarizingMatchedPool):
+        return {
+            'contract_size': str(matched.contract_size),
+            'openings': _summaries(matched.openings),
+            'closings': _summaries(matched.closings),
+        }
+    return {}
+
+
+def restore_unmatched_pool(
+        name: str,
+        lots: Sequence[SplitTrade[Trade]],
+        state: Mapping[str, Any]
+) -> IUnmatchedPool[Trade, Context]:
+    """Recreate an unmatched pool of this package with its options.
+
+    Args:
+        name (str): The name of the type of the pool, for example "Fifo".
+        lots (Sequence[SplitTrade[Trade]]): The lots in the order the pool
+            returned them.
+        state (Mapping[str, Any]): The options of the pool.
+
+    Raises:
+        ValueError: If the type is unknown, or the pool was a `SpecificId`
+            with a selector, which must be given by a custom factory.
+
+    Returns:
+        IUnmatchedPool[Trade, Context]: The pool.
+    """
+    if name == AverageCostPool.__name__:
+        return AverageCostPool()
+    pool_type = getattr(UnmatchedPool, name, None)
+    if not isinstance(pool_type, type):
+        raise ValueError(f"unknown unmatched pool '{name}'")
+    if pool_type is UnmatchedPool.SpecificId and state.get('selector'):
+        raise ValueError("a SpecificId pool with a selector needs a factory")
+    options = dict(state)
+    if 'holding_period' in options:
+        days, seconds, microseconds = options['holding_period']
+        options['holding_period'] = timedelta(days, seconds, microseconds)
+    return pool_type(pool=lots, **options)
+
+
+def _restore_summaries(rows: list[list[Any]]) -> dict[Any, MatchSummary]:
+    return {
+        key: MatchSummary(Decimal(quantity), Decimal(realized), matches, first, last)
+        for key, quantity, realized, matches, first, last in rows
+    }
+
+
+def restore_matched_pool(
+        name: str,
+        matches: Sequence[Match],
+        state: Mapping[str, Any]
+) -> IMatchedPool[Trade, Context]:
+    """Recreate a matched pool of this package with its options and totals.
+
+    Args:
+        name (str): The name of the type of the pool, for example
+            "MatchedPool".
+        matches (Sequence[Match]): The matches, which are empty if they were
+            not written.
+        state (Mapping[str, Any]): The options of the pool, and the totals
+            or summaries of the matches it does not keep.
+
+    Raises:
+        ValueError: If the type is unknown.
+
+    Returns:
+        IMatchedPool[Trade, Context]: The pool.
+    """
+    if name == MatchedPool.__name__:
+        return MatchedPool(matches)
+    if name == NullMatchedPool.__name__:
+        return NullMatchedPool()
+    if name == SummaryMatchedPool.__name__:
+        return SummaryMatchedPool(state['count'], Decimal(state['quantity']))
+    if name == SummarizingMatchedPool.__name__:
+        return SummarizingMatchedPool(
+            Decimal(state['contract_size']),
+            _restore_summaries(state['openings']),
+            _restore_summaries(state['closings'])
+        )
+    if name != ChunkedMatchedPool.__name__:
+        raise ValueError(f"unknown matched pool '{name}'")
+    pool = ChunkedMatchedPool(
+        state['max_matches'],
+        state['since_key'],
+        state['chunk_size'],
+        state['count'],
+        Decimal(state['quantity'])
+    )
+    for closing_quantity, opening, closing in matches:
+        pool.append(closing_quantity, opening, closing, None)
+    return pool
+
+
+class _Writer:
+
+    def __init__(self) -> None:
+        self.strings: dict[str, int] = {}
+        self.trades: dict[int, int] = {}
+        # Pools may create trades on demand, so hold them to keep their ids.
+        self.held: list[Trade] = []
+        self.trade_data = bytearray()
+        self.part_data = bytearray()
+        self.part_count = 0
+        self.position_data = bytearray()
+        self.position_count = 0
+        self.lot_data = bytearray()
+        self.lot_count = 0
+        self.match_data = bytearray()
+        self.match_count = 0
+
+    def string(self, text: str) -> int:
+        index = self.strings.get(text)
+        if index is None:
+            index = self.strings[text] = len(self.strings)
+        return index
+
+    def decimal(self, value: Decimal) -> tuple[int, int]:
+        sign, digits, exponent = value.as_tuple()
+        if isinstance(exponent, int) and _STRING_EXPONENT < exponent < -_STRING_EXPONENT:
+            coefficient = int(''.join(map(str, digits)))
+            if sign:
+                coefficient = -coefficient
+            # The sign of a negative zero is lost in the coefficient.
+            if (
+                _MIN_COEFFICIENT <= coefficient <= _MAX_COEFFICIENT and
+                (coefficient or not sign)
+            ):
+                return coefficient, exponent
+        return self.string(str(value)), _STRING_EXPONENT
+
+    def state(self, state: dict[str, Any]) -> int:
+        if not state:
+            return _NO_STRING
+        return self.string(json.dumps(state, sort_keys=True))
+
+    def trade(self, trade: Trade) -> int:
+        index = self.trades.get(id(trade))
+        if index is not None:
+            return index
+
+        if isinstance(trade, CoalescedTrade):
+            parts = [self.trade(part) for part in trade.trades]
+            record = _TRADE.pack(
+                _COALESCED, 0, 0, 0, 0, 0, _NO_STRING,
+                self.part_count, len(parts)
+            )
+            for part in parts:
+                self.part_data += _OFFSET.pack(part)
+            self.part_count += len(parts)
+        elif type(trade) is Trade:
+            record = _TRADE.pack(
+                0 if trade.key is None else _HAS_KEY,
+                *self.decimal(trade.quantity),
+                *self.decimal(trade.price),
+                0 if trade.key is None else trade.key,
+                (
+                    _NO_STRING
+                    if trade.timestamp is None
+                    else self.string(trade.timestamp.isoformat())
+                ),
+                0,
+                0
+            )
+        else:
+            raise TypeError(
+                f"cannot checkpoint a trade of type '{type(trade).__name__}'"
+            )
+
+        index = self.trades[id(trade)] = len(self.trades)
+        self.held.append(trade)
+        self.trade_data += record
+        return index
+
+    def position(self, key: Key, entry: Entry, with_matches: bool) -> None:
+        pnl, unmatched, matched = entry
+        lots = unmatched.pool(None)
+        matches = matched.pool(None) if with_matches else ()
+
+        first_lot = self.lot_count
+        for lot in lots:
+            self.lot_data += _LOT.pack(
+                *self.decimal(lot.remaining_quantity),
+                self.trade(lot.trade)
+            )
+        self.lot_count += len(lots)
+
+        first_match = self.match_count
+        for closing_quantity, opening, closing in matches:
+            self.match_data += _MATCH.pack(
+                *self.decimal(closing_quantity),
+                self.trade(opening),
+                self.trade(closing)
+            )
+        self.match_count += len(matches)
+
+        security_key, book_key = key
+        self.position_data += _POSITION.pack(
+            self.string(security_key),
+            self.string(book_key),
+            *self.decimal(pnl.quantity),
+            *self.decimal(pnl.cost),
+            *self.decimal(pnl.realized),
+            self.string(type(unmatched).__name__),
+            self.string(type(matched).__name__),
+            self.state(_unmatched_state(unmatched)),
+            self.state(_matched_state(matched, matches)),
+            first_lot,
+            len(lots),
+            first_match,
+            len(matches)
+        )
+        self.position_count += 1
+
+
+def save_checkpoint(
+        store: PnlBookStore,
+        file: BinaryIO,
+        matches: bool = True
+) -> None:
+    """Write a checkpoint of every position in a store.
+
+    Args:
+        store (PnlBookStore): The store, for example the `store` of a
+            `SimplePnlBook`.
+        file (BinaryIO): The binary file to write to.
+        matches (bool, optional): If false the matches are not written, and
+            the matched pools are restored empty. Defaults to True.
+
+    Raises:
+        TypeError: If a pool holds a trade which is not a `Trade` or a
+            `CoalescedTrade`.
+    """
+    writer = _Writer()
+    for key, entry in store.items():
+        writer.position(key, entry, matches)
+
+    texts = [text.encode('utf-8') for text in writer.strings]
+    offsets = bytearray()
+    offset = 0
+    for text in texts:
+        offsets += _OFFSET.pack(offset)
+        offset += len(text)
+    offsets += _OFFSET.pack(offset)
+
+    file.write(
+        _HEADER.pack(
+            _MAGIC,
+            VERSION,
+            _WITH_MATCHES if matches else 0,
+            len(texts),
+            len(writer.trades),
+            writer.part_count,
+            writer.position_count,
+            writer.lot_count,
+            writer.match_count
+        )
+    )
+    file.write(offsets)
+    file.write(b''.join(texts))
+    file.write(writer.trade_data)
+    file.write(writer.part_data)
+    file.write(writer.position_data)
+    file.write(writer.lot_data)
+    file.write(writer.match_data)
+
+
+def _header(buffer: Any) -> tuple[int, ...]:
+    """Check the header of a checkpoint.
+
+    Args:
+        buffer (Any): The buffer, which starts with the header.
+
+    Raises:
+        ValueError: If the buffer is not a checkpoint of a supported version.
+
+    Returns:
+        tuple[int, ...]: The number of strings, trades, parts, positions,
+            lots and matches.
+    """
+    if len(buffer) < _HEADER.size:
+        raise ValueError("not a checkpoint")
+    magic, version, _flags, *counts = _HEADER.unpack_from(buffer, 0)
+    if magic != _MAGIC:
+        raise ValueError("not a checkpoint")
+    if version != VERSION:
+        raise ValueError(f"unsupported checkpoint version {version}")
+    return tuple(counts)
+
+
+class _Reader:
+    """Decodes the records of a checkpoint held in a buffer.
+
+    Strings, trades and decimals are decoded when first used and then cached.
+    The buffer may end before the lots, which are then decoded from data read
+    separately.
+    """
+
+    def __init__(
+            self,
+            buffer: Any,
+            unmatched_factory: UnmatchedFactory,
+            matched_factory: MatchedFactory,
+            with_lots: bool = True
+    ) -> None:
+        (
+            string_count,
+            trade_count,
+            part_count,
+            position_count,
+            lot_count,
+            match_count
+        ) = _header(buffer)
+
+        self._buffer = buffer
+        self._unmatched_factory = unmatched_factory
+        self._matched_factory = matched_factory
+        self._string_offsets = _HEADER.size
+        self._text = self._string_offsets + (string_count + 1) * _OFFSET.size
+        if len(buffer) < self._text:
+            raise ValueError("the checkpoint is truncated")
+        (text_size,) = _OFFSET.unpack_from(
+            buffer,
+            self._string_offsets + string_count * _OFFSET.size
+        )
+        self._trade_records = self._text + text_size
+        self._part_records = self._trade_records + trade_count * _TRADE.size
+        self._position_records = self._part_records + part_count * _OFFSET.size
+        self._position_count = position_count
+        self._lot_records = self._position_records + position_count * _POSITION.size
+        self._match_records = self._lot_records + lot_count * _LOT.size
+        end = (
+            self._match_records + match_count * _MATCH.size
+            if with_lots
+            else self._lot_records
+        )
+        if len(buffer) < end:
+            raise ValueError("the checkpoint is truncated")
+
+        self._strings: dict[int, str] = {}
+        self._trades: dict[int, Trade] = {}
+        self._decimals: dict[tuple[int, int], Decimal] = {}
+
+    def string(self, index: int) -> str:
+        text = self._strings.get(index)
+        if text is None:
+            start, end = _SPAN.unpack_from(
+                self._buffer,
+                self._string_offsets + index * _OFFSET.size
+            )
+            text = self._strings[index] = bytes(
+                self._buffer[self._text + start:self._text + end]
+            ).decode('utf-8')
+        return text
+
+    def state(self, index: int) -> dict[str, Any]:
+        if index == _NO_STRING:
+            return {}
+        state: dict[str, Any] = json.loads(self.string(index))
+        return state
+
+    def decimal(self, coefficient: int, exponent: int) -> Decimal:
+        # Quantities and prices repeat, and a decimal is immutable, so each
+        # value is decoded once and shared.
+        key = (coefficient, exponent)
+        value = self._decimals.get(key)
+        if value is None:
+            value = self._decimals[key] = (
+                Decimal(self.string(coefficient))
+                if exponent == _STRING_EXPONENT
+                else Decimal(coefficient).scaleb(exponent)
+            )
+        return value
+
+    def trade(self, index: int) -> Trade:
+        trade = self._trades.get(index)
+        if trade is not None:
+            return trade
+
+        (
+            flags,
+            quantity_coefficient,
+            quantity_exponent,
+            price_coefficient,
+            price_exponent,
+            key,
+            timestamp,
+            first_part,
+            part_count
+        ) = _TRADE.unpack_from(
+            self._buffer,
+            self._trade_records + index * _TRADE.size
+        )
+        if flags & _COALESCED:
+            trade = CoalescedTrade([
+                self.trade(part)
+                for (part,) in _OFFSET.iter_unpack(
+                    self._buffer[
+                        self._part_records + first_part * _OFFSET.size:
+                        self._part_records + (first_part + part_count) * _OFFSET.size
+                    ]
+                )
+            ])
+        else:
+            trade = Trade(
+                self.decimal(quantity_coefficient, quantity_exponent),
+                self.decimal(price_coefficient, price_exponent),
+                key if flags & _HAS_KEY else None,
+                (
+                    None
+                    if timestamp == _NO_STRING
+                    else datetime.fromisoformat(self.string(timestamp))
+                )
+            )
+
+        self._trades[index] = trade
+        return trade
+
+    def positions(self) -> Iterator[tuple[Key, tuple[Any, ...]]]:
+        """The key and record of each position, without decoding the pools"""
+        records = self._buffer[
+            self._position_records:
+            self._position_records + self._position_count * _POSITION.size
+        ]
+        for record in _POSITION.iter_unpack(records):
+            yield (self.string(record[0]), self.string(record[1])), record
+
+    def lots(self, data: Any) -> tuple[SplitTrade[Trade], ...]:
+        """Decode the lot records in a buffer"""
+        decimal, trade = self.decimal, self.trade
+        return tuple(
+            SplitTrade(decimal(coefficient, exponent), trade(index))
+            for coefficient, exponent, index in _LOT.iter_unpack(data)
+        )
+
+    def matches(self, data: Any) -> tuple[Match, ...]:
+        """Decode the match records in a buffer"""
+        decimal, trade = self.decimal, self.trade
+        return tuple(
+            (decimal(coefficient, exponent), trade(opening), trade(closing))
+            for coefficient, exponent, opening, closing in _MATCH.iter_unpack(data)
+        )
+
+    def restore(
+            self,
+            record: tuple[Any, ...],
+            lots: Sequence[SplitTrade[Trade]],
+            matches: Sequence[Match]
+    ) -> Entry:
+        """Decode the P/L of a position and recreate its pools"""
+        (
+            _security,
+            _book,
+            quantity_coefficient,
+            quantity_exponent,
+            cost_coefficient,
+            cost_exponent,
+            realized_coefficient,
+            realized_exponent,
+            unmatched_type,
+            matched_type,
+            unmatched_state,
+            matched_state,
+            *_ranges
+        ) = record
+
+        pnl = TradingPnl(
+            self.decimal(quantity_coefficient, quantity_exponent),
+            self.decimal(cost_coefficient, cost_exponent),
+            self.decimal(realized_coefficient, realized_exponent)
+        )
+        return (
+            pnl,
+            self._unmatched_factory(
+                self.string(unmatched_type),
+                lots,
+                self.state(unmatched_state)
+            ),
+            self._matched_factory(
+                self.string(matched_type),
+                matches,
+                self.state(matched_state)
+            )
+        )
+
+    def entry(self, record: tuple[Any, ...]) -> Entry:
+        """Decode the P/L and pools of a position"""
+        first_lot, lot_count, first_match, match_count = record[-4:]
+        return self.restore(
+            record,
+            self.lots(
+                self._buffer[
+                    self._lot_records + first_lot * _LOT.size:
+                    self._lot_records + (first_lot + lot_count) * _LOT.size
+                ]
+            ),
+            self.matches(
+                self._buffer[
+                    self._match_records + first_match * _MATCH.size:
+                    self._match_records + (first_match + match_count) * _MATCH.size
+                ]
+            )
+        )
+
+
+def _read(file: BinaryIO, size: int) -> bytes:
+    data = file.read(size)
+    if len(data) < size:
+        raise ValueError("the checkpoint is truncated")
+    return data
+
+
+def load_checkpoint(
+        file: BinaryIO,
+        unmatched_factory: UnmatchedFactory = restore_unmatched_pool,
+        matched_factory: MatchedFactory = restore_matched_pool
+) -> PnlBookStore:
+    """Read a checkpoint into a new store.
+
+    The file is read once from its current position. The strings, trades
+    and positions are read first, then the lots and matches are read and
+    decoded a position at a time, so the whole file is never held in
+    memory.
+
+    Args:
+        file (BinaryIO): The binary file to read from.
+        unmatched_factory (UnmatchedFactory, optional): Recreates an
+            unmatched pool from the name of its type, its lots and its state.
+            Defaults to `restore_unmatched_pool`.
+        matched_factory (MatchedFactory, optional): Recreates a matched pool
+            from the name of its type, its matches and its state. Defaults
+            to `restore_matched_pool`.
+
+    Raises:
+        ValueError: If the file is not a checkpoint of a supported version.
+
+    Returns:
+        PnlBookStore: The store, which can be given to a `SimplePnlBook`.
+    """
+    header = file.read(_HEADER.size)
+    (
+        string_count,
+        trade_count,
+        part_count,
+        position_count,
+        _lot_count,
+        _match_count
+    ) = _header(header)
+    offsets = _read(file, (string_count + 1) * _OFFSET.size)
+    (text_size,) = _OFFSET.unpack_from(offsets, string_count * _OFFSET.size)
+    reader = _Reader(
+        header + offsets + _read(
+            file,
+            text_size +
+            trade_count * _TRADE.size +
+            part_count * _OFFSET.size +
+            position_count * _POSITION.size
+        ),
+        unmatched_factory,
+        matched_factory,
+        with_lots=False
+    )
+
+    # The lots, then the matches, of the positions are written in order.
+    positions = list(reader.positions())
+    lots: list[tuple[SplitTrade[Trade], ...]] = []
+    for _key, record in positions:
+        _first_lot, lot_count, _first_match, _match_count = record[-4:]
+        lots.append(reader.lots(_read(file, lot_count * _LOT.size)))
+
+    def entries() -> Iterator[tuple[Key, Entry]]:
+        for (key, record), position_lots in zip(positions, lots):
+            _first_lot, _lot_count, _first_match, match_count = record[-4:]
+            matches = reader.matches(_read(file, match_count * _MATCH.size))
+            yield key, reader.restore(record, position_lots, matches)
+
+    return PnlBookStore(entries())
+
+
+class LazyPnlBookStore(PnlBookStore):
+    """A store backed by a memory mapped checkpoint.
+
+    Only the keys of the positions are read when the store is opened. The
+    pools of a position are decoded when it is first used, so a book with
+    many positions can start at once. The file must not change while the
+    store is open.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            unmatched_factory: UnmatchedFactory = restore_unmatched_pool,
+            matched_factory: MatchedFactory = restore_matched_pool
+    ) -> None:
+        """Open a checkpoint.
+
+        Args:
+            path (str): The path of the checkpoint.
+            unmatched_factory (UnmatchedFactory, optional): Recreates an
+                unmatched pool from the name of its type, its lots and its
+                state. Defaults to `restore_unmatched_pool`.
+            matched_factory (MatchedFactory, optional): Recreates a matched
+                pool from the name of its type, its matches and its state.
+                Defaults to `restore_matched_pool`.
+
+        Raises:
+            ValueError: If the file is not a checkpoint of a supported
+                version.
+        """
+        super().__init__()
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._reader = _Reader(self._mmap, unmatched_factory, matched_factory)
+            self._pending = dict(self._reader.positions())
+        except Exception:
+            self._mmap.close()
+            raise
+
+    @property
+    def pending(self) -> int:
+        """The number of positions not yet decoded"""
+        return len(self._pending)
+
+    def _decode(self, key: Key) -> None:
+        record = self._pending.pop(key, None)
+        if record is not None:
+            self._cache[key] = self._reader.entry(record)
+
+    def has(
+            self,
+            security: Security,
+            book: Book,
+            context: Context
+    ) -> bool:
+        key = (security.key, book.key)
+        return key in self._pending or super().has(security, book, context)
+
+    def get(
+            self,
+            security: Security,
+            book: Book,
+            context: Context
+    ) -> Entry:
+        self._decode((security.key, book.key))
+        return super().get(security, book, context)
+
+    def set(
+            self,
+            security: Security,
+            book: Book,
+            trade: Trade,
+            pnl: TradingPnl,
+            unmatched: IUnmatchedPool[Trade, Context],
+            matched: IMatchedPool[Trade, Context],
+            context: Context
+    ) -> None:
+        self._pending.pop((security.key, book.key), None)
+        super().set(security, book, trade, pnl, unmatched, matched, context)
+
+    def items(self) -> ItemsView[Key, Entry]:
+        """The positions held, decoding any not yet used"""
+        for key in list(self._pending):
+            self._decode(key)
+        return super().items()
+
+    def close(self) -> None:
+        """Decode the remaining positions and close the file"""
+        self.items()
+        self._mmap.close()
@@ -1,13 +1,14 @@
 """A simple implementation of a matched pool"""
 
+from collections import deque
 from decimal import Decimal
-from typing import Sequence
+from typing import Iterator, Mapping, NamedTuple, Sequence, TypeAlias, overload
 
 
 from ...core import IMatchedPool
 
-from .types import Context
-from .trade import Trade
+from .types import Context, TradeKey
+from .trade import CoalescedTrade, Trade
 
 
 class MatchedPool(IMatchedPool[Trade, Context]):
@@ -54,3 +55,373 @@ class MatchedPool(IMatchedPool[Trade, Context]):
 
     def __repr__(self) -> str:
         return str(self._pool)
+
+
+Match: TypeAlias = tuple[Decimal, Trade, Trade]
+
+
+class _ChunkedView(Sequence[Match]):
+    """A read only view of the matches held in a chunked pool"""
+
+    __slots__ = ('_owner',)
+
+    def __init__(self, owner: 'ChunkedMatchedPool') -> None:
+        self._owner = owner
+
+    @overload
+    def __getitem__(self, index: int) -> Match: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[Match]: ...
+
+    def __getitem__(self, index: int | slice) -> Match | Sequence[Match]:
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        owner = self._owner
+        if index < 0:
+            index += owner._size
+        if not 0 <= index < owner._size:
+            raise IndexError('matched pool index out of range')
+        chunk, offset = divmod(owner._offset + index, owner._chunk_size)
+        return owner._chunks[chunk][offset]
+
+    def __iter__(self) -> Iterator[Match]:
+        owner = self._owner
+        offset = owner._offset
+        for chunk in owner._chunks:
+            yield from chunk[offset:]
+            offset = 0
+
+    def __len__(self) -> int:
+        return self._owner._size
+
+    def __eq__(self, value: object) -> bool:
+        return (
+            isinstance(value, Sequence) and
+            not isinstance(value, str) and
+            len(value) == len(self) and
+            all(a == b for a, b in zip(self, value))
+        )
+
+    def __repr__(self) -> str:
+        return repr(tuple(self))
+
+
+class ChunkedMatchedPool(IMatchedPool[Trade, Context]):
+    """A pool of matched trades held in fixed size chunks.
+
+    Appending a match is O(1). The pool can be limited to the most recent
+    matches, or to matches closed by trades with a key of at least some
+    value. Totals are kept for every match, whether or not it is retained.
+    """
+
+    def __init__(
+            self,
+            max_matches: int | None = None,
+            since_key: TradeKey = None,
+            chunk_size: int = 1024,
+            count: int = 0,
+            quantity: Decimal = Decimal(0)
+    ) -> None:
+        """Create the pool.
+
+        Args:
+            max_matches (int | None, optional): If set, only this many of the
+                most recent matches are kept. Zero keeps only the totals.
+                Defaults to None.
+            since_key (TradeKey, optional): If set, only matches closed by a
+                trade with a key of at least this value are kept. Defaults to
+                None.
+            chunk_size (int, optional): The number of matches in a chunk.
+                Defaults to 1024.
+            count (int, optional): The number of matches made before the
+                pool was created, as when it is restored. Defaults to 0.
+            quantity (Decimal, optional): The absolute quantity of those
+                matches. Defaults to 0.
+        """
+        self._max_matches = max_matches
+        self._since_key = since_key
+        self._chunk_size = chunk_size
+        self._chunks: deque[list[Match]] = deque()
+        self._offset = 0
+        self._size = 0
+        self._count = count
+        self._quantity = quantity
+
+    @property
+    def max_matches(self) -> int | None:
+        """The number of the most recent matches kept, or None for all"""
+        return self._max_matches
+
+    @property
+    def since_key(self) -> TradeKey:
+        """The least key of a closing trade whose matches are kept"""
+        return self._since_key
+
+    @property
+    def chunk_size(self) -> int:
+        """The number of matches in a chunk"""
+        return self._chunk_size
+
+    @property
+    def count(self) -> int:
+        """The number of matches, including those not retained"""
+        return self._count
+
+    @property
+    def quantity(self) -> Decimal:
+        """The total absolute quantity matched, including matches not
+        retained"""
+        return self._quantity
+
+    def append(
+            self,
+            closing_quantity: Decimal,
+            opening_trade: Trade,
+            closing_trade: Trade,
+            context: Context
+    ) -> None:
+        self._count += 1
+        self._quantity += abs(closing_quantity)
+
+        if self._max_matches == 0 or (
+            self._since_key is not None and (
+                closing_trade.key is None or
+                closing_trade.key < self._since_key
+            )
+        ):
+            return
+
+        if not self._chunks or len(self._chunks[-1]) == self._chunk_size:
+            self._chunks.append([])
+        self._chunks[-1].append((closing_quantity, opening_trade, closing_trade))
+        self._size += 1
+
+        if self._max_matches is not None and self._size > self._max_matches:
+            # Drop the oldest match, releasing the first chunk when it is
+            # exhausted.
+            self._offset += 1
+            self._size -= 1
+            if self._offset == self._chunk_size:
+                self._chunks.popleft()
+                self._offset = 0
+
+    def pool(self, context: Context) -> Sequence[Match]:
+        """Returns a read only view of the retained matches"""
+        return _ChunkedView(self)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __eq__(self, value: object) -> bool:
+        return (
+            isinstance(value, ChunkedMatchedPool) and
+            value.pool(None) == self.pool(None)
+        )
+
+    def __str__(self) -> str:
+        return str(self.pool(None))
+
+    def __repr__(self) -> str:
+        return str(self.pool(None))
+
+
+class MatchSummary(NamedTuple):
+    """The matches made by a trade"""
+    quantity: Decimal
+    """The absolute quantity matched"""
+    realized: Decimal
+    """The realized P/L of the matches"""
+    matches: int
+    """The number of matches"""
+    first: TradeKey
+    """The key of the other trade in the first match"""
+    last: TradeKey
+    """The key of the other trade in the last match"""
+
+
+class SummarizingMatchedPool(IMatchedPool[Trade, Context]):
+    """A matched pool which keeps a summary of the matches for each trade.
+
+    The matches are summarized by opening trade key and by closing trade key,
+    so the memory used grows with the number of trades rather than the number
+    of matches. The matches themselves are not kept, and `pool` is empty.
+
+    A match against a coalesced lot is spread over the trades which make up
+    the lot in order, each taking what is left of its quantity after its
+    earlier matches. Every trade must have a key.
+    """
+
+    def __init__(
+            self,
+            contract_size: Decimal | int = 1,
+            openings: Mapping[TradeKey, MatchSummary] | None = None,
+            closings: Mapping[TradeKey, MatchSummary] | None = None
+    ) -> None:
+        """Create the pool.
+
+        Args:
+            contract_size (Decimal | int, optional): The contract size of the
+                security, used to calculate the realized P/L. Defaults to 1.
+            openings (Mapping[TradeKey, MatchSummary] | None, optional): The
+                summaries of earlier matches by opening trade key, as when
+                the pool is restored. Defaults to None.
+            closings (Mapping[TradeKey, MatchSummary] | None, optional): The
+                summaries of earlier matches by closing trade key. Defaults
+                to None.
+        """
+        self._contract_size = contract_size
+        self._openings: dict[TradeKey, MatchSummary] = dict(openings or {})
+        self._closings: dict[TradeKey, MatchSummary] = dict(closings or {})
+        self._count = sum(summary.matches for summary in self._openings.values())
+        self._realized = sum(
+            (summary.realized for summary in self._openings.values()),
+            Decimal(0)
+        )
+
+    @property
+    def contract_size(self) -> Decimal | int:
+        """The contract size of the security"""
+        return self._contract_size
+
+    @property
+    def openings(self) -> Mapping[TradeKey, MatchSummary]:
+        """The summaries keyed by opening trade key"""
+        return self._openings
+
+    @property
+    def closings(self) -> Mapping[TradeKey, MatchSummary]:
+        """The summaries keyed by closing trade key"""
+        return self._closings
+
+    @property
+    def realized(self) -> Decimal:
+        """The realized P/L of all the matches"""
+        return self._realized
+
+    def opening(self, key: TradeKey) -> MatchSummary | None:
+        """The summary of the matches for an opening trade.
+
+        Args:
+            key (TradeKey): The trade key.
+
+        Returns:
+            MatchSummary | None: The summary, or None if the trade has not
+                been matched.
+        """
+        return self._openings.get(key)
+
+    def closing(self, key: TradeKey) -> MatchSummary | None:
+        """The summary of the matches for a closing trade.
+
+        Args:
+            key (TradeKey): The trade key.
+
+        Returns:
+            MatchSummary | None: The summary, or None if the trade has not
+                matched anything.
+        """
+        return self._closings.get(key)
+
+    @staticmethod
+    def _add(
+            summaries: dict[TradeKey, MatchSummary],
+            key: TradeKey,
+            other: TradeKey,
+            quantity: Decimal,
+            realized: Decimal
+    ) -> None:
+        summary = summaries.get(key)
+        summaries[key] = (
+            MatchSummary(quantity, realized, 1, other, other)
+            if summary is None
+            else MatchSummary(
+                summary.quantity + quantity,
+                summary.realized + realized,
+                summary.matches + 1,
+                summary.first,
+                other
+            )
+        )
+
+    def _parts(
+            self,
+            trade: Trade,
+            quantity: Decimal
+    ) -> list[tuple[Trade, Decimal]]:
+        """Spread a matched quantity over the trades which make up a lot"""
+        if not isinstance(trade, CoalescedTrade):
+            return [(trade, quantity)]
+
+        parts: list[tuple[Trade, Decimal]] = []
+        *earlier, last = trade.trades
+        for part in earlier:
+            if not quantity:
+                return parts
+            opened = self._openings.get(part.key)
+            closed = self._closings.get(part.key)
+            available = (
+                abs(part.quantity) -
+                (Decimal(0) if opened is None else opened.quantity) -
+                (Decimal(0) if closed is None else closed.quantity)
+            )
+            if available > 0:
+                taken = min(quantity, available)
+                parts.append((part, taken))
+                quantity -= taken
+        if quantity:
+            parts.append((last, quantity))
+        return parts
+
+    def append(
+            self,
+            closing_quantity: Decimal,
+            opening_trade: Trade,
+            closing_trade: Trade,
+            context: Context
+    ) -> None:
+        parts = self._parts(opening_trade, abs(closing_quantity))
+        if closing_trade.key is None or any(
+                part.key is None for part, _ in parts
+        ):
+            raise ValueError("matched trades must have a key to be summarized")
+
+        sign = -1 if closing_quantity < 0 else 1
+        price_change = opening_trade.price - closing_trade.price
+        for part, quantity in parts:
+            realized = sign * quantity * self._contract_size * price_change
+            self._count += 1
+            self._realized += realized
+            self._add(
+                self._openings,
+                part.key,
+                closing_trade.key,
+                quantity,
+                realized
+            )
+            self._add(
+                self._closings,
+                closing_trade.key,
+                part.key,
+                quantity,
+                realized
+            )
+
+    def pool(self, context: Context) -> Sequence[Match]:
+        return ()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __eq__(self, value: object) -> bool:
+        return (
+            isinstance(value, SummarizingMatchedPool) and
+            value.openings == self.openings and
+            value.closings == self.closings
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"SummarizingMatchedPool(count={self._count}, "
+            f"realized={self._realized})"
+        )
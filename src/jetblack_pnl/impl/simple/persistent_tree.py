@@ -0,0 +1,256 @@
+"""A persistent balanced tree
+
+The tree is an AVL tree which is never changed once built. An update copies
+the nodes on the path to the change and shares the rest with the previous
+version, so each update is O(log N) in time and memory, and keeping an old
+version costs nothing.
+"""
+
+from typing import Any, Iterator, Sequence, overload
+
+
+class _Node:
+
+    __slots__ = ('key', 'value', 'left', 'right', 'height', 'size')
+
+    def __init__(
+            self,
+            key: Any,
+            value: Any,
+            left: '_Node | None',
+            right: '_Node | None'
+    ) -> None:
+        self.key = key
+        self.value = value
+        self.left = left
+        self.right = right
+        self.height = 1 + max(_height(left), _height(right))
+        self.size = 1 + _size(left) + _size(right)
+
+
+def _height(node: _Node | None) -> int:
+    return 0 if node is None else node.height
+
+
+def _size(node: _Node | None) -> int:
+    return 0 if node is None else node.size
+
+
+def _balance(key: Any, value: Any, left: _Node | None, right: _Node | None) -> _Node:
+    """Make a node, rotating if the heights of the children differ by two"""
+    if _height(left) > _height(right) + 1:
+        assert left is not None
+        if _height(left.left) >= _height(left.right):
+            return _Node(
+                left.key,
+                left.value,
+                left.left,
+                _Node(key, value, left.right, right)
+            )
+        pivot = left.right
+        assert pivot is not None
+        return _Node(
+            pivot.key,
+            pivot.value,
+            _Node(left.key, left.value, left.left, pivot.left),
+            _Node(key, value, pivot.right, right)
+        )
+
+    if _height(right) > _height(left) + 1:
+        assert right is not None
+        if _height(right.right) >= _height(right.left):
+            return _Node(
+                right.key,
+                right.value,
+                _Node(key, value, left, right.left),
+                right.right
+            )
+        pivot = right.left
+        assert pivot is not None
+        return _Node(
+            pivot.key,
+            pivot.value,
+            _Node(key, value, left, pivot.left),
+            _Node(right.key, right.value, pivot.right, right.right)
+        )
+
+    return _Node(key, value, left, right)
+
+
+def _insert(node: _Node | None, key: Any, value: Any) -> _Node:
+    if node is None:
+        return _Node(key, value, None, None)
+    if key < node.key:
+        return _balance(
+            node.key,
+            node.value,
+            _insert(node.left, key, value),
+            node.right
+        )
+    return _balance(
+        node.key,
+        node.value,
+        node.left,
+        _insert(node.right, key, value)
+    )
+
+
+def _pop_first(node: _Node) -> tuple[_Node, _Node | None]:
+    if node.left is None:
+        return node, node.right
+    first, left = _pop_first(node.left)
+    return first, _balance(node.key, node.value, left, node.right)
+
+
+def _pop_last(node: _Node) -> tuple[_Node, _Node | None]:
+    if node.right is None:
+        return node, node.left
+    last, right = _pop_last(node.right)
+    return last, _balance(node.key, node.value, node.left, right)
+
+
+def _replace_first(node: _Node, value: Any) -> _Node:
+    if node.left is None:
+        return _Node(node.key, value, None, node.right)
+    return _Node(node.key, node.value, _replace_first(node.left, value), node.right)
+
+
+def _replace_last(node: _Node, value: Any) -> _Node:
+    if node.right is None:
+        return _Node(node.key, value, node.left, None)
+    return _Node(node.key, node.value, node.left, _replace_last(node.right, value))
+
+
+class PersistentTree[V](Sequence[V]):
+    """An immutable sequence of values ordered by key.
+
+    Keys must be unique and comparable. The update methods return a new tree
+    which shares most of its nodes with this one.
+    """
+
+    __slots__ = ('_root',)
+
+    def __init__(self, root: _Node | None = None) -> None:
+        self._root = root
+
+    def insert(self, key: Any, value: V) -> 'PersistentTree[V]':
+        """Add a value.
+
+        Args:
+            key (Any): The key which orders the value.
+            value (V): The value.
+
+        Returns:
+            PersistentTree[V]: The new tree.
+        """
+        return PersistentTree(_insert(self._root, key, value))
+
+    def pop_first(self) -> tuple[V, 'PersistentTree[V]']:
+        """Remove the value with the lowest key.
+
+        Returns:
+            tuple[V, PersistentTree[V]]: The value and the new tree.
+        """
+        if self._root is None:
+            raise IndexError('pop from an empty tree')
+        first, root = _pop_first(self._root)
+        return first.value, PersistentTree(root)
+
+    def pop_last(self) -> tuple[V, 'PersistentTree[V]']:
+        """Remove the value with the highest key.
+
+        Returns:
+            tuple[V, PersistentTree[V]]: The value and the new tree.
+        """
+        if self._root is None:
+            raise IndexError('pop from an empty tree')
+        last, root = _pop_last(self._root)
+        return last.value, PersistentTree(root)
+
+    def replace_first(self, value: V) -> 'PersistentTree[V]':
+        """Replace the value with the lowest key, keeping the key.
+
+        Args:
+            value (V): The new value.
+
+        Returns:
+            PersistentTree[V]: The new tree.
+        """
+        if self._root is None:
+            raise IndexError('replace in an empty tree')
+        return PersistentTree(_replace_first(self._root, value))
+
+    def replace_last(self, value: V) -> 'PersistentTree[V]':
+        """Replace the value with the highest key, keeping the key.
+
+        Args:
+            value (V): The new value.
+
+        Returns:
+            PersistentTree[V]: The new tree.
+        """
+        if self._root is None:
+            raise IndexError('replace in an empty tree')
+        return PersistentTree(_replace_last(self._root, value))
+
+    @overload
+    def __getitem__(self, index: int) -> V: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[V]: ...
+
+    def __getitem__(self, index: int | slice) -> V | Sequence[V]:
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        size = _size(self._root)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('tree index out of range')
+        node = self._root
+        while node is not None:
+            left_size = _size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node.value
+            else:
+                index -= left_size + 1
+                node = node.right
+        raise IndexError('tree index out of range')
+
+    def __iter__(self) -> Iterator[V]:
+        stack: list[_Node] = []
+        node = self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.value
+            node = node.right
+
+    def __reversed__(self) -> Iterator[V]:
+        stack: list[_Node] = []
+        node = self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.right
+            node = stack.pop()
+            yield node.value
+            node = node.left
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def __eq__(self, value: object) -> bool:
+        return (
+            isinstance(value, Sequence) and
+            not isinstance(value, str) and
+            len(value) == len(self) and
+            all(a == b for a, b in zip(self, value))
+        )
+
+    def __repr__(self) -> str:
+        return repr(tuple(self))
@@ -1,5 +1,6 @@
+from typing import Callable
 
-from ...core import PnlBook, TradingPnl
+from ...core import IMatchedPool, IUnmatchedPool, PnlBook, TradingPnl
 
 from .book import Book
 from .matched_pool import MatchedPool
@@ -12,11 +13,41 @@ from .unmatched_pools import UnmatchedPool
 
 class SimplePnlBook(PnlBook[Security, Book, Trade, Context]):
 
-    def __init__(self):
+    def __init__(
+            self,
+            matched_factory: Callable[
+                [Security, Book, Context],
+                IMatchedPool[Trade, Context]
+            ] | None = None,
+            unmatched_factory: Callable[
+                [Security, Book, Context],
+                IUnmatchedPool[Trade, Context]
+            ] | None = None,
+            store: PnlBookStore | None = None
+    ) -> None:
+        """A simple P/L book.
+
+        By default every position records all matches and uses FIFO matching.
+
+        Args:
+            matched_factory (Callable[[Security, Book, Context], IMatchedPool[Trade, Context]] | None, optional):
+                A factory for matched pools, used to choose how matches are
+                recorded for each book. Defaults to None.
+            unmatched_factory (Callable[[Security, Book, Context], IUnmatchedPool[Trade, Context]] | None, optional):
+                A factory for unmatched pools, used to choose the accounting
+                method for each book. Defaults to None.
+            store (PnlBookStore | None, optional): The store for the
+                positions, for example one restored from a checkpoint.
+                Defaults to an empty store.
+        """
         super().__init__(
-            PnlBookStore(),
-            lambda security, book, context: MatchedPool(),
-            lambda security, book, context: UnmatchedPool.Fifo()
+            PnlBookStore() if store is None else store,
+            matched_factory or (
+                lambda security, book, context: MatchedPool()
+            ),
+            unmatched_factory or (
+                lambda security, book, context: UnmatchedPool.Fifo()
+            )
         )
 
     def add_trade(
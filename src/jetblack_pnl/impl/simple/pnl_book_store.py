@@ -1,4 +1,6 @@
 
+from typing import ItemsView, Iterable
+
 from ...core import (
     IPnlBookStore,
     TradingPnl,
@@ -9,12 +11,24 @@ from ...core import (
 from .book import Book
 from .security import Security
 from .trade import Trade
-from .types import Context
+from .types import BookKey, Context, SecurityKey
 
 
 class PnlBookStore(IPnlBookStore[Security, Book, Trade, Context]):
 
-    def __init__(self) -> None:
+    def __init__(
+            self,
+            positions: Iterable[
+                tuple[
+                    tuple[SecurityKey, BookKey],
+                    tuple[
+                        TradingPnl,
+                        IUnmatchedPool[Trade, Context],
+                        IMatchedPool[Trade, Context]
+                    ]
+                ]
+            ] = ()
+    ) -> None:
         self._cache: dict[
             tuple[str, str],
             tuple[
@@ -22,7 +36,7 @@ class PnlBookStore(IPnlBookStore[Security, Book, Trade, Context]):
                 IUnmatchedPool[Trade, Context],
                 IMatchedPool[Trade, Context]
             ]
-        ] = {}
+        ] = dict(positions)
 
     def has(
             self,
@@ -54,3 +68,14 @@ class PnlBookStore(IPnlBookStore[Security, Book, Trade, Context]):
     ) -> None:
         key = (security.key, book.key)
         self._cache[key] = (pnl, unmatched, matched)
+
+    def items(self) -> ItemsView[
+        tuple[SecurityKey, BookKey],
+        tuple[
+            TradingPnl,
+            IUnmatchedPool[Trade, Context],
+            IMatchedPool[Trade, Context]
+        ]
+    ]:
+        """The positions held, keyed by security and book key"""
+        return self._cache.items()
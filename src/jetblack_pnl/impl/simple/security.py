@@ -15,11 +15,15 @@ class Security(ISecurity[SecurityKey]):
             self,
             key: str,
             contract_size: int | Decimal | str,
-            is_cash: bool
+            is_cash: bool,
+            price_scale: int = 0,
+            quantity_scale: int = 0
     ) -> None:
         self._key = key
         self._contract_size = to_decimal(contract_size)
         self._is_cash = is_cash
+        self._price_scale = price_scale
+        self._quantity_scale = quantity_scale
 
     @property
     def key(self) -> str:
@@ -32,3 +36,11 @@ class Security(ISecurity[SecurityKey]):
     @property
     def is_cash(self) -> bool:
         return self._is_cash
+
+    @property
+    def price_scale(self) -> int:
+        return self._price_scale
+
+    @property
+    def quantity_scale(self) -> int:
+        return self._quantity_scale
@@ -0,0 +1,263 @@
+"""A P/L book store which spills cold positions to disk"""
+
+from collections import OrderedDict
+from collections.abc import Sized
+import pickle
+import sqlite3
+from threading import Lock
+from typing import Any, Callable, TypeAlias
+
+from ...core import (
+    IPnlBookStore,
+    TradingPnl,
+    IUnmatchedPool,
+    IMatchedPool,
+)
+
+from .book import Book
+from .security import Security
+from .trade import Trade
+from .types import BookKey, Context, SecurityKey
+
+Entry: TypeAlias = tuple[
+    TradingPnl,
+    IUnmatchedPool[Trade, Context],
+    IMatchedPool[Trade, Context]
+]
+Key: TypeAlias = tuple[SecurityKey, BookKey]
+
+
+def _count(pool: Any) -> int:
+    # The lots of an unsized pool are not read, as that can be costly.
+    return len(pool) if isinstance(pool, Sized) else 0
+
+
+def count_lots(
+        pnl: TradingPnl,
+        unmatched: IUnmatchedPool[Trade, Context],
+        matched: IMatchedPool[Trade, Context]
+) -> int:
+    """Weigh a position by the number of lots and matches it holds.
+
+    Only pools with a length are counted, so a position whose pools have no
+    length weighs one. The weight is a count, not a size in bytes: a lot
+    holding a coalesced or persistent trade may use far more memory than a
+    plain one.
+
+    Args:
+        pnl (TradingPnl): The P/L.
+        unmatched (IUnmatchedPool[Trade, Context]): The unmatched pool.
+        matched (IMatchedPool[Trade, Context]): The matched pool.
+
+    Returns:
+        int: One for the position, plus its lots and matches.
+    """
+    return 1 + _count(unmatched) + _count(matched)
+
+
+class _Shard:
+
+    def __init__(self) -> None:
+        self.entries: OrderedDict[Key, tuple[Entry, int]] = OrderedDict()
+        self.weight = 0
+
+
+class SpillingPnlBookStore(IPnlBookStore[Security, Book, Trade, Context]):
+    """A store which keeps the recently used positions in memory.
+
+    The positions are spread over shards by key. Each shard keeps its
+    positions in least recently used order, and when the total weight of a
+    shard exceeds its share of `max_lots` the least recently used positions
+    are pickled to a sqlite database. A position which becomes flat is
+    treated as the least recently used, so flat positions are evicted first.
+    Spilled positions are loaded back, and removed from the database, when
+    they are next used.
+
+    The database belongs to the store, and any positions left in it by an
+    earlier store are discarded when the store is created. The store may be
+    shared between threads; each call holds a lock for its duration.
+
+    The pools of the positions must be picklable.
+    """
+
+    def __init__(
+            self,
+            max_lots: int,
+            shards: int = 16,
+            path: str = ':memory:',
+            weigher: Callable[
+                [
+                    TradingPnl,
+                    IUnmatchedPool[Trade, Context],
+                    IMatchedPool[Trade, Context]
+                ],
+                int
+            ] = count_lots
+    ) -> None:
+        """Create the store.
+
+        Args:
+            max_lots (int): The total weight of the positions kept in
+                memory, which by default is the number of positions, lots
+                and matches. It bounds a count, not the memory used.
+            shards (int, optional): The number of shards. Defaults to 16.
+            path (str, optional): The path of the sqlite database for spilled
+                positions. Defaults to ':memory:'.
+            weigher (Callable[[TradingPnl, IUnmatchedPool[Trade, Context], IMatchedPool[Trade, Context]], int], optional):
+                Weighs a position against `max_lots`. Defaults to the number
+                of lots and matches held.
+        """
+        self._shard_max_lots = max(max_lots // shards, 1)
+        self._shards = [_Shard() for _ in range(shards)]
+        self._weigher = weigher
+        self._evictions = 0
+        self._lock = Lock()
+        # The lock serialises the use of the connection between threads.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spilled_position (
+                    security_key TEXT NOT NULL,
+                    book_key TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (security_key, book_key)
+                )
+                """
+            )
+            self._connection.execute("DELETE FROM spilled_position")
+
+    @property
+    def resident(self) -> int:
+        """The number of positions held in memory"""
+        return sum(len(shard.entries) for shard in self._shards)
+
+    @property
+    def weight(self) -> int:
+        """The total weight of the positions held in memory"""
+        return sum(shard.weight for shard in self._shards)
+
+    @property
+    def evictions(self) -> int:
+        """The number of times a position has been spilled to disk"""
+        return self._evictions
+
+    def _shard(self, key: Key) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def _spill(self, shard: _Shard) -> None:
+        # Keep at least the most recent position, however heavy.
+        spilled: list[tuple[SecurityKey, BookKey, bytes]] = []
+        while shard.weight > self._shard_max_lots and len(shard.entries) > 1:
+            (security_key, book_key), (entry, weight) = shard.entries.popitem(
+                last=False
+            )
+            shard.weight -= weight
+            spilled.append((security_key, book_key, pickle.dumps(entry)))
+        if not spilled:
+            return
+        with self._connection:
+            self._connection.executemany(
+                """
+                INSERT OR REPLACE INTO spilled_position
+                    (security_key, book_key, data)
+                VALUES (?, ?, ?)
+                """,
+                spilled
+            )
+        self._evictions += len(spilled)
+
+    def _store(self, key: Key, entry: Entry, evict_if_flat: bool) -> None:
+        shard = self._shard(key)
+        previous = shard.entries.pop(key, None)
+        if previous is not None:
+            shard.weight -= previous[1]
+        weight = self._weigher(*entry)
+        shard.entries[key] = (entry, weight)
+        shard.weight += weight
+        if evict_if_flat and entry[0].quantity == 0:
+            shard.entries.move_to_end(key, last=False)
+        self._spill(shard)
+
+    def _load(self, key: Key) -> Entry | None:
+        with self._connection:
+            row = self._connection.execute(
+                """
+                DELETE FROM spilled_position
+                WHERE security_key = ? AND book_key = ?
+                RETURNING data
+                """,
+                key
+            ).fetchone()
+        if row is None:
+            return None
+        entry: Entry = pickle.loads(row[0])
+        # A loaded position is about to be used, so it is kept even if flat.
+        self._store(key, entry, False)
+        return entry
+
+    def has(
+            self,
+            security: Security,
+            book: Book,
+            context: Context
+    ) -> bool:
+        key = (security.key, book.key)
+        with self._lock:
+            if key in self._shard(key).entries:
+                return True
+            return self._connection.execute(
+                """
+                SELECT 1
+                FROM spilled_position
+                WHERE security_key = ? AND book_key = ?
+                """,
+                key
+            ).fetchone() is not None
+
+    def get(
+            self,
+            security: Security,
+            book: Book,
+            context: Context
+    ) -> tuple[TradingPnl, IUnmatchedPool[Trade, Context], IMatchedPool[Trade, Context]]:
+        key = (security.key, book.key)
+        with self._lock:
+            shard = self._shard(key)
+            resident = shard.entries.get(key)
+            if resident is not None:
+                shard.entries.move_to_end(key)
+                return resident[0]
+            entry = self._load(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def set(
+            self,
+            security: Security,
+            book: Book,
+            trade: Trade,
+            pnl: TradingPnl,
+            unmatched: IUnmatchedPool[Trade, Context],
+            matched: IMatchedPool[Trade, Context],
+            context: Context
+    ) -> None:
+        key = (security.key, book.key)
+        with self._lock:
+            if key not in self._shard(key).entries:
+                # A position is either in memory or in the database.
+                with self._connection:
+                    self._connection.execute(
+                        """
+                        DELETE FROM spilled_position
+                        WHERE security_key = ? AND book_key = ?
+                        """,
+                        key
+                    )
+            self._store(key, (pnl, unmatched, matched), True)
+
+    def close(self) -> None:
+        """Close the database of spilled positions"""
+        with self._lock:
+            self._connection.close()
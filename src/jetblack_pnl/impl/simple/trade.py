@@ -1,6 +1,8 @@
 """A simple trade implementation"""
 
+from datetime import datetime
 from decimal import Decimal
+from typing import Sequence
 
 from ...core import ITrade
 
@@ -15,11 +17,13 @@ class Trade(ITrade[TradeKey]):
             self,
             quantity: Decimal | int | str,
             price: Decimal | int | str,
-            key: int | None = None
+            key: int | None = None,
+            timestamp: datetime | None = None
     ) -> None:
         self._quantity = to_decimal(quantity)
         self._price = to_decimal(price)
         self._key = key
+        self._timestamp = timestamp
 
     @property
     def quantity(self) -> Decimal:
@@ -33,12 +37,18 @@ class Trade(ITrade[TradeKey]):
     def key(self) -> TradeKey:
         return self._key
 
+    @property
+    def timestamp(self) -> datetime | None:
+        """When the trade was made, if known"""
+        return self._timestamp
+
     def __eq__(self, value: object) -> bool:
         return (
             isinstance(value, Trade) and
             value.quantity == self.quantity and
             value.price == self.price and
-            value.key == self.key
+            value.key == self.key and
+            value.timestamp == self.timestamp
         )
 
     def __str__(self) -> str:
@@ -48,3 +58,39 @@ class Trade(ITrade[TradeKey]):
 
     def __repr__(self) -> str:
         return str(self)
+
+
+class CoalescedTrade(Trade):
+    """Opening trades at the same price held as a single lot.
+
+    The quantity is the total of the trades, and the key is the key of the
+    first trade.
+    """
+
+    def __init__(self, trades: Sequence[Trade]) -> None:
+        super().__init__(
+            sum((trade.quantity for trade in trades), Decimal(0)),
+            trades[0].price,
+            trades[0].key,
+            trades[0].timestamp
+        )
+        self._trades = tuple(trades)
+
+    @property
+    def trades(self) -> tuple[Trade, ...]:
+        """The trades which make up the lot"""
+        return self._trades
+
+    @property
+    def keys(self) -> tuple[TradeKey, ...]:
+        """The keys of the trades which make up the lot"""
+        return tuple(trade.key for trade in self._trades)
+
+    def __eq__(self, value: object) -> bool:
+        return (
+            isinstance(value, CoalescedTrade) and
+            value.trades == self.trades
+        )
+
+    def __str__(self) -> str:
+        return f"{super().__str__()} ({len(self._trades)} trades)"
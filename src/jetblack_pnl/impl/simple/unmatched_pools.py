@@ -1,58 +1,615 @@
 """A simple implementation of unmatched pools"""
 
-from typing import Sequence
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict, deque
+import copy
+from datetime import timedelta
+from decimal import Decimal
+import heapq
+from typing import Any, Callable, Iterable, Iterator, Sequence, overload
 
-from ...core import SplitTrade, IUnmatchedPool
+from ...core import (
+    SplitTrade,
+    from_scaled,
+    to_scaled,
+    IUnmatchedPool,
+    IConsumableUnmatchedPool,
+    IReducibleUnmatchedPool,
+)
 
-from .trade import Trade
-from .types import Context
+from .persistent_tree import PersistentTree
+from .trade import CoalescedTrade, Trade
+from .types import Context, TradeKey
+
+
+def _take_lots(
+        lots: Iterable[SplitTrade[Trade]],
+        quantity: Decimal
+) -> tuple[list[SplitTrade[Trade]], SplitTrade[Trade] | None]:
+    """Take lots in order until the closing quantity is matched.
+
+    Args:
+        lots (Iterable[SplitTrade[Trade]]): The lots in the order to match.
+        quantity (Decimal): The closing quantity.
+
+    Returns:
+        tuple[list[SplitTrade[Trade]], SplitTrade[Trade] | None]: The matched
+            lots, and the unmatched part of the last lot if it was split.
+    """
+    taken: list[SplitTrade[Trade]] = []
+    remaining = quantity
+    for lot in lots:
+        if remaining == 0:
+            break
+        if abs(remaining) < abs(lot.remaining_quantity):
+            taken.append(SplitTrade(-remaining, lot.trade))
+            return taken, SplitTrade(lot.remaining_quantity + remaining, lot.trade)
+        taken.append(lot)
+        remaining += lot.remaining_quantity
+    return taken, None
+
+
+def _coalesce(
+        lot: SplitTrade[Trade],
+        opening: SplitTrade[Trade]
+) -> SplitTrade[Trade] | None:
+    """Merge an opening lot into a lot at the same price on the same side.
+
+    Args:
+        lot (SplitTrade[Trade]): The lot in the pool.
+        opening (SplitTrade[Trade]): The opening lot.
+
+    Returns:
+        SplitTrade[Trade] | None: The merged lot, or None if the lots have
+            different prices or sides.
+    """
+    if (
+        lot.trade.price != opening.trade.price or
+        (lot.remaining_quantity > 0) != (opening.remaining_quantity > 0)
+    ):
+        return None
+    return SplitTrade(
+        lot.remaining_quantity + opening.remaining_quantity,
+        CoalescedTrade((
+            *(
+                lot.trade.trades
+                if isinstance(lot.trade, CoalescedTrade)
+                else (lot.trade,)
+            ),
+            *(
+                opening.trade.trades
+                if isinstance(opening.trade, CoalescedTrade)
+                else (opening.trade,)
+            ),
+        ))
+    )
+
+
+def _price_time_key(price: Decimal, opening: SplitTrade[Trade]) -> Any:
+    """An ordering by a signed price, then by timestamp where known"""
+    timestamp = opening.trade.timestamp
+    return (price, timestamp is not None, timestamp)
+
+
+def _select_none(
+        closing: SplitTrade[Trade],
+        context: Context
+) -> Sequence[TradeKey]:
+    """The default selector of a specific id pool, which names no lots"""
+    return ()
+
+
+class _SharedSnapshot:
+    """A pool whose lots are held in a tuple which is replaced rather than
+    changed.
+
+    A snapshot shares the tuple, so taking it is O(1). The first change to
+    either pool then copies the tuple, which is O(N).
+    """
+
+    def snapshot(self) -> Any:
+        """Take a snapshot of the pool.
+
+        Returns:
+            Any: A pool of the same type, unaffected by later changes to
+                this pool.
+        """
+        return copy.copy(self)
+
+
+class _CopyingSnapshot:
+    """A pool whose lots are held in the mutable containers named by
+    `_containers`.
+
+    A snapshot copies the containers, so taking it is O(N), and later changes
+    to either pool cost what they would otherwise.
+    """
+
+    _containers: tuple[str, ...] = ()
+
+    def snapshot(self) -> Any:
+        """Take a snapshot of the pool.
+
+        Returns:
+            Any: A pool of the same type, unaffected by later changes to
+                this pool.
+        """
+        pool = copy.copy(self)
+        for name in self._containers:
+            setattr(pool, name, copy.copy(getattr(self, name)))
+        return pool
+
+
+class _DequeView(Sequence[SplitTrade[Trade]]):
+    """A read only view of the lots in a deque"""
+
+    __slots__ = ('_lots',)
+
+    def __init__(self, lots: deque[SplitTrade[Trade]]) -> None:
+        self._lots = lots
+
+    @overload
+    def __getitem__(self, index: int) -> SplitTrade[Trade]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[SplitTrade[Trade]]: ...
+
+    def __getitem__(
+            self,
+            index: int | slice
+    ) -> SplitTrade[Trade] | Sequence[SplitTrade[Trade]]:
+        if isinstance(index, slice):
+            return tuple(self._lots)[index]
+        return self._lots[index]
+
+    def __iter__(self) -> Iterator[SplitTrade[Trade]]:
+        return iter(self._lots)
+
+    def __reversed__(self) -> Iterator[SplitTrade[Trade]]:
+        return reversed(self._lots)
+
+    def __len__(self) -> int:
+        return len(self._lots)
+
+    def __eq__(self, value: object) -> bool:
+        return (
+            isinstance(value, Sequence) and
+            not isinstance(value, str) and
+            len(value) == len(self._lots) and
+            all(a == b for a, b in zip(self._lots, value))
+        )
+
+    def __repr__(self) -> str:
+        return repr(tuple(self._lots))
+
+
+class _HeapPricePool(
+        ABC,
+        _CopyingSnapshot,
+        IConsumableUnmatchedPool[Trade, Context],
+        IReducibleUnmatchedPool[Trade, Context]
+):
+    """A mutable pool which matches lots in price order using a heap.
+
+    The heap entries are (key, sequence, lot). Lots with the same price are
+    matched first in first out by the sequence. A lot inserted at the front
+    is given a sequence lower than any other, so a split remainder is matched
+    before other lots at the same price.
+
+    The heap is only partly ordered, so `pool` sorts it, which is
+    O(N log N). The sorted lots are kept until the pool next changes.
+    """
+
+    _containers = ('_heap',)
+
+    def __init__(self, pool: Iterable[SplitTrade[Trade]] = ()) -> None:
+        self._heap: list[tuple[Any, int, SplitTrade[Trade]]] = []
+        self._back = 0
+        self._front = -1
+        self._sorted: tuple[SplitTrade[Trade], ...] | None = None
+        for opening in pool:
+            self.append(opening, None)
+
+    @abstractmethod
+    def _key(self, opening: SplitTrade[Trade]) -> Any:
+        """The key of a lot; the lowest key is matched first"""
+
+    def append(self, opening: SplitTrade[Trade], context: Context) -> None:
+        heapq.heappush(self._heap, (self._key(opening), self._back, opening))
+        self._back += 1
+        self._sorted = None
+
+    def insert(self, opening: SplitTrade[Trade], context: Context) -> None:
+        heapq.heappush(self._heap, (self._key(opening), self._front, opening))
+        self._front -= 1
+        self._sorted = None
+
+    def pop(self, _closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+        self._sorted = None
+        return heapq.heappop(self._heap)[2]
+
+    def consume(
+            self,
+            quantity: Decimal,
+            closing: SplitTrade[Trade],
+            context: Context
+    ) -> Sequence[SplitTrade[Trade]]:
+        self._sorted = None
+        taken: list[SplitTrade[Trade]] = []
+        remaining = quantity
+        while remaining != 0 and self._heap:
+            opening = self._heap[0][2]
+            if abs(remaining) < abs(opening.remaining_quantity):
+                taken.append(SplitTrade(-remaining, opening.trade))
+                self.reduce(-remaining, closing, context)
+                break
+            taken.append(heapq.heappop(self._heap)[2])
+            remaining += opening.remaining_quantity
+        return taken
+
+    def peek(self, _closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+        return self._heap[0][2]
+
+    def reduce(
+            self,
+            quantity: Decimal,
+            _closing: SplitTrade[Trade],
+            context: Context
+    ) -> None:
+        self._sorted = None
+        key, sequence, opening = self._heap[0]
+        if quantity == opening.remaining_quantity:
+            heapq.heappop(self._heap)
+        else:
+            # The key is unchanged so the lot keeps its place in the heap.
+            self._heap[0] = (
+                key,
+                sequence,
+                SplitTrade(opening.remaining_quantity - quantity, opening.trade)
+            )
+
+    def has(self, _closing: SplitTrade[Trade], context: Context) -> bool:
+        return len(self._heap) > 0
+
+    def pool(self, context: Context) -> Sequence[SplitTrade[Trade]]:
+        """Returns the unmatched pool in the order the lots would be matched"""
+        if self._sorted is None:
+            self._sorted = tuple(opening for _, _, opening in sorted(self._heap))
+        return self._sorted
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __eq__(self, value: object) -> bool:
+        return (
+            type(value) is type(self) and
+            value.pool(None) == self.pool(None)
+        )
+
+    def __str__(self) -> str:
+        return str(self.pool(None))
+
+    def __repr__(self) -> str:
+        return str(self.pool(None))
+
+
+class _PersistentPool(IConsumableUnmatchedPool[Trade, Context]):
+    """A pool held in a persistent tree, matching from the lowest key.
+
+    Each change is O(log N) and shares memory with earlier versions, so a
+    snapshot of the pool is O(1).
+    """
+
+    def __init__(self, pool: Iterable[SplitTrade[Trade]] = ()) -> None:
+        self._tree: PersistentTree[SplitTrade[Trade]] = PersistentTree()
+        self._back = 0
+        self._front = -1
+        for opening in pool:
+            self.append(opening, None)
+
+    def _key(self, opening: SplitTrade[Trade], sequence: int) -> Any:
+        """The key of a lot; the lowest key is matched first"""
+        return sequence
+
+    def snapshot(self) -> Any:
+        """Take a snapshot of the pool.
+
+        Returns:
+            Any: A pool of the same type, unaffected by later changes to
+                this pool.
+        """
+        return copy.copy(self)
+
+    def append(self, opening: SplitTrade[Trade], context: Context) -> None:
+        self._tree = self._tree.insert(self._key(opening, self._back), opening)
+        self._back += 1
+
+    def insert(self, opening: SplitTrade[Trade], context: Context) -> None:
+        self._tree = self._tree.insert(self._key(opening, self._front), opening)
+        self._front -= 1
+
+    def pop(self, _closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+        opening, self._tree = self._tree.pop_first()
+        return opening
+
+    def consume(
+            self,
+            quantity: Decimal,
+            _closing: SplitTrade[Trade],
+            context: Context
+    ) -> Sequence[SplitTrade[Trade]]:
+        taken, unmatched = _take_lots(self._tree, quantity)
+        tree = self._tree
+        for _ in range(len(taken) - (0 if unmatched is None else 1)):
+            _, tree = tree.pop_first()
+        if unmatched is not None:
+            tree = tree.replace_first(unmatched)
+        self._tree = tree
+        return taken
+
+    def has(self, _closing: SplitTrade[Trade], context: Context) -> bool:
+        return len(self._tree) > 0
+
+    def pool(self, context: Context) -> Sequence[SplitTrade[Trade]]:
+        """Returns the unmatched pool in the order the lots are held"""
+        return self._tree
+
+    def __len__(self) -> int:
+        return len(self._tree)
+
+    def __eq__(self, value: object) -> bool:
+        return (
+            type(value) is type(self) and
+            value.pool(None) == self._tree
+        )
+
+    def __str__(self) -> str:
+        return str(self._tree)
+
+    def __repr__(self) -> str:
+        return str(self._tree)
+
+
+class _ReduciblePersistentPool(
+        _PersistentPool,
+        IReducibleUnmatchedPool[Trade, Context]
+):
+
+    def peek(self, _closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+        return self._tree[0]
+
+    def reduce(
+            self,
+            quantity: Decimal,
+            _closing: SplitTrade[Trade],
+            context: Context
+    ) -> None:
+        opening = self._tree[0]
+        if quantity == opening.remaining_quantity:
+            _, self._tree = self._tree.pop_first()
+        else:
+            self._tree = self._tree.replace_first(
+                SplitTrade(opening.remaining_quantity - quantity, opening.trade)
+            )
 
 
 class UnmatchedPool:
 
-    class Fifo(IUnmatchedPool[Trade, Context]):
+    class Fifo(
+            IConsumableUnmatchedPool[Trade, Context],
+            IReducibleUnmatchedPool[Trade, Context]
+    ):
+        """A first in first out pool.
 
-        def __init__(self, pool: Sequence[SplitTrade[Trade]] = ()) -> None:
-            self._pool = pool
+        The lots are held in a list with the index of the first unmatched
+        lot, so matching a lot in full or in part is O(1). A lot which is
+        partly matched or inserted is held in a short tuple ahead of the
+        list, so the list is only ever appended to. The matched lots before
+        the index are dropped, by starting a new list, once they make up
+        half the list.
+
+        A snapshot shares the list, so taking it is O(1). The pool goes on
+        appending to the list beyond the end of the snapshot, and the
+        snapshot holds the lots it appends, and its own copy of the last
+        shared lot, in a private list. When the snapshot has matched all the
+        shared lots, the private list becomes its list.
+        """
+
+        def __init__(
+                self,
+                pool: Iterable[SplitTrade[Trade]] = (),
+                coalesce: bool = False
+        ) -> None:
+            """Create the pool.
+
+            Args:
+                pool (Iterable[SplitTrade[Trade]], optional): The initial
+                    lots. Defaults to ().
+                coalesce (bool, optional): If true an opening lot at the same
+                    price and side as the last lot is merged into it.
+                    Defaults to False.
+            """
+            # The lots are the front, then lots[head:end], then the tail. The
+            # pool owns the list, and may append to it, when the tail is
+            # empty. Once lots[head:end] is empty so is the tail.
+            self._front: tuple[SplitTrade[Trade], ...] = ()
+            self._lots = list(pool)
+            self._head = 0
+            self._end = len(self._lots)
+            self._tail: list[SplitTrade[Trade]] = []
+            self._coalesce = coalesce
+
+        def _settle(self) -> None:
+            if self._head == self._end:
+                if self._tail:
+                    self._lots, self._tail = self._tail, []
+                else:
+                    # The list may be shared, so it is replaced, not cleared.
+                    self._lots = []
+                self._head, self._end = 0, len(self._lots)
+            elif not self._tail and self._head * 2 >= self._end:
+                self._lots = self._lots[self._head:self._end]
+                self._head, self._end = 0, len(self._lots)
+
+        def _advance(self, count: int) -> None:
+            if self._front:
+                if count < len(self._front):
+                    self._front = self._front[count:]
+                    return
+                count -= len(self._front)
+                self._front = ()
+            shared = self._end - self._head
+            if count > shared:
+                self._lots, self._tail = self._tail, []
+                self._head, self._end = count - shared, len(self._lots)
+            else:
+                self._head += count
+            self._settle()
+
+        def snapshot(self) -> 'UnmatchedPool.Fifo':
+            """Take a snapshot of the pool.
+
+            Returns:
+                UnmatchedPool.Fifo: A pool unaffected by later changes to
+                    this pool.
+            """
+            pool = copy.copy(self)
+            if self._tail:
+                pool._tail = list(self._tail)
+            elif self._head < self._end:
+                # The owner may change its last lot, so the snapshot copies
+                # it, and ends the shared lots before it.
+                pool._end -= 1
+                pool._tail = [self._lots[pool._end]]
+                pool._settle()
+            else:
+                pool._lots = []
+            return pool
 
         def append(self, opening: SplitTrade[Trade], context: Context) -> None:
-            self._pool = tuple((*self._pool, opening))
+            if self._coalesce:
+                if self._tail:
+                    merged = _coalesce(self._tail[-1], opening)
+                    if merged is not None:
+                        self._tail[-1] = merged
+                        return
+                elif self._head < self._end:
+                    merged = _coalesce(self._lots[-1], opening)
+                    if merged is not None:
+                        self._lots[-1] = merged
+                        return
+                elif self._front:
+                    merged = _coalesce(self._front[-1], opening)
+                    if merged is not None:
+                        self._front = (*self._front[:-1], merged)
+                        return
+            if self._tail:
+                self._tail.append(opening)
+            else:
+                self._lots.append(opening)
+                self._end += 1
 
         def insert(self, opening: SplitTrade[Trade], context: Context) -> None:
-            self._pool = tuple((opening, *self._pool))
+            self._front = (opening, *self._front)
 
         def pop(self, _closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
-            trade, self._pool = (self._pool[0], self._pool[1:])
-            return trade
+            if not self._front and self._head == self._end:
+                raise IndexError('pop from an empty pool')
+            opening = self._front[0] if self._front else self._lots[self._head]
+            self._advance(1)
+            return opening
+
+        def consume(
+                self,
+                quantity: Decimal,
+                _closing: SplitTrade[Trade],
+                context: Context
+        ) -> Sequence[SplitTrade[Trade]]:
+            taken, unmatched = _take_lots(self._iter_lots(), quantity)
+            self._advance(len(taken))
+            if unmatched is not None:
+                self._front = (unmatched, *self._front)
+            return taken
+
+        def peek(self, _closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+            return self._front[0] if self._front else self._lots[self._head]
+
+        def reduce(
+                self,
+                quantity: Decimal,
+                _closing: SplitTrade[Trade],
+                context: Context
+        ) -> None:
+            opening = self.peek(_closing, context)
+            self._advance(1)
+            if quantity != opening.remaining_quantity:
+                self._front = (
+                    SplitTrade(
+                        opening.remaining_quantity - quantity,
+                        opening.trade
+                    ),
+                    *self._front
+                )
 
         def has(self, _closing: SplitTrade[Trade], context: Context) -> bool:
-            return len(self._pool) > 0
+            return bool(self._front) or self._head < self._end
+
+        def _iter_lots(self) -> Iterator[SplitTrade[Trade]]:
+            yield from self._front
+            lots = self._lots
+            for index in range(self._head, self._end):
+                yield lots[index]
+            yield from self._tail
 
         def pool(self, context: Context) -> Sequence[SplitTrade[Trade]]:
-            """Returns the unmatched pool"""
-            return self._pool
+            """Returns a copy of the unmatched pool"""
+            return (
+                *self._front,
+                *self._lots[self._head:self._end],
+                *self._tail
+            )
 
         def __len__(self) -> int:
-            return len(self._pool)
+            return len(self._front) + self._end - self._head + len(self._tail)
 
         def __eq__(self, value: object) -> bool:
             return (
                 isinstance(value, UnmatchedPool.Fifo) and
-                value._pool == self._pool
+                value.pool(None) == self.pool(None)
             )
 
         def __str__(self) -> str:
-            return str(self._pool)
+            return str(tuple(self._iter_lots()))
 
         def __repr__(self) -> str:
-            return str(self._pool)
+            return str(tuple(self._iter_lots()))
 
-    class Lifo(IUnmatchedPool[Trade, Context]):
+    class Lifo(_SharedSnapshot, IConsumableUnmatchedPool[Trade, Context]):
 
-        def __init__(self, pool: Sequence[SplitTrade[Trade]] = ()) -> None:
+        def __init__(
+                self,
+                pool: Sequence[SplitTrade[Trade]] = (),
+                coalesce: bool = False
+        ) -> None:
+            """Create the pool.
+
+            Args:
+                pool (Sequence[SplitTrade[Trade]], optional): The initial
+                    lots. Defaults to ().
+                coalesce (bool, optional): If true an opening lot at the same
+                    price and side as the last lot is merged into it.
+                    Defaults to False.
+            """
             self._pool = pool
+            self._coalesce = coalesce
 
         def append(self, opening: SplitTrade[Trade], context: Context) -> None:
+            if self._coalesce and self._pool:
+                merged = _coalesce(self._pool[-1], opening)
+                if merged is not None:
+                    self._pool = tuple((*self._pool[:-1], merged))
+                    return
             self._pool = tuple((*self._pool, opening))
 
         def insert(self, opening: SplitTrade[Trade], context: Context) -> None:
@@ -66,6 +623,17 @@ class UnmatchedPool:
             trade, self._pool = (self._pool[-1], self._pool[:-1])
             return trade
 
+        def consume(
+                self,
+                quantity: Decimal,
+                _closing: SplitTrade[Trade],
+                context: Context
+        ) -> Sequence[SplitTrade[Trade]]:
+            taken, unmatched = _take_lots(reversed(self._pool), quantity)
+            rest = self._pool[:len(self._pool) - len(taken)]
+            self._pool = rest if unmatched is None else (unmatched, *rest)
+            return taken
+
         def has(self, _closing: SplitTrade[Trade], context: Context) -> bool:
             return len(self._pool) > 0
 
@@ -88,12 +656,31 @@ class UnmatchedPool:
         def __repr__(self) -> str:
             return str(self._pool)
 
-    class BestPrice(IUnmatchedPool[Trade, Context]):
+    class BestPrice(_SharedSnapshot, IConsumableUnmatchedPool[Trade, Context]):
+
+        def __init__(
+                self,
+                pool: Sequence[SplitTrade[Trade]] = (),
+                coalesce: bool = False
+        ) -> None:
+            """Create the pool.
 
-        def __init__(self, pool: Sequence[SplitTrade[Trade]] = ()) -> None:
+            Args:
+                pool (Sequence[SplitTrade[Trade]], optional): The initial
+                    lots. Defaults to ().
+                coalesce (bool, optional): If true an opening lot at the same
+                    price and side as the last lot is merged into it.
+                    Defaults to False.
+            """
             self._pool = pool
+            self._coalesce = coalesce
 
         def append(self, opening: SplitTrade[Trade], context: Context) -> None:
+            if self._coalesce and self._pool:
+                merged = _coalesce(self._pool[-1], opening)
+                if merged is not None:
+                    self._pool = tuple((*self._pool[:-1], merged))
+                    return
             self._pool = tuple((*self._pool, opening))
 
         def insert(self, opening: SplitTrade[Trade], context: Context) -> None:
@@ -108,6 +695,22 @@ class UnmatchedPool:
             )
             return trade
 
+        def consume(
+                self,
+                quantity: Decimal,
+                closing: SplitTrade[Trade],
+                context: Context
+        ) -> Sequence[SplitTrade[Trade]]:
+            self._pool = sorted(self._pool, key=lambda x: x.trade.price)
+            if closing.remaining_quantity < 0:
+                taken, unmatched = _take_lots(self._pool, quantity)
+                rest = self._pool[len(taken):]
+            else:
+                taken, unmatched = _take_lots(reversed(self._pool), quantity)
+                rest = self._pool[:len(self._pool) - len(taken)]
+            self._pool = rest if unmatched is None else (unmatched, *rest)
+            return taken
+
         def has(self, _closing: SplitTrade[Trade], context: Context) -> bool:
             return len(self._pool) > 0
 
@@ -130,12 +733,31 @@ class UnmatchedPool:
         def __repr__(self) -> str:
             return str(self._pool)
 
-    class WorstPrice(IUnmatchedPool[Trade, Context]):
+    class WorstPrice(_SharedSnapshot, IConsumableUnmatchedPool[Trade, Context]):
+
+        def __init__(
+                self,
+                pool: Sequence[SplitTrade[Trade]] = (),
+                coalesce: bool = False
+        ) -> None:
+            """Create the pool.
 
-        def __init__(self, pool: Sequence[SplitTrade[Trade]] = ()) -> None:
+            Args:
+                pool (Sequence[SplitTrade[Trade]], optional): The initial
+                    lots. Defaults to ().
+                coalesce (bool, optional): If true an opening lot at the same
+                    price and side as the last lot is merged into it.
+                    Defaults to False.
+            """
             self._pool = pool
+            self._coalesce = coalesce
 
         def append(self, opening: SplitTrade[Trade], context: Context) -> None:
+            if self._coalesce and self._pool:
+                merged = _coalesce(self._pool[-1], opening)
+                if merged is not None:
+                    self._pool = tuple((*self._pool[:-1], merged))
+                    return
             self._pool = tuple((*self._pool, opening))
 
         def insert(self, opening: SplitTrade[Trade], context: Context) -> None:
@@ -150,6 +772,22 @@ class UnmatchedPool:
             )
             return trade
 
+        def consume(
+                self,
+                quantity: Decimal,
+                closing: SplitTrade[Trade],
+                context: Context
+        ) -> Sequence[SplitTrade[Trade]]:
+            self._pool = sorted(self._pool, key=lambda x: x.trade.price)
+            if closing.remaining_quantity <= 0:
+                taken, unmatched = _take_lots(reversed(self._pool), quantity)
+                rest = self._pool[:len(self._pool) - len(taken)]
+            else:
+                taken, unmatched = _take_lots(self._pool, quantity)
+                rest = self._pool[len(taken):]
+            self._pool = rest if unmatched is None else (unmatched, *rest)
+            return taken
+
         def has(self, _closing: SplitTrade[Trade], context: Context) -> bool:
             return len(self._pool) > 0
 
@@ -171,3 +809,811 @@ class UnmatchedPool:
 
         def __repr__(self) -> str:
             return str(self._pool)
+
+    class DequeFifo(
+            _CopyingSnapshot,
+            IConsumableUnmatchedPool[Trade, Context],
+            IReducibleUnmatchedPool[Trade, Context]
+    ):
+        """A mutable first in first out pool.
+
+        Appending, inserting and popping are constant time. The pool returned
+        by `pool` is a read only view which changes with the pool.
+        """
+
+        _containers = ('_pool',)
+
+        def __init__(
+                self,
+                pool: Iterable[SplitTrade[Trade]] = (),
+                coalesce: bool = False
+        ) -> None:
+            """Create the pool.
+
+            Args:
+                pool (Iterable[SplitTrade[Trade]], optional): The initial
+                    lots. Defaults to ().
+                coalesce (bool, optional): If true an opening lot at the same
+                    price and side as the last lot is merged into it.
+                    Defaults to False.
+            """
+            self._pool = deque(pool)
+            self._coalesce = coalesce
+
+        def append(self, opening: SplitTrade[Trade], context: Context) -> None:
+            if self._coalesce and self._pool:
+                merged = _coalesce(self._pool[-1], opening)
+                if merged is not None:
+                    self._pool[-1] = merged
+                    return
+            self._pool.append(opening)
+
+        def insert(self, opening: SplitTrade[Trade], context: Context) -> None:
+            self._pool.appendleft(opening)
+
+        def pop(self, _closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+            return self._pool.popleft()
+
+        def consume(
+                self,
+                quantity: Decimal,
+                _closing: SplitTrade[Trade],
+                context: Context
+        ) -> Sequence[SplitTrade[Trade]]:
+            taken, unmatched = _take_lots(self._pool, quantity)
+            for _ in taken:
+                self._pool.popleft()
+            if unmatched is not None:
+                self._pool.appendleft(unmatched)
+            return taken
+
+        def peek(self, _closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+            return self._pool[0]
+
+        def reduce(
+                self,
+                quantity: Decimal,
+                _closing: SplitTrade[Trade],
+                context: Context
+        ) -> None:
+            opening = self._pool.popleft()
+            if quantity != opening.remaining_quantity:
+                self._pool.appendleft(
+                    SplitTrade(
+                        opening.remaining_quantity - quantity,
+                        opening.trade
+                    )
+                )
+
+        def has(self, _closing: SplitTrade[Trade], context: Context) -> bool:
+            return len(self._pool) > 0
+
+        def pool(self, context: Context) -> Sequence[SplitTrade[Trade]]:
+            """Returns a read only view of the unmatched pool"""
+            return _DequeView(self._pool)
+
+        def __len__(self) -> int:
+            return len(self._pool)
+
+        def __eq__(self, value: object) -> bool:
+            return (
+                isinstance(value, UnmatchedPool.DequeFifo) and
+                value._pool == self._pool
+            )
+
+        def __str__(self) -> str:
+            return str(tuple(self._pool))
+
+        def __repr__(self) -> str:
+            return str(tuple(self._pool))
+
+    class DequeLifo(_CopyingSnapshot, IConsumableUnmatchedPool[Trade, Context]):
+        """A mutable last in first out pool.
+
+        Appending, inserting and popping are constant time. The pool returned
+        by `pool` is a read only view which changes with the pool.
+        """
+
+        _containers = ('_pool',)
+
+        def __init__(
+                self,
+                pool: Iterable[SplitTrade[Trade]] = (),
+                coalesce: bool = False
+        ) -> None:
+            """Create the pool.
+
+            Args:
+                pool (Iterable[SplitTrade[Trade]], optional): The initial
+                    lots. Defaults to ().
+                coalesce (bool, optional): If true an opening lot at the same
+                    price and side as the last lot is merged into it.
+                    Defaults to False.
+            """
+            self._pool = deque(pool)
+            self._coalesce = coalesce
+
+        def append(self, opening: SplitTrade[Trade], context: Context) -> None:
+            if self._coalesce and self._pool:
+                merged = _coalesce(self._pool[-1], opening)
+                if merged is not None:
+                    self._pool[-1] = merged
+                    return
+            self._pool.append(opening)
+
+        def insert(self, opening: SplitTrade[Trade], context: Context) -> None:
+            self._pool.appendleft(opening)
+
+        def pop(
+                self,
+                _closing: SplitTrade[Trade],
+                context: Context
+        ) -> SplitTrade[Trade]:
+            return self._pool.pop()
+
+        def consume(
+                self,
+                quantity: Decimal,
+                _closing: SplitTrade[Trade],
+                context: Context
+        ) -> Sequence[SplitTrade[Trade]]:
+            taken, unmatched = _take_lots(reversed(self._pool), quantity)
+            for _ in taken:
+                self._pool.pop()
+            if unmatched is not None:
+                self._pool.appendleft(unmatched)
+            return taken
+
+        def has(self, _closing: SplitTrade[Trade], context: Context) -> bool:
+            return len(self._pool) > 0
+
+        def pool(self, context: Context) -> Sequence[SplitTrade[Trade]]:
+            """Returns a read only view of the unmatched pool"""
+            return _DequeView(self._pool)
+
+        def __len__(self) -> int:
+            return len(self._pool)
+
+        def __eq__(self, value: object) -> bool:
+            return (
+                isinstance(value, UnmatchedPool.DequeLifo) and
+                value._pool == self._pool
+            )
+
+        def __str__(self) -> str:
+            return str(tuple(self._pool))
+
+        def __repr__(self) -> str:
+            return str(tuple(self._pool))
+
+    class HeapBestPrice(_HeapPricePool):
+        """A mutable pool which matches the lot with the best price first.
+
+        A long position is closed from the lowest price, and a short position
+        from the highest. Popping a lot is O(log N).
+        """
+
+        def _key(self, opening: SplitTrade[Trade]) -> Decimal:
+            price = opening.trade.price
+            return price if opening.remaining_quantity > 0 else -price
+
+    class HeapWorstPrice(_HeapPricePool):
+        """A mutable pool which matches the lot with the worst price first.
+
+        A long position is closed from the highest price, and a short position
+        from the lowest. Popping a lot is O(log N).
+        """
+
+        def _key(self, opening: SplitTrade[Trade]) -> Decimal:
+            price = opening.trade.price
+            return -price if opening.remaining_quantity > 0 else price
+
+    class PersistentFifo(_ReduciblePersistentPool):
+        """A first in first out pool with O(1) snapshots"""
+
+        def __init__(
+                self,
+                pool: Iterable[SplitTrade[Trade]] = (),
+                coalesce: bool = False
+        ) -> None:
+            """Create the pool.
+
+            Args:
+                pool (Iterable[SplitTrade[Trade]], optional): The initial
+                    lots. Defaults to ().
+                coalesce (bool, optional): If true an opening lot at the same
+                    price and side as the last lot is merged into it.
+                    Defaults to False.
+            """
+            self._coalesce = coalesce
+            super().__init__(pool)
+
+        def append(self, opening: SplitTrade[Trade], context: Context) -> None:
+            if self._coalesce and self._tree:
+                merged = _coalesce(self._tree[-1], opening)
+                if merged is not None:
+                    self._tree = self._tree.replace_last(merged)
+                    return
+            super().append(opening, context)
+
+    class PersistentLifo(_PersistentPool):
+        """A last in first out pool with O(1) snapshots"""
+
+        def __init__(
+                self,
+                pool: Iterable[SplitTrade[Trade]] = (),
+                coalesce: bool = False
+        ) -> None:
+            """Create the pool.
+
+            Args:
+                pool (Iterable[SplitTrade[Trade]], optional): The initial
+                    lots. Defaults to ().
+                coalesce (bool, optional): If true an opening lot at the same
+                    price and side as the last lot is merged into it.
+                    Defaults to False.
+            """
+            self._coalesce = coalesce
+            super().__init__(pool)
+
+        def append(self, opening: SplitTrade[Trade], context: Context) -> None:
+            if self._coalesce and self._tree:
+                merged = _coalesce(self._tree[-1], opening)
+                if merged is not None:
+                    self._tree = self._tree.replace_last(merged)
+                    return
+            super().append(opening, context)
+
+        def pop(
+                self,
+                _closing: SplitTrade[Trade],
+                context: Context
+        ) -> SplitTrade[Trade]:
+            opening, self._tree = self._tree.pop_last()
+            return opening
+
+        def consume(
+                self,
+                quantity: Decimal,
+                _closing: SplitTrade[Trade],
+                context: Context
+        ) -> Sequence[SplitTrade[Trade]]:
+            taken, unmatched = _take_lots(reversed(self._tree), quantity)
+            for _ in taken:
+                _, self._tree = self._tree.pop_last()
+            if unmatched is not None:
+                self.insert(unmatched, context)
+            return taken
+
+    class PersistentBestPrice(_ReduciblePersistentPool):
+        """A best price pool with O(1) snapshots.
+
+        Lots at the same price are matched first in first out.
+        """
+
+        def _key(self, opening: SplitTrade[Trade], sequence: int) -> Any:
+            price = opening.trade.price
+            return (price if opening.remaining_quantity > 0 else -price, sequence)
+
+    class PersistentWorstPrice(_ReduciblePersistentPool):
+        """A worst price pool with O(1) snapshots.
+
+        Lots at the same price are matched first in first out.
+        """
+
+        def _key(self, opening: SplitTrade[Trade], sequence: int) -> Any:
+            price = opening.trade.price
+            return (-price if opening.remaining_quantity > 0 else price, sequence)
+
+    class SpecificId(
+            _CopyingSnapshot,
+            IConsumableUnmatchedPool[Trade, Context],
+            IReducibleUnmatchedPool[Trade, Context]
+    ):
+        """A pool which matches the lots chosen for a closing trade.
+
+        The lots are indexed by trade key. A selector names the keys of the
+        lots a closing trade should match, in order. Lots which have been
+        closed are skipped, and any residual quantity is matched first in
+        first out. Finding, splitting and removing a lot are O(1).
+
+        The keys of the open lots must be unique. Lots of trades without a
+        key are indexed by identity, so they can only be matched first in
+        first out.
+        """
+
+        _containers = ('_lots',)
+
+        def __init__(
+                self,
+                selector: Callable[
+                    [SplitTrade[Trade], Context],
+                    Sequence[TradeKey]
+                ] = _select_none,
+                pool: Iterable[SplitTrade[Trade]] = ()
+        ) -> None:
+            """Create the pool.
+
+            Args:
+                selector (Callable[[SplitTrade[Trade], Context], Sequence[TradeKey]], optional):
+                    A function returning the keys of the lots to match with
+                    a closing trade. Defaults to matching first in first out.
+                pool (Iterable[SplitTrade[Trade]], optional): The initial
+                    lots. Defaults to ().
+            """
+            self._selector = selector
+            self._lots: OrderedDict[TradeKey, SplitTrade[Trade]] = OrderedDict()
+            for opening in pool:
+                self.append(opening, None)
+
+        def _select(self, keys: Sequence[TradeKey]) -> TradeKey:
+            for key in keys:
+                if key in self._lots:
+                    return key
+            return next(iter(self._lots))
+
+        def lot(self, key: TradeKey) -> SplitTrade[Trade] | None:
+            """Find an open lot.
+
+            Args:
+                key (TradeKey): The key of the opening trade.
+
+            Returns:
+                SplitTrade[Trade] | None: The lot, or None if the trade has no
+                    open quantity.
+            """
+            return self._lots.get(key)
+
+        def _add(self, opening: SplitTrade[Trade]) -> Any:
+            key: Any = opening.trade.key
+            if key is None:
+                # Unkeyed lots get a key no selector can name.
+                key = object()
+            elif key in self._lots:
+                raise ValueError(f"a lot with trade key {key} is already open")
+            self._lots[key] = opening
+            return key
+
+        def append(self, opening: SplitTrade[Trade], context: Context) -> None:
+            self._add(opening)
+
+        def insert(self, opening: SplitTrade[Trade], context: Context) -> None:
+            self._lots.move_to_end(self._add(opening), last=False)
+
+        def pop(self, closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+            return self._lots.pop(self._select(self._selector(closing, context)))
+
+        def consume(
+                self,
+                quantity: Decimal,
+                closing: SplitTrade[Trade],
+                context: Context
+        ) -> Sequence[SplitTrade[Trade]]:
+            keys = self._selector(closing, context)
+            taken: list[SplitTrade[Trade]] = []
+            remaining = quantity
+            while remaining != 0 and self._lots:
+                key = self._select(keys)
+                opening = self._lots[key]
+                if abs(remaining) < abs(opening.remaining_quantity):
+                    taken.append(SplitTrade(-remaining, opening.trade))
+                    self._reduce(key, -remaining)
+                    break
+                del self._lots[key]
+                taken.append(opening)
+                remaining += opening.remaining_quantity
+            return taken
+
+        def peek(self, closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+            return self._lots[self._select(self._selector(closing, context))]
+
+        def reduce(
+                self,
+                quantity: Decimal,
+                closing: SplitTrade[Trade],
+                context: Context
+        ) -> None:
+            self._reduce(self._select(self._selector(closing, context)), quantity)
+
+        def _reduce(self, key: TradeKey, quantity: Decimal) -> None:
+            opening = self._lots[key]
+            if quantity == opening.remaining_quantity:
+                del self._lots[key]
+            else:
+                # A split lot moves to the front, as if popped and inserted.
+                self._lots[key] = SplitTrade(
+                    opening.remaining_quantity - quantity,
+                    opening.trade
+                )
+                self._lots.move_to_end(key, last=False)
+
+        def has(self, _closing: SplitTrade[Trade], context: Context) -> bool:
+            return len(self._lots) > 0
+
+        def pool(self, context: Context) -> Sequence[SplitTrade[Trade]]:
+            """Returns the unmatched pool"""
+            return tuple(self._lots.values())
+
+        def __len__(self) -> int:
+            return len(self._lots)
+
+        def __eq__(self, value: object) -> bool:
+            return (
+                isinstance(value, UnmatchedPool.SpecificId) and
+                value.pool(None) == self.pool(None)
+            )
+
+        def __str__(self) -> str:
+            return str(self.pool(None))
+
+        def __repr__(self) -> str:
+            return str(self.pool(None))
+
+    class Hifo(_HeapPricePool):
+        """A highest in first out pool.
+
+        The lot with the highest price is matched first. Lots at the same
+        price are matched by timestamp, then first in first out. Popping a
+        lot is O(log N).
+        """
+
+        def _key(self, opening: SplitTrade[Trade]) -> Any:
+            return _price_time_key(-opening.trade.price, opening)
+
+    class Lofo(_HeapPricePool):
+        """A lowest in first out pool.
+
+        The lot with the lowest price is matched first. Lots at the same
+        price are matched by timestamp, then first in first out. Popping a
+        lot is O(log N).
+        """
+
+        def _key(self, opening: SplitTrade[Trade]) -> Any:
+            return _price_time_key(opening.trade.price, opening)
+
+    class TaxMinimizing(
+            _CopyingSnapshot,
+            IConsumableUnmatchedPool[Trade, Context],
+            IReducibleUnmatchedPool[Trade, Context]
+    ):
+        """A pool which matches long term lots before short term lots.
+
+        A lot is long term when it was opened at least the holding period
+        before the closing trade. Lots without a timestamp, or closed by a
+        trade without a timestamp, are treated as short term. Within each
+        term the lot realizing the least profit is matched first: the highest
+        price for a long position and the lowest for a short.
+
+        Each term has a heap, and a third heap orders the short term lots by
+        timestamp so they can be moved to the long term heap as they age.
+        Lots which have been moved or closed are removed from the heaps
+        lazily. Popping a lot is O(log N).
+        """
+
+        _containers = (
+            '_lots',
+            '_long_term',
+            '_short_heap',
+            '_long_heap',
+            '_ageing',
+        )
+
+        def __init__(
+                self,
+                holding_period: timedelta = timedelta(days=365),
+                pool: Iterable[SplitTrade[Trade]] = ()
+        ) -> None:
+            """Create the pool.
+
+            Args:
+                holding_period (timedelta, optional): The holding period for
+                    a lot to be long term. Defaults to 365 days.
+                pool (Iterable[SplitTrade[Trade]], optional): The initial
+                    lots. Defaults to ().
+            """
+            self._holding_period = holding_period
+            self._lots: dict[int, SplitTrade[Trade]] = {}
+            self._long_term: set[int] = set()
+            self._short_heap: list[tuple[Any, int]] = []
+            self._long_heap: list[tuple[Any, int]] = []
+            self._ageing: list[tuple[Any, int]] = []
+            self._back = 0
+            self._front = -1
+            for opening in pool:
+                self.append(opening, None)
+
+        def _add(self, opening: SplitTrade[Trade], sequence: int) -> None:
+            self._lots[sequence] = opening
+            heapq.heappush(self._short_heap, (self._key(sequence), sequence))
+            if opening.trade.timestamp is not None:
+                heapq.heappush(
+                    self._ageing,
+                    (opening.trade.timestamp, sequence)
+                )
+
+        def _age(self, closing: SplitTrade[Trade]) -> None:
+            """Move the lots which are long term at the closing trade"""
+            if closing.trade.timestamp is None:
+                return
+            cutoff = closing.trade.timestamp - self._holding_period
+            while self._ageing and self._ageing[0][0] <= cutoff:
+                _, sequence = heapq.heappop(self._ageing)
+                if sequence in self._lots and sequence not in self._long_term:
+                    self._long_term.add(sequence)
+                    heapq.heappush(
+                        self._long_heap,
+                        (self._key(sequence), sequence)
+                    )
+
+        def _key(self, sequence: int) -> Any:
+            opening = self._lots[sequence]
+            price = opening.trade.price
+            return _price_time_key(
+                -price if opening.remaining_quantity > 0 else price,
+                opening
+            )
+
+        def _select(self, closing: SplitTrade[Trade]) -> int:
+            """Find the sequence of the lot to match"""
+            self._age(closing)
+            while self._long_heap:
+                sequence = self._long_heap[0][1]
+                if sequence in self._lots:
+                    return sequence
+                heapq.heappop(self._long_heap)
+            while self._short_heap:
+                sequence = self._short_heap[0][1]
+                if sequence in self._lots and sequence not in self._long_term:
+                    return sequence
+                heapq.heappop(self._short_heap)
+            raise IndexError('pop from an empty pool')
+
+        def _remove(self, sequence: int) -> SplitTrade[Trade]:
+            self._long_term.discard(sequence)
+            return self._lots.pop(sequence)
+
+        def append(self, opening: SplitTrade[Trade], context: Context) -> None:
+            self._add(opening, self._back)
+            self._back += 1
+
+        def insert(self, opening: SplitTrade[Trade], context: Context) -> None:
+            self._add(opening, self._front)
+            self._front -= 1
+
+        def pop(self, closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+            return self._remove(self._select(closing))
+
+        def consume(
+                self,
+                quantity: Decimal,
+                closing: SplitTrade[Trade],
+                context: Context
+        ) -> Sequence[SplitTrade[Trade]]:
+            taken: list[SplitTrade[Trade]] = []
+            remaining = quantity
+            while remaining != 0 and self._lots:
+                sequence = self._select(closing)
+                opening = self._lots[sequence]
+                if abs(remaining) < abs(opening.remaining_quantity):
+                    taken.append(SplitTrade(-remaining, opening.trade))
+                    self._reduce(sequence, -remaining)
+                    break
+                taken.append(self._remove(sequence))
+                remaining += opening.remaining_quantity
+            return taken
+
+        def peek(self, closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+            return self._lots[self._select(closing)]
+
+        def reduce(
+                self,
+                quantity: Decimal,
+                closing: SplitTrade[Trade],
+                context: Context
+        ) -> None:
+            self._reduce(self._select(closing), quantity)
+
+        def _reduce(self, sequence: int, quantity: Decimal) -> None:
+            opening = self._lots[sequence]
+            if quantity == opening.remaining_quantity:
+                self._remove(sequence)
+            else:
+                # The price and timestamp are unchanged, so the lot keeps
+                # its place in the heaps.
+                self._lots[sequence] = SplitTrade(
+                    opening.remaining_quantity - quantity,
+                    opening.trade
+                )
+
+        def has(self, _closing: SplitTrade[Trade], context: Context) -> bool:
+            return len(self._lots) > 0
+
+        def pool(self, context: Context) -> Sequence[SplitTrade[Trade]]:
+            """Returns the unmatched pool in the order the lots were added"""
+            return tuple(
+                self._lots[sequence]
+                for sequence in sorted(self._lots)
+            )
+
+        def __len__(self) -> int:
+            return len(self._lots)
+
+        def __eq__(self, value: object) -> bool:
+            return (
+                isinstance(value, UnmatchedPool.TaxMinimizing) and
+                value.pool(None) == self.pool(None)
+            )
+
+        def __str__(self) -> str:
+            return str(self.pool(None))
+
+        def __repr__(self) -> str:
+            return str(self.pool(None))
+
+    class ColumnarFifo(
+            _CopyingSnapshot,
+            IConsumableUnmatchedPool[Trade, Context],
+            IReducibleUnmatchedPool[Trade, Context]
+    ):
+        """A first in first out pool held in columns.
+
+        The remaining quantity of each lot is held in an array of 64 bit
+        integers, arranged as a ring buffer, with the opening trades in a
+        parallel list. The pool holds no split trade, and no decimal
+        remaining quantity, for a lot. The trades themselves are kept, so
+        the saving is limited to those two objects for each lot. Remaining
+        quantities are held in scaled units, so must be exact to the given
+        number of decimal places.
+
+        Split trades are only created when lots are taken from the pool or
+        `pool` is called, and refer to the original trades.
+        """
+
+        _containers = ('_remaining', '_trades')
+
+        def __init__(
+                self,
+                quantity_scale: int = 0,
+                pool: Iterable[SplitTrade[Trade]] = ()
+        ) -> None:
+            """Create the pool.
+
+            Args:
+                quantity_scale (int, optional): The decimal places kept for
+                    quantities. Defaults to 0.
+                pool (Iterable[SplitTrade[Trade]], optional): The initial
+                    lots. Defaults to ().
+            """
+            self._quantity_scale = quantity_scale
+            self._remaining = array('q', bytes(8 * 16))
+            self._trades: list[Trade | None] = [None] * 16
+            self._mask = 15
+            self._head = 0
+            self._size = 0
+            for opening in pool:
+                self.append(opening, None)
+
+        def _grow(self) -> None:
+            """Double the capacity, unrolling the ring"""
+            head, capacity = self._head, self._mask + 1
+            remaining = self._remaining
+            self._remaining = (
+                remaining[head:] +
+                remaining[:head] +
+                array('q', bytes(8 * capacity))
+            )
+            trades = self._trades
+            self._trades = trades[head:] + trades[:head] + [None] * capacity
+            self._mask = 2 * capacity - 1
+            self._head = 0
+
+        def _set(self, index: int, opening: SplitTrade[Trade]) -> None:
+            self._remaining[index] = to_scaled(
+                opening.remaining_quantity,
+                self._quantity_scale
+            )
+            self._trades[index] = opening.trade
+
+        def _get(self, index: int) -> SplitTrade[Trade]:
+            trade = self._trades[index]
+            assert trade is not None
+            return SplitTrade(
+                from_scaled(self._remaining[index], self._quantity_scale),
+                trade
+            )
+
+        def _clear(self, index: int) -> None:
+            self._trades[index] = None
+
+        def append(self, opening: SplitTrade[Trade], context: Context) -> None:
+            if self._size > self._mask:
+                self._grow()
+            self._set((self._head + self._size) & self._mask, opening)
+            self._size += 1
+
+        def insert(self, opening: SplitTrade[Trade], context: Context) -> None:
+            if self._size > self._mask:
+                self._grow()
+            self._head = (self._head - 1) & self._mask
+            self._set(self._head, opening)
+            self._size += 1
+
+        def pop(self, _closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+            if self._size == 0:
+                raise IndexError('pop from an empty pool')
+            opening = self._get(self._head)
+            self._clear(self._head)
+            self._head = (self._head + 1) & self._mask
+            self._size -= 1
+            return opening
+
+        def consume(
+                self,
+                quantity: Decimal,
+                _closing: SplitTrade[Trade],
+                context: Context
+        ) -> Sequence[SplitTrade[Trade]]:
+            taken: list[SplitTrade[Trade]] = []
+            remaining = to_scaled(quantity, self._quantity_scale)
+            while remaining != 0 and self._size > 0:
+                lot = self._remaining[self._head]
+                if abs(remaining) < abs(lot):
+                    opening = self._get(self._head)
+                    taken.append(
+                        SplitTrade(
+                            from_scaled(-remaining, self._quantity_scale),
+                            opening.trade
+                        )
+                    )
+                    self._remaining[self._head] = lot + remaining
+                    break
+                taken.append(self._get(self._head))
+                self._clear(self._head)
+                self._head = (self._head + 1) & self._mask
+                self._size -= 1
+                remaining += lot
+            return taken
+
+        def peek(self, _closing: SplitTrade[Trade], context: Context) -> SplitTrade[Trade]:
+            if self._size == 0:
+                raise IndexError('peek from an empty pool')
+            return self._get(self._head)
+
+        def reduce(
+                self,
+                quantity: Decimal,
+                _closing: SplitTrade[Trade],
+                context: Context
+        ) -> None:
+            scaled = to_scaled(quantity, self._quantity_scale)
+            if scaled == self._remaining[self._head]:
+                self._clear(self._head)
+                self._head = (self._head + 1) & self._mask
+                self._size -= 1
+            else:
+                self._remaining[self._head] -= scaled
+
+        def has(self, _closing: SplitTrade[Trade], context: Context) -> bool:
+            return self._size > 0
+
+        def pool(self, context: Context) -> Sequence[SplitTrade[Trade]]:
+            """Returns the unmatched pool"""
+            return tuple(
+                self._get((self._head + offset) & self._mask)
+                for offset in range(self._size)
+            )
+
+        def __len__(self) -> int:
+            return self._size
+
+        def __eq__(self, value: object) -> bool:
+            return (
+                isinstance(value, UnmatchedPool.ColumnarFifo) and
+                value.pool(None) == self.pool(None)
+            )
+
+        def __str__(self) -> str:
+            return str(self.pool(None))
+
+        def __repr__(self) -> str:
+            return str(self.pool(None))
@@ -6,7 +6,7 @@ from decimal import Decimal
 from sqlite3 import Cursor
 from typing import cast, Sequence
 
-from ...core import SplitTrade, IUnmatchedPool
+from ...core import SplitTrade, IConsumableUnmatchedPool
 
 from .book import Book
 from .security import Security
@@ -16,7 +16,7 @@ from .utils import MAX_VALID_TO
 
 class UnmatchedPool:
 
-    class Fifo(IUnmatchedPool[Trade, Cursor]):
+    class Fifo(IConsumableUnmatchedPool[Trade, Cursor]):
 
         def __init__(
                 self,
@@ -127,6 +127,112 @@ class UnmatchedPool:
             pnl_trade = SplitTrade(remaining_quantity, market_trade)
             return pnl_trade
 
+        def consume(
+                self,
+                quantity: Decimal,
+                closing: SplitTrade[Trade],
+                context: Cursor
+        ) -> Sequence[SplitTrade[Trade]]:
+            # Read the oldest unmatched trades until the closing quantity is
+            # covered. The trades belong to the security and book of the pool,
+            # so they can be created without loading them.
+            context.execute(
+                """
+                SELECT
+                    ut.trade_id,
+                    ut.remaining_quantity,
+                    t.timestamp,
+                    t.quantity,
+                    t.price
+                FROM
+                    unmatched_trade AS ut
+                JOIN
+                    trade AS t
+                ON
+                    t.trade_id = ut.trade_id
+                WHERE
+                    t.security_id = ?
+                AND
+                    t.book_id = ?
+                AND
+                    ut.valid_to = ?
+                ORDER BY
+                    t.trade_id
+                """,
+                (self._security.key, self._book.key, MAX_VALID_TO)
+            )
+            taken: list[SplitTrade[Trade]] = []
+            unmatched: SplitTrade[Trade] | None = None
+            remaining = quantity
+            while remaining != 0 and unmatched is None:
+                row = context.fetchone()
+                if row is None:
+                    break
+                trade_id, remaining_quantity, timestamp, trade_quantity, price = row
+                market_trade = Trade(
+                    trade_id,
+                    timestamp,
+                    self._security,
+                    self._book,
+                    trade_quantity,
+                    price
+                )
+                if abs(remaining) < abs(remaining_quantity):
+                    taken.append(SplitTrade(-remaining, market_trade))
+                    unmatched = SplitTrade(
+                        remaining_quantity + remaining,
+                        market_trade
+                    )
+                else:
+                    taken.append(SplitTrade(remaining_quantity, market_trade))
+                    remaining += remaining_quantity
+
+            if not taken:
+                return taken
+
+            # Remove the matched trades from unmatched by setting the valid_to
+            # to the trade id of the closing trade. The matched trades are the
+            # oldest unmatched trades of the security and book, so they are
+            # those in the range of their trade ids.
+            context.execute(
+                """
+                UPDATE
+                    unmatched_trade
+                SET
+                    valid_to = ?
+                WHERE
+                    valid_to = ?
+                AND
+                    trade_id BETWEEN ? AND ?
+                AND
+                    EXISTS (
+                        SELECT
+                            1
+                        FROM
+                            trade AS t
+                        WHERE
+                            t.trade_id = unmatched_trade.trade_id
+                        AND
+                            t.security_id = ?
+                        AND
+                            t.book_id = ?
+                    )
+                """,
+                (
+                    closing.trade.key,
+                    MAX_VALID_TO,
+                    taken[0].trade.key,
+                    taken[-1].trade.key,
+                    self._security.key,
+                    self._book.key
+                )
+            )
+
+            if unmatched is not None:
+                self.insert(unmatched, context)
+
+            return taken
+
         def has(self, closing: SplitTrade[Trade], context: Cursor) -> bool:
             context.execute(
                 """
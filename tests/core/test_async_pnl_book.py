@@ -0,0 +1,100 @@
+"""Tests for the asyncio front end"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import AsyncIterator
+
+import pytest
+
+from jetblack_pnl.core import AsyncPnlBook
+from jetblack_pnl.impl.simple import Book, Security, SimplePnlBook, Trade
+
+
+class BatchCountingPnlBook(SimplePnlBook):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.batches: list[int] = []
+
+    def iter_add_trades(self, security, book, trades, context):
+        self.batches.append(len(trades))
+        return super().iter_add_trades(security, book, trades, context)
+
+
+def test_add_trade_in_order() -> None:
+    pnl_book = BatchCountingPnlBook()
+    apple = Security('AAPL', 1, False)
+    google = Security('GOOG', 1, False)
+    tech = Book('tech')
+
+    async def main() -> list:
+        with ThreadPoolExecutor(2) as executor:
+            async_book = AsyncPnlBook(pnl_book, executor)
+            return await asyncio.gather(*(
+                async_book.add_trade(security, tech, Trade(1, 100 + i), None)
+                for i in range(20)
+                for security in (apple, google)
+            ))
+
+    pnls = asyncio.run(main())
+
+    # The P/L after each trade reflects the trades submitted before it.
+    assert [pnl.quantity for pnl in pnls[::2]] == list(range(1, 21))
+    assert pnls[-1] == (20, -sum(range(100, 120)), 0)
+    # The trades waiting for each key were batched.
+    assert len(pnl_book.batches) < 40
+    assert sum(pnl_book.batches) == 40
+
+
+def test_add_trade_error() -> None:
+    apple = Security('AAPL', 1, False)
+    tech = Book('tech')
+
+    class FailingPnlBook(SimplePnlBook):
+        def iter_add_trades(self, security, book, trades, context):
+            for trade in trades:
+                if trade.price == 0:
+                    raise ValueError('failed')
+                yield from super().iter_add_trades(security, book, [trade], context)
+
+    async def main() -> None:
+        async_book = AsyncPnlBook(FailingPnlBook())
+        first = asyncio.create_task(
+            async_book.add_trade(apple, tech, Trade(1, 100), None)
+        )
+        second = asyncio.create_task(
+            async_book.add_trade(apple, tech, Trade(1, 0), None)
+        )
+        third = asyncio.create_task(
+            async_book.add_trade(apple, tech, Trade(1, 100), None)
+        )
+        assert (await first).quantity == 1
+        with pytest.raises(ValueError):
+            await second
+        # Only the failing trade gets the error.
+        assert (await third).quantity == 2
+
+    asyncio.run(main())
+
+
+def test_stream() -> None:
+    apple = Security('AAPL', 1, False)
+    tech = Book('tech')
+
+    async def trades() -> AsyncIterator[Trade]:
+        for i in range(10):
+            yield Trade(1 if i < 5 else -1, 100 + i)
+            if i % 3 == 0:
+                await asyncio.sleep(0)
+
+    async def main() -> list:
+        async_book = AsyncPnlBook(SimplePnlBook())
+        return [
+            pnl
+            async for pnl in async_book.stream(apple, tech, trades(), None)
+        ]
+
+    pnls = asyncio.run(main())
+    assert [pnl.quantity for pnl in pnls] == [1, 2, 3, 4, 5, 4, 3, 2, 1, 0]
+    assert pnls[-1].realized == Decimal(25)
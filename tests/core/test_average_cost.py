@@ -0,0 +1,111 @@
+"""Tests for average cost accounting"""
+
+from decimal import Decimal
+
+from jetblack_pnl.core import (
+    AverageCostPool,
+    PnlBook,
+    TradingPnl,
+    add_trade,
+    add_trades,
+)
+from jetblack_pnl.impl.simple import (
+    Book,
+    MatchedPool,
+    PnlBookStore,
+    Security,
+    Trade,
+    UnmatchedPool,
+)
+
+
+def test_average_cost() -> None:
+    sec = Security("aapl", 1, False)
+    unmatched: AverageCostPool[Trade, None] = AverageCostPool()
+    matched = MatchedPool()
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+
+    # Buy 6 @ 100
+    pnl = add_trade(pnl, Trade(6, 100), sec, unmatched, matched, None)
+    assert pnl == (6, -600, 0)
+
+    # Buy 6 @ 106
+    pnl = add_trade(pnl, Trade(6, 106), sec, unmatched, matched, None)
+    assert pnl == (12, -1236, 0)
+    assert pnl.avg_cost(sec) == 103
+
+    # Sell 6 @ 105
+    pnl = add_trade(pnl, Trade(-6, 105), sec, unmatched, matched, None)
+    assert pnl == (6, -618, 12)
+    assert pnl.avg_cost(sec) == 103
+
+    # Sell 9 @ 104 going through flat
+    pnl = add_trade(pnl, Trade(-9, 104), sec, unmatched, matched, None)
+    assert pnl == (-3, 312, 18)
+    assert pnl.avg_cost(sec) == 104
+
+    # Buy 3 @ 101 going flat
+    pnl = add_trade(pnl, Trade(3, 101), sec, unmatched, matched, None)
+    assert pnl == (0, 0, 27)
+
+    assert unmatched.pool(None) == ()
+    assert matched.pool(None) == ()
+
+
+def test_average_cost_realized_when_flat() -> None:
+    """When the position is flat the realized P/L does not depend on the
+    accounting method"""
+
+    sec = Security("aapl", 10, False)
+    trades = [
+        Trade(3, 100), Trade(7, 104), Trade(-4, 103), Trade(-8, 99),
+        Trade(5, 101), Trade(-3, 106),
+    ]
+
+    average = add_trades(
+        TradingPnl(Decimal(0), Decimal(0), Decimal(0)),
+        trades,
+        sec,
+        AverageCostPool(),
+        MatchedPool(),
+        None
+    )
+    fifo = add_trades(
+        TradingPnl(Decimal(0), Decimal(0), Decimal(0)),
+        trades,
+        sec,
+        UnmatchedPool.Fifo(),
+        MatchedPool(),
+        None
+    )
+    assert average.quantity == fifo.quantity == 0
+    assert average.realized == fifo.realized
+
+
+def test_average_cost_per_book() -> None:
+    """The accounting method can be chosen for each book"""
+
+    pnl_book = PnlBook(
+        PnlBookStore(),
+        lambda security, book, context: MatchedPool(),
+        lambda security, book, context: (
+            AverageCostPool()
+            if book.key == 'average'
+            else UnmatchedPool.Fifo()
+        )
+    )
+    sec = Security("aapl", 1, False)
+    average = Book('average')
+    fifo = Book('fifo')
+
+    for book in (average, fifo):
+        for trade in (Trade(6, 100), Trade(6, 106), Trade(-6, 105)):
+            pnl_book.add_trade(sec, book, trade, None)
+
+    pnl, unmatched, _matched = pnl_book.get(sec, average, None)
+    assert pnl == (6, -618, 12)
+    assert isinstance(unmatched, AverageCostPool)
+
+    pnl, unmatched, _matched = pnl_book.get(sec, fifo, None)
+    assert pnl == (6, -636, 30)
+    assert len(unmatched.pool(None)) == 1
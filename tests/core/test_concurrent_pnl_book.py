@@ -0,0 +1,85 @@
+"""Tests for the concurrent P/L book"""
+
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import time
+
+from jetblack_pnl.core import ConcurrentPnlBook
+from jetblack_pnl.impl.simple import (
+    Book,
+    MatchedPool,
+    PnlBookStore,
+    Security,
+    Trade,
+    UnmatchedPool,
+)
+
+
+class SlowPnlBookStore(PnlBookStore):
+    """A store which releases the GIL between reading and writing"""
+
+    def get(self, security, book, context):
+        result = super().get(security, book, context)
+        time.sleep(0.0001)
+        return result
+
+
+def test_concurrent_pnl_book() -> None:
+    pnl_book = ConcurrentPnlBook(
+        SlowPnlBookStore(),
+        lambda security, book, context: MatchedPool(),
+        lambda security, book, context: UnmatchedPool.Fifo(),
+        stripes=4
+    )
+    securities = [Security(f"SEC{i}", 1, False) for i in range(4)]
+    tech = Book('tech')
+
+    def buy(security: Security) -> None:
+        for _ in range(50):
+            pnl_book.add_trade(security, tech, Trade(1, 100), None)
+        pnl_book.add_trades(security, tech, [Trade(1, 100)] * 50, None)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        # Two threads for each key, so updates to a key race.
+        list(executor.map(buy, securities * 2))
+
+    for security in securities:
+        pnl, unmatched, _matched = pnl_book.get(security, tech, None)
+        assert pnl.quantity == Decimal(200)
+        assert len(unmatched.pool(None)) == 200
+
+
+def test_concurrent_iter_add_trades_releases_lock() -> None:
+    pnl_book = ConcurrentPnlBook(
+        PnlBookStore(),
+        lambda security, book, context: MatchedPool(),
+        lambda security, book, context: UnmatchedPool.Fifo(),
+        stripes=1
+    )
+    security, tech = Security("AAPL", 1, False), Book('tech')
+
+    # Trades for the same key may be added while iterating.
+    for pnl in pnl_book.iter_add_trades(security, tech, [Trade(1, 100)] * 2, None):
+        pnl_book.add_trade(security, tech, Trade(1, 100), None)
+
+    # An abandoned generator does not hold the lock, and has added every trade.
+    pnls = pnl_book.iter_add_trades(security, tech, [Trade(1, 100)] * 2, None)
+    next(pnls)
+    assert pnl_book.add_trades(security, tech, [], None).quantity == Decimal(6)
+
+
+def test_concurrent_get_snapshot() -> None:
+    pnl_book = ConcurrentPnlBook(
+        PnlBookStore(),
+        lambda security, book, context: MatchedPool(),
+        lambda security, book, context: UnmatchedPool.Fifo(),
+    )
+    security, tech = Security("AAPL", 1, False), Book('tech')
+    pnl_book.add_trades(security, tech, [Trade(1, 100), Trade(1, 101)], None)
+
+    # The pool returned is unchanged by trades added later.
+    _pnl, unmatched, _matched = pnl_book.get(security, tech, None)
+    lots = tuple(unmatched.pool(None))
+    pnl_book.add_trades(security, tech, [Trade(-1, 102), Trade(1, 103)], None)
+    assert tuple(unmatched.pool(None)) == lots
+    assert len(pnl_book.store.get(security, tech, None)[1].pool(None)) == 2
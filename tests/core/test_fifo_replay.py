@@ -0,0 +1,92 @@
+"""Tests for the vectorized FIFO replay"""
+
+from decimal import Decimal
+import random
+
+import pytest
+
+from jetblack_pnl.core import TradingPnl, SplitTrade, add_trades
+from jetblack_pnl.impl.simple import (
+    Security,
+    Trade,
+    MatchedPool,
+    UnmatchedPool,
+)
+
+np = pytest.importorskip("numpy")
+
+from jetblack_pnl.core.fifo_replay import replay_fifo  # noqa: E402
+
+
+def assert_matches_reference(
+        quantities: list[int],
+        prices: list[int],
+        contract_size: int
+) -> None:
+    trades = [
+        Trade(quantity, price, key)
+        for key, (quantity, price) in enumerate(zip(quantities, prices))
+    ]
+    sec = Security("aapl", contract_size, False)
+    unmatched = UnmatchedPool.Fifo()
+    matched = MatchedPool()
+    pnl = add_trades(
+        TradingPnl(Decimal(0), Decimal(0), Decimal(0)),
+        trades,
+        sec,
+        unmatched,
+        matched,
+        None
+    )
+
+    result = replay_fifo(
+        np.array(quantities, dtype=np.int64),
+        np.array(prices, dtype=np.int64),
+        contract_size
+    )
+
+    assert result.pnl == pnl
+    assert tuple(
+        SplitTrade(Decimal(int(quantity)), trades[index])
+        for index, quantity in zip(
+            result.unmatched_index,
+            result.unmatched_quantity
+        )
+    ) == unmatched.pool(None)
+    assert tuple(
+        (Decimal(int(quantity)), trades[opening], trades[closing])
+        for quantity, opening, closing in zip(
+            result.matched_quantity,
+            result.matched_opening_index,
+            result.matched_closing_index
+        )
+    ) == matched.pool(None)
+
+
+@pytest.mark.parametrize(
+    "quantities,prices",
+    [
+        ([], []),
+        ([6, 6, 6, -9, -9], [100, 106, 103, 105, 107]),
+        ([6, 6, 6, -9, -12, 3], [100, 106, 103, 105, 107, 103]),
+        ([1, -2], [101, 102]),
+        ([-1, 2], [102, 101]),
+        ([10, -5, -5], [101, 102, 104]),
+        ([5, -5, -5, 5], [100, 101, 102, 99]),
+        ([3, -7, 2, 6, -1], [100, 101, 102, 99, 98]),
+    ]
+)
+def test_replay_fifo_scenarios(quantities: list[int], prices: list[int]) -> None:
+    """Exact fills, partial fills and flips through flat"""
+    assert_matches_reference(quantities, prices, 1)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_replay_fifo_random(seed: int) -> None:
+    rng = random.Random(seed)
+    quantities = [
+        rng.choice([-1, 1]) * rng.randint(1, 20)
+        for _ in range(rng.randint(1, 200))
+    ]
+    prices = [rng.randint(90, 110) for _ in quantities]
+    assert_matches_reference(quantities, prices, 100)
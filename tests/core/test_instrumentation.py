@@ -0,0 +1,182 @@
+"""Tests for the instrumentation of the algorithm"""
+
+from decimal import Decimal
+
+import pytest
+
+from jetblack_pnl.core import (
+    AverageCostPool,
+    MetricsCollector,
+    PnlBook,
+    TradeMetrics,
+    TradingPnl,
+    add_trade,
+    instrumented_add_trade,
+)
+from jetblack_pnl.impl.simple import (
+    Book,
+    MatchedPool,
+    PnlBookStore,
+    Security,
+    Trade,
+    UnmatchedPool,
+)
+
+
+@pytest.mark.parametrize(
+    "pool_factory",
+    [UnmatchedPool.Fifo, UnmatchedPool.DequeFifo, UnmatchedPool.HeapBestPrice]
+)
+def test_instrumented_add_trade(pool_factory) -> None:
+    sec = Security("aapl", 1, False)
+    unmatched = pool_factory()
+    matched = MatchedPool()
+    expected_unmatched = pool_factory()
+    expected_matched = MatchedPool()
+    pnl = expected = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+
+    reports: list[TradeMetrics] = []
+    for trade in (
+        Trade(1, 100),
+        Trade(2, 101),
+        Trade(3, 102),
+        Trade(-4, 103),
+        Trade(-4, 104),
+        Trade(1, 102),
+    ):
+        pnl = instrumented_add_trade(
+            pnl,
+            trade,
+            sec,
+            unmatched,
+            matched,
+            None,
+            reports.append
+        )
+        expected = add_trade(
+            expected,
+            trade,
+            sec,
+            expected_unmatched,
+            expected_matched,
+            None
+        )
+        assert pnl == expected
+
+    assert unmatched == expected_unmatched
+    assert matched == expected_matched
+    assert [
+        (
+            report.kind,
+            report.lots,
+            report.splits,
+            report.pool_before,
+            report.pool_after
+        )
+        for report in reports
+    ] == [
+        ('extend', 0, 0, 0, 1),
+        ('extend', 0, 0, 1, 2),
+        ('extend', 0, 0, 2, 3),
+        ('reduce', 3, 1, 3, 1),
+        ('flip', 1, 0, 1, 1),
+        ('reduce', 1, 1, 1, 1),
+    ]
+    for report in reports:
+        assert 0 <= report.pool_time <= report.total_time
+        assert report.arithmetic_time >= 0
+
+
+def test_instrumented_average_cost() -> None:
+    sec = Security("aapl", 1, False)
+    reports: list[TradeMetrics] = []
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+    for trade in (Trade(2, 100), Trade(-3, 101)):
+        pnl = instrumented_add_trade(
+            pnl,
+            trade,
+            sec,
+            AverageCostPool(),
+            MatchedPool(),
+            None,
+            reports.append
+        )
+    assert pnl == (-1, 101, 2)
+    assert [report.kind for report in reports] == ['extend', 'flip']
+    assert [report.lots for report in reports] == [0, 0]
+
+
+def test_metrics_collector() -> None:
+    collector = MetricsCollector()
+    pnl_book = PnlBook(
+        PnlBookStore(),
+        lambda security, book, context: MatchedPool(),
+        lambda security, book, context: UnmatchedPool.Fifo(),
+        collector
+    )
+    sec = Security("aapl", 1, False)
+    tech = Book('tech')
+    retail = Book('retail')
+
+    pnl_book.add_trades(
+        sec,
+        tech,
+        [*(Trade(1, 100) for _ in range(5)), Trade(-5, 101)],
+        None
+    )
+    pnl_book.add_trade(sec, retail, Trade(1, 100), None)
+
+    assert collector.books['tech'].trades == 6
+    assert collector.books['tech'].kinds == {'extend': 5, 'reduce': 1}
+    assert collector.books['tech'].lots == {0: 5, 4: 1}
+    assert collector.books['tech'].pool_length == {0: 1, 1: 1, 2: 2, 4: 2}
+    assert collector.books['retail'].trades == 1
+
+
+class Unsized:
+    """A pool wrapper without a length"""
+
+    def __init__(self, pool) -> None:
+        self._pool = pool
+
+    def append(self, opening, context):
+        self._pool.append(opening, context)
+
+    def insert(self, opening, context):
+        self._pool.insert(opening, context)
+
+    def pop(self, closing, context):
+        return self._pool.pop(closing, context)
+
+    def has(self, closing, context):
+        return self._pool.has(closing, context)
+
+    def pool(self, context):
+        raise AssertionError("the lots should not be read")
+
+
+def test_instrumented_unsized_pool() -> None:
+    sec = Security("aapl", 1, False)
+    unmatched = Unsized(UnmatchedPool.Fifo())
+    reports: list[TradeMetrics] = []
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+    for trade in (Trade(2, 100), Trade(-1, 101)):
+        pnl = instrumented_add_trade(
+            pnl,
+            trade,
+            sec,
+            unmatched,
+            MatchedPool(),
+            None,
+            reports.append
+        )
+    assert pnl == (1, -100, 1)
+    assert [
+        (report.lots, report.splits, report.pool_before, report.pool_after)
+        for report in reports
+    ] == [(0, 0, None, None), (1, None, None, None)]
+
+    collector = MetricsCollector()
+    collector(sec, Book('tech'), reports[1])
+    assert collector.books['tech'].pool_length == {}
+    assert collector.books['tech'].splits == 0
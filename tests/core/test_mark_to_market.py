@@ -0,0 +1,92 @@
+"""Tests for the vectorized mark to market"""
+
+from decimal import Decimal
+
+import pytest
+
+from jetblack_pnl.impl.simple import Book, PnlBookStore, SimplePnlBook, Security, Trade
+
+np = pytest.importorskip("numpy")
+
+from jetblack_pnl.core.mark_to_market import PositionMarker  # noqa: E402
+
+
+def test_mark_to_market() -> None:
+    pnl_book = SimplePnlBook()
+    apple = Security('AAPL', 1000, False)
+    google = Security('GOOG', 1, False)
+    tech = Book('tech')
+    retail = Book('retail')
+
+    pnl_book.add_trades(apple, tech, [Trade(6, 100), Trade(6, 106)], None)
+    pnl_book.add_trades(apple, retail, [Trade(-4, 102)], None)
+    pnl_book.add_trades(
+        google,
+        tech,
+        [Trade(10, "150.5"), Trade(-10, 151)],
+        None
+    )
+
+    keys = [
+        (apple, tech),
+        (apple, retail),
+        (google, tech),
+        (google, retail),
+    ]
+    marker = PositionMarker.from_store(pnl_book._store, keys, None)
+    assert marker.keys == (('AAPL', 'tech'), ('AAPL', 'retail'), ('GOOG', 'tech'))
+    assert marker.security_keys == ('AAPL', 'GOOG')
+
+    for prices in (
+        {'AAPL': Decimal(105), 'GOOG': Decimal("152.25")},
+        {'AAPL': Decimal(99), 'GOOG': Decimal(140)},
+    ):
+        marked = marker.mark(prices)
+        for row, (security, book) in enumerate(keys[:3]):
+            pnl, _, _ = pnl_book.get(security, book, None)
+            expected = pnl.strip(security, prices[security.key])
+            assert marked.quantity[row] == pytest.approx(float(expected.quantity))
+            assert marked.avg_cost[row] == pytest.approx(float(expected.avg_cost))
+            assert marked.price[row] == pytest.approx(float(expected.price))
+            assert marked.realized[row] == pytest.approx(float(expected.realized))
+            assert marked.unrealized[row] == pytest.approx(
+                float(expected.unrealized)
+            )
+
+
+def test_mark_to_market_missing_price() -> None:
+    apple = Security('AAPL', 1, False)
+    marker = PositionMarker([
+        (apple, Book('tech'), SimplePnlBook().add_trade(
+            apple,
+            Book('tech'),
+            Trade(1, 100),
+            None
+        ))
+    ])
+    marked = marker.mark({})
+    assert np.isnan(marked.unrealized[0])
+    marked = marker.mark_array([101])
+    assert marked.unrealized[0] == 1
+
+
+def test_mark_to_market_empty() -> None:
+    marker = PositionMarker.from_store(PnlBookStore(), [], None)
+    assert len(marker.mark({}).unrealized) == 0
+
+
+def test_mark_to_market_read_only() -> None:
+    apple = Security('AAPL', 1, False)
+    marker = PositionMarker([
+        (apple, Book('tech'), SimplePnlBook().add_trade(
+            apple,
+            Book('tech'),
+            Trade(2, 100),
+            None
+        ))
+    ])
+    marked = marker.mark_array([101])
+    for column in marked:
+        with pytest.raises(ValueError):
+            column[0] = 0
+    assert marker.mark_array([102]).unrealized[0] == 4
@@ -0,0 +1,100 @@
+"""Tests for the parallel replay"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import random
+
+from jetblack_pnl.core import PnlBook, replay_parallel
+from jetblack_pnl.impl.simple import (
+    Book,
+    MatchedPool,
+    PnlBookStore,
+    Security,
+    SimplePnlBook,
+    Trade,
+    UnmatchedPool,
+)
+
+
+def test_replay_parallel() -> None:
+    rng = random.Random(0)
+    securities = [Security(f"SEC{i}", 1, False) for i in range(7)]
+    books = [Book('tech'), Book('retail')]
+    tape = [
+        (
+            rng.choice(securities),
+            rng.choice(books),
+            Trade(
+                rng.choice([-1, 1]) * rng.randint(1, 5),
+                rng.randint(90, 110),
+                key
+            )
+        )
+        for key in range(500)
+    ]
+
+    expected = SimplePnlBook()
+    # An existing position is carried into the replay.
+    expected.add_trade(securities[0], books[0], Trade(3, 95, -1), None)
+    for security, book, trade in tape:
+        expected.add_trade(security, book, trade, None)
+
+    store = PnlBookStore()
+    seed = SimplePnlBook()
+    seed.add_trade(securities[0], books[0], Trade(3, 95, -1), None)
+    store.set(
+        securities[0],
+        books[0],
+        Trade(3, 95, -1),
+        *seed.get(securities[0], books[0], None),
+        None
+    )
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        replay_parallel(SimplePnlBook, tape, store, None, 3, executor)
+
+    for security in securities:
+        for book in books:
+            assert store.get(security, book, None) == expected.get(
+                security,
+                book,
+                None
+            )
+
+
+class RecordingStore(PnlBookStore):
+    """A store which records the trade keys it is given"""
+
+    keys: list = []
+
+    def set(self, security, book, trade, pnl, unmatched, matched, context):
+        self.keys.append(None if trade is None else trade.key)
+        super().set(security, book, trade, pnl, unmatched, matched, context)
+
+
+def test_replay_parallel_seeds_without_trade() -> None:
+    """A position held before the replay is not stamped with a later trade"""
+    sec = Security("aapl", 1, False)
+    tech = Book('tech')
+    store = RecordingStore()
+    seed = SimplePnlBook()
+    seed.add_trade(sec, tech, Trade(3, 95, 1), None)
+    store.set(sec, tech, Trade(3, 95, 1), *seed.get(sec, tech, None), None)
+    RecordingStore.keys.clear()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        replay_parallel(
+            lambda: PnlBook(
+                RecordingStore(),
+                lambda security, book, context: MatchedPool(),
+                lambda security, book, context: UnmatchedPool.Fifo()
+            ),
+            [(sec, tech, Trade(-1, 96, 2)), (sec, tech, Trade(-1, 97, 3))],
+            store,
+            None,
+            1,
+            executor
+        )
+
+    # The worker is seeded with no trade, then the store gets the last trade.
+    assert RecordingStore.keys == [None, 2, 3, 3]
+    assert store.get(sec, tech, None)[0] == (1, -95, 3)
@@ -1,22 +1,44 @@
 """Tests for order P&L"""
 
+from datetime import datetime, timedelta
 from decimal import Decimal
+import random
 
-from jetblack_pnl.core import TradingPnl, SplitTrade, add_trade
+import pytest
+
+from jetblack_pnl.core import (
+    TradingPnl,
+    SplitTrade,
+    add_counted_trade,
+    add_trade,
+    add_trades,
+    iter_add_trades,
+)
 from jetblack_pnl.impl.simple import (
+    CoalescedTrade,
     Security,
     Trade,
     MatchedPool,
     UnmatchedPool,
 )
+from jetblack_pnl.core.algorithm import _CAPABILITIES, _capabilities
+from jetblack_pnl.impl.simple.unmatched_pools import _HeapPricePool
 
 
-def test_long_to_short_with_splits_best_price() -> None:
+@pytest.mark.parametrize(
+    "pool_factory",
+    [
+        UnmatchedPool.BestPrice,
+        UnmatchedPool.HeapBestPrice,
+        UnmatchedPool.PersistentBestPrice,
+    ]
+)
+def test_long_to_short_with_splits_best_price(pool_factory) -> None:
     """long to short, splits, best price"""
 
     sec = Security("aapl", 1, False)
     matched = MatchedPool()
-    unmatched = UnmatchedPool.BestPrice()
+    unmatched = pool_factory()
     pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
 
     assert pnl.quantity == 0
@@ -54,12 +76,20 @@ def test_long_to_short_with_splits_best_price() -> None:
     assert pnl.realized == 54
 
 
-def test_long_to_short_with_splits_worst_price() -> None:
+@pytest.mark.parametrize(
+    "pool_factory",
+    [
+        UnmatchedPool.WorstPrice,
+        UnmatchedPool.HeapWorstPrice,
+        UnmatchedPool.PersistentWorstPrice,
+    ]
+)
+def test_long_to_short_with_splits_worst_price(pool_factory) -> None:
     """long to short, splits, worst price"""
 
     sec = Security("aapl", 1, False)
     matched = MatchedPool()
-    unmatched = UnmatchedPool.WorstPrice()
+    unmatched = pool_factory()
     pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
 
     # Buy 6 at 100
@@ -401,11 +431,19 @@ def test_many_buys_one_sell_lifo():
     )
 
 
-def test_many_buys_one_sell_best_price():
+@pytest.mark.parametrize(
+    "pool_factory",
+    [
+        UnmatchedPool.BestPrice,
+        UnmatchedPool.HeapBestPrice,
+        UnmatchedPool.PersistentBestPrice,
+    ]
+)
+def test_many_buys_one_sell_best_price(pool_factory):
 
     sec = Security("aapl", 1, False)
     matched = MatchedPool()
-    unmatched = UnmatchedPool.BestPrice()
+    unmatched = pool_factory()
     pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
 
     pnl = add_trade(pnl, Trade(1, 100), sec, unmatched, matched, None)
@@ -433,11 +471,19 @@ def test_many_buys_one_sell_best_price():
     )
 
 
-def test_many_sells_one_buy_best_price() -> None:
+@pytest.mark.parametrize(
+    "pool_factory",
+    [
+        UnmatchedPool.BestPrice,
+        UnmatchedPool.HeapBestPrice,
+        UnmatchedPool.PersistentBestPrice,
+    ]
+)
+def test_many_sells_one_buy_best_price(pool_factory) -> None:
 
     sec = Security("aapl", 1, False)
     matched = MatchedPool()
-    unmatched = UnmatchedPool.BestPrice()
+    unmatched = pool_factory()
     pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
 
     pnl = add_trade(pnl, Trade(-1, 100), sec, unmatched, matched, None)
@@ -466,11 +512,19 @@ def test_many_sells_one_buy_best_price() -> None:
     )
 
 
-def test_many_buys_one_sell_worst_price():
+@pytest.mark.parametrize(
+    "pool_factory",
+    [
+        UnmatchedPool.WorstPrice,
+        UnmatchedPool.HeapWorstPrice,
+        UnmatchedPool.PersistentWorstPrice,
+    ]
+)
+def test_many_buys_one_sell_worst_price(pool_factory):
 
     sec = Security("aapl", 1, False)
     matched = MatchedPool()
-    unmatched = UnmatchedPool.WorstPrice()
+    unmatched = pool_factory()
     pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
 
     pnl = add_trade(pnl, Trade(1, 100), sec, unmatched, matched, None)
@@ -499,11 +553,19 @@ def test_many_buys_one_sell_worst_price():
     )
 
 
-def test_many_sells_one_buy_worst_price() -> None:
+@pytest.mark.parametrize(
+    "pool_factory",
+    [
+        UnmatchedPool.WorstPrice,
+        UnmatchedPool.HeapWorstPrice,
+        UnmatchedPool.PersistentWorstPrice,
+    ]
+)
+def test_many_sells_one_buy_worst_price(pool_factory) -> None:
 
     sec = Security("aapl", 1, False)
     matched = MatchedPool()
-    unmatched = UnmatchedPool.WorstPrice()
+    unmatched = pool_factory()
     pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
 
     pnl = add_trade(pnl, Trade(-1, 100), sec, unmatched, matched, None)
@@ -554,3 +616,636 @@ def test_cash() -> None:
 
     pnl = add_trade(pnl, Trade(1000, 1), usd, unmatched, matched, None)
     assert pnl == (0, 0, 1000)
+
+
+def test_add_trades_fifo() -> None:
+    """A batch of trades matches adding the trades one at a time"""
+
+    sec = Security("aapl", 1, False)
+    trades = [
+        Trade(6, 100),
+        Trade(6, 106),
+        Trade(6, 103),
+        Trade(-9, 105),
+        Trade(-12, 107),
+        Trade(3, 103),
+    ]
+
+    expected_matched = MatchedPool()
+    expected_unmatched = UnmatchedPool.Fifo()
+    expected = [TradingPnl(Decimal(0), Decimal(0), Decimal(0))]
+    for trade in trades:
+        expected.append(
+            add_trade(
+                expected[-1],
+                trade,
+                sec,
+                expected_unmatched,
+                expected_matched,
+                None
+            )
+        )
+
+    matched = MatchedPool()
+    unmatched = UnmatchedPool.Fifo()
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+    assert list(
+        iter_add_trades(pnl, trades, sec, unmatched, matched, None)
+    ) == expected[1:]
+    assert unmatched == expected_unmatched
+    assert matched == expected_matched
+
+    matched = MatchedPool()
+    unmatched = UnmatchedPool.Fifo()
+    pnl = add_trades(pnl, iter(trades), sec, unmatched, matched, None)
+    assert pnl == expected[-1] == (0, 0, 66)
+    assert unmatched == expected_unmatched
+    assert matched == expected_matched
+
+    assert add_trades(pnl, [], sec, unmatched, matched, None) == pnl
+
+
+class PopOnly:
+    """A pool wrapper without consume, peek or reduce, to exercise pop and
+    insert"""
+
+    def __init__(self, pool) -> None:
+        self._pool = pool
+
+    def append(self, opening, context):
+        self._pool.append(opening, context)
+
+    def insert(self, opening, context):
+        self._pool.insert(opening, context)
+
+    def pop(self, closing, context):
+        return self._pool.pop(closing, context)
+
+    def has(self, closing, context):
+        return self._pool.has(closing, context)
+
+    def pool(self, context):
+        return self._pool.pool(context)
+
+
+class ReduceOnly(PopOnly):
+    """A pool wrapper with peek and reduce, but without consume"""
+
+    def peek(self, closing, context):
+        return self._pool.peek(closing, context)
+
+    def reduce(self, quantity, closing, context):
+        self._pool.reduce(quantity, closing, context)
+
+
+class ConsumeOnly(PopOnly):
+    """A pool wrapper with consume, but without peek and reduce"""
+
+    def consume(self, quantity, closing, context):
+        return self._pool.consume(quantity, closing, context)
+
+
+@pytest.mark.parametrize(
+    "wrapper,pool_factory",
+    [
+        (ReduceOnly, UnmatchedPool.Fifo),
+        (ConsumeOnly, UnmatchedPool.Fifo),
+        (ConsumeOnly, UnmatchedPool.Lifo),
+        (ConsumeOnly, UnmatchedPool.BestPrice),
+        (ConsumeOnly, UnmatchedPool.WorstPrice),
+        (ReduceOnly, UnmatchedPool.DequeFifo),
+        (ConsumeOnly, UnmatchedPool.DequeFifo),
+        (ConsumeOnly, UnmatchedPool.DequeLifo),
+        (ReduceOnly, UnmatchedPool.HeapBestPrice),
+        (ConsumeOnly, UnmatchedPool.HeapBestPrice),
+        (ReduceOnly, UnmatchedPool.HeapWorstPrice),
+        (ConsumeOnly, UnmatchedPool.HeapWorstPrice),
+        (ReduceOnly, UnmatchedPool.PersistentFifo),
+        (ConsumeOnly, UnmatchedPool.PersistentFifo),
+        (ConsumeOnly, UnmatchedPool.PersistentLifo),
+        (ReduceOnly, UnmatchedPool.PersistentBestPrice),
+        (ConsumeOnly, UnmatchedPool.PersistentBestPrice),
+        (ReduceOnly, UnmatchedPool.PersistentWorstPrice),
+        (ConsumeOnly, UnmatchedPool.PersistentWorstPrice),
+        (ReduceOnly, UnmatchedPool.Hifo),
+        (ConsumeOnly, UnmatchedPool.Hifo),
+        (ReduceOnly, UnmatchedPool.Lofo),
+        (ConsumeOnly, UnmatchedPool.Lofo),
+        (ReduceOnly, UnmatchedPool.TaxMinimizing),
+        (ConsumeOnly, UnmatchedPool.TaxMinimizing),
+        (ReduceOnly, lambda: UnmatchedPool.ColumnarFifo(quantity_scale=1)),
+        (ConsumeOnly, lambda: UnmatchedPool.ColumnarFifo(quantity_scale=1)),
+    ]
+)
+def test_bulk_pool_operations_match_pop_and_insert(
+        wrapper,
+        pool_factory
+) -> None:
+    """Reducing or consuming lots gives the same result as pop and insert"""
+
+    sec = Security("aapl", 1, False)
+    trades = [
+        *(Trade(1, 100 + i % 4) for i in range(10)),
+        Trade(-3, 105),
+        Trade("-2.5", 106),
+        Trade(-10, 104),
+        Trade(2, 103),
+        Trade("-0.5", 103),
+    ]
+
+    bulk_matched = MatchedPool()
+    bulk_unmatched = wrapper(pool_factory())
+    bulk = add_trades(
+        TradingPnl(Decimal(0), Decimal(0), Decimal(0)),
+        trades,
+        sec,
+        bulk_unmatched,
+        bulk_matched,
+        None
+    )
+
+    popped_matched = MatchedPool()
+    popped_unmatched = PopOnly(pool_factory())
+    popped = add_trades(
+        TradingPnl(Decimal(0), Decimal(0), Decimal(0)),
+        trades,
+        sec,
+        popped_unmatched,
+        popped_matched,
+        None
+    )
+
+    assert bulk == popped
+    assert tuple(bulk_unmatched.pool(None)) == tuple(popped_unmatched.pool(None))
+    assert bulk_matched == popped_matched
+
+
+def test_pool_capabilities_cached() -> None:
+    assert _capabilities(PopOnly(UnmatchedPool.Fifo())) == (False, False)
+    assert _capabilities(ReduceOnly(UnmatchedPool.Fifo())) == (False, True)
+    assert _capabilities(ConsumeOnly(UnmatchedPool.Fifo())) == (True, False)
+    assert _capabilities(UnmatchedPool.Fifo()) == (True, True)
+    assert _CAPABILITIES[ConsumeOnly] == (True, False)
+
+
+@pytest.mark.parametrize(
+    "mutable_factory,tuple_factory",
+    [
+        (UnmatchedPool.DequeFifo, UnmatchedPool.Fifo),
+        (UnmatchedPool.DequeLifo, UnmatchedPool.Lifo),
+        (UnmatchedPool.PersistentFifo, UnmatchedPool.Fifo),
+        (UnmatchedPool.PersistentLifo, UnmatchedPool.Lifo),
+        (UnmatchedPool.ColumnarFifo, UnmatchedPool.Fifo),
+    ]
+)
+def test_mutable_pools_match_tuple_pools(mutable_factory, tuple_factory) -> None:
+    sec = Security("aapl", 1, False)
+    trades = [
+        Trade(6, 100), Trade(6, 106), Trade(6, 103), Trade(-9, 105),
+        Trade(-12, 107), Trade(4, 101),
+    ]
+
+    mutable_matched = MatchedPool()
+    mutable_unmatched = mutable_factory()
+    mutable_pnl = add_trades(
+        TradingPnl(Decimal(0), Decimal(0), Decimal(0)),
+        trades,
+        sec,
+        mutable_unmatched,
+        mutable_matched,
+        None
+    )
+
+    tuple_matched = MatchedPool()
+    tuple_unmatched = tuple_factory()
+    tuple_pnl = add_trades(
+        TradingPnl(Decimal(0), Decimal(0), Decimal(0)),
+        trades,
+        sec,
+        tuple_unmatched,
+        tuple_matched,
+        None
+    )
+
+    assert mutable_pnl == tuple_pnl
+    assert mutable_unmatched.pool(None) == tuple_unmatched.pool(None)
+    assert tuple_unmatched.pool(None) == mutable_unmatched.pool(None)
+    assert mutable_matched == tuple_matched
+
+
+def test_deque_pool_view() -> None:
+    unmatched = UnmatchedPool.DequeFifo()
+    view = unmatched.pool(None)
+    assert len(view) == 0
+
+    first = SplitTrade(Decimal(1), Trade(1, 100))
+    second = SplitTrade(Decimal(2), Trade(2, 101))
+    unmatched.append(first, None)
+    unmatched.append(second, None)
+    assert view == (first, second)
+    assert view[-1] == second
+    assert view[1:] == (second,)
+    assert not hasattr(view, 'append')
+
+
+def test_add_counted_trade() -> None:
+    sec = Security("aapl", 1, False)
+    unmatched = UnmatchedPool.Fifo()
+    matched = MatchedPool()
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+    for trade in (Trade(1, 100), Trade(1, 101), Trade(1, 102)):
+        pnl, lots = add_counted_trade(pnl, trade, sec, unmatched, matched, None)
+        assert lots == 0
+
+    pnl, lots = add_counted_trade(
+        pnl,
+        Trade('-2.5', 103),
+        sec,
+        unmatched,
+        matched,
+        None
+    )
+    assert lots == 3
+    assert pnl == (Decimal('0.5'), -51, Decimal('5.5'))
+
+    # A flip counts the lots matched before the position is extended.
+    pnl, lots = add_counted_trade(
+        pnl,
+        Trade(-1, 104),
+        sec,
+        unmatched,
+        matched,
+        None
+    )
+    assert lots == 1
+    assert pnl.quantity == Decimal('-0.5')
+
+
+def test_fifo_head_index() -> None:
+    lots = [SplitTrade(Decimal(1), Trade(1, 100 + i)) for i in range(5)]
+    unmatched = UnmatchedPool.Fifo(lots)
+    closing = SplitTrade(Decimal(-1), Trade(-1, 110))
+
+    assert unmatched.pop(closing, None) == lots[0]
+    unmatched.reduce(Decimal('0.5'), closing, None)
+    assert unmatched.peek(closing, None) == SplitTrade(Decimal('0.5'), lots[1].trade)
+    unmatched.reduce(Decimal('0.5'), closing, None)
+    assert unmatched.pool(None) == tuple(lots[2:])
+
+    # A lot inserted at the front is held ahead of the list.
+    list_ = unmatched._lots
+    unmatched.insert(lots[1], None)
+    assert unmatched.pool(None) == tuple(lots[1:])
+    assert unmatched._lots is list_
+
+    # The matched lots are dropped once they are half the list.
+    unmatched.pop(closing, None)
+    unmatched.pop(closing, None)
+    assert unmatched.pool(None) == tuple(lots[3:])
+    assert len(unmatched._lots) == 2
+    assert unmatched.pool(None)[-1] == lots[4]
+
+    # The pool is a copy, so it is unchanged by later matches.
+    pool = unmatched.pool(None)
+    assert unmatched.consume(Decimal(-2), closing, None) == lots[3:]
+    assert not unmatched.has(closing, None)
+    assert len(unmatched) == 0
+    assert pool == tuple(lots[3:])
+
+
+@pytest.mark.parametrize("coalesce", [False, True])
+def test_fifo_snapshot(coalesce: bool) -> None:
+    """Snapshots share the lots of a FIFO pool, but not its changes"""
+    rng = random.Random(1)
+    pools: list[tuple[UnmatchedPool.Fifo, UnmatchedPool.DequeFifo]] = [
+        (
+            UnmatchedPool.Fifo(coalesce=coalesce),
+            UnmatchedPool.DequeFifo(coalesce=coalesce)
+        )
+    ]
+    closing = SplitTrade(Decimal(-1), Trade(-1, 100))
+    for step in range(1000):
+        pool, expected = rng.choice(pools)
+        operation = rng.random()
+        if operation < 0.05:
+            pools.append((pool.snapshot(), expected.snapshot()))
+        elif operation < 0.5 or not expected.has(closing, None):
+            lot = SplitTrade(
+                Decimal(rng.randint(1, 3)),
+                Trade(1, rng.choice((100, 101)), step)
+            )
+            pool.append(lot, None)
+            expected.append(lot, None)
+        elif operation < 0.6:
+            assert pool.pop(closing, None) == expected.pop(closing, None)
+        elif operation < 0.7:
+            lot = pool.pop(closing, None)
+            assert lot == expected.pop(closing, None)
+            pool.insert(lot, None)
+            expected.insert(lot, None)
+        elif operation < 0.85:
+            quantity = min(
+                Decimal(rng.randint(1, 3)),
+                expected.peek(closing, None).remaining_quantity
+            )
+            pool.reduce(quantity, closing, None)
+            expected.reduce(quantity, closing, None)
+        else:
+            quantity = Decimal(-rng.randint(1, 8))
+            assert (
+                tuple(pool.consume(quantity, closing, None)) ==
+                tuple(expected.consume(quantity, closing, None))
+            )
+        for pool, expected in pools:
+            assert pool.pool(None) == tuple(expected.pool(None))
+            assert len(pool) == len(expected)
+    assert len(pools) > 20
+
+
+def test_persistent_pool_snapshot() -> None:
+    sec = Security("aapl", 1, False)
+    unmatched = UnmatchedPool.PersistentFifo()
+    matched = MatchedPool()
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+
+    snapshots = []
+    for trade in (Trade(6, 100), Trade(6, 106), Trade(-9, 105)):
+        pnl = add_trade(pnl, trade, sec, unmatched, matched, None)
+        snapshots.append(unmatched.snapshot())
+
+    assert [snapshot.pool(None) for snapshot in snapshots] == [
+        (SplitTrade(Decimal(6), Trade(6, 100)),),
+        (
+            SplitTrade(Decimal(6), Trade(6, 100)),
+            SplitTrade(Decimal(6), Trade(6, 106)),
+        ),
+        (SplitTrade(Decimal(3), Trade(6, 106)),),
+    ]
+
+    # Changing a snapshot leaves the pool unchanged.
+    snapshots[0].append(SplitTrade(Decimal(1), Trade(1, 101)), None)
+    assert len(snapshots[0]) == 2
+    assert len(unmatched) == 1
+
+
+@pytest.mark.parametrize(
+    "pool_factory",
+    [
+        UnmatchedPool.Fifo,
+        UnmatchedPool.Lifo,
+        UnmatchedPool.BestPrice,
+        UnmatchedPool.WorstPrice,
+        UnmatchedPool.DequeFifo,
+        UnmatchedPool.DequeLifo,
+        UnmatchedPool.PersistentFifo,
+        UnmatchedPool.PersistentLifo,
+    ]
+)
+def test_coalesced_lots(pool_factory) -> None:
+    """Coalescing lots gives the same P/L with fewer lots and matches"""
+
+    sec = Security("aapl", 1, False)
+    trades = [
+        *(Trade(1, 100, key) for key in range(5)),
+        *(Trade(2, 101, key) for key in range(5, 8)),
+        Trade(-7, 102, 8),
+        Trade(1, 101, 9),
+        Trade(-10, 99, 10),
+        *(Trade(-1, 98, key) for key in range(11, 14)),
+    ]
+
+    coalesced_matched = MatchedPool()
+    coalesced_unmatched = pool_factory(coalesce=True)
+    coalesced = add_trades(
+        TradingPnl(Decimal(0), Decimal(0), Decimal(0)),
+        trades,
+        sec,
+        coalesced_unmatched,
+        coalesced_matched,
+        None
+    )
+
+    matched = MatchedPool()
+    unmatched = pool_factory()
+    pnl = add_trades(
+        TradingPnl(Decimal(0), Decimal(0), Decimal(0)),
+        trades,
+        sec,
+        unmatched,
+        matched,
+        None
+    )
+
+    assert coalesced == pnl
+    assert len(coalesced_matched) < len(matched)
+    assert len(coalesced_unmatched) == 2
+    assert len(unmatched) == 4
+    lot = max(coalesced_unmatched.pool(None), key=lambda x: x.trade.key)
+    assert lot.remaining_quantity == -3
+    assert isinstance(lot.trade, CoalescedTrade)
+    assert lot.trade.keys[-3:] == (11, 12, 13)
+
+
+@pytest.mark.parametrize("wrapper", [lambda pool: pool, ReduceOnly, PopOnly])
+def test_specific_id(wrapper) -> None:
+    sec = Security("aapl", 1, False)
+    # Closing trades name the lots they close by key.
+    targets: dict[int | None, tuple[int, ...]] = {10: (3, 1), 11: (2,)}
+    pool = UnmatchedPool.SpecificId(
+        lambda closing, context: targets.get(closing.trade.key, ())
+    )
+    unmatched = wrapper(pool)
+    matched = MatchedPool()
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+
+    for trade in (
+        Trade(2, 100, 1),
+        Trade(2, 101, 2),
+        Trade(2, 102, 3),
+        Trade(2, 103, 4),
+    ):
+        pnl = add_trade(pnl, trade, sec, unmatched, matched, None)
+
+    # Closes lot 3, then lot 1, with the residual from lot 2 by FIFO.
+    pnl = add_trade(pnl, Trade(-5, 105, 10), sec, unmatched, matched, None)
+    assert matched.pool(None) == (
+        (Decimal(-2), Trade(2, 102, 3), Trade(-5, 105, 10)),
+        (Decimal(-2), Trade(2, 100, 1), Trade(-5, 105, 10)),
+        (Decimal(-1), Trade(2, 101, 2), Trade(-5, 105, 10)),
+    )
+    assert pool.lot(1) is None
+    assert pool.lot(2) == SplitTrade(Decimal(1), Trade(2, 101, 2))
+
+    # Closes the rest of lot 2, then lot 4 by FIFO.
+    pnl = add_trade(pnl, Trade(-2, 104, 11), sec, unmatched, matched, None)
+    assert unmatched.pool(None) == (SplitTrade(Decimal(1), Trade(2, 103, 4)),)
+    assert pnl == (1, -103, 24)
+
+    with pytest.raises(ValueError):
+        pool.append(SplitTrade(Decimal(1), Trade(1, 100, 4)), None)
+
+
+@pytest.mark.parametrize("wrapper", [lambda pool: pool, ReduceOnly, PopOnly])
+def test_specific_id_unkeyed(wrapper) -> None:
+    """Trades without a key are matched first in first out"""
+
+    sec = Security("aapl", 1, False)
+    pool = UnmatchedPool.SpecificId()
+    unmatched = wrapper(pool)
+    matched = MatchedPool()
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+    for trade in (Trade(2, 100), Trade(2, 101), Trade(2, 102)):
+        pnl = add_trade(pnl, trade, sec, unmatched, matched, None)
+    assert len(pool) == 3
+
+    pnl = add_trade(pnl, Trade(-3, 105), sec, unmatched, matched, None)
+    assert tuple(match[1].price for match in matched.pool(None)) == (100, 101)
+    assert unmatched.pool(None) == (
+        SplitTrade(Decimal(1), Trade(2, 101)),
+        SplitTrade(Decimal(2), Trade(2, 102)),
+    )
+    assert pnl == (3, -305, 14)
+
+
+@pytest.mark.parametrize(
+    "pool_factory,long_keys,short_keys",
+    [
+        (UnmatchedPool.Hifo, (2, 1, 3), (2, 3, 1)),
+        (UnmatchedPool.Lofo, (3, 1, 2), (1, 2, 3)),
+    ]
+)
+def test_hifo_lofo(pool_factory, long_keys, short_keys) -> None:
+    """The order does not depend on the side of the position, and ties are
+    broken by timestamp"""
+
+    sec = Security("aapl", 1, False)
+    for side, expected_keys in ((1, long_keys), (-1, short_keys)):
+        unmatched = pool_factory()
+        matched = MatchedPool()
+        pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+        for trade in (
+            Trade(side, 102, 1, datetime(2024, 1, 3)),
+            Trade(side, 103, 2, datetime(2024, 1, 1)),
+            Trade(side, 102 - side, 3, datetime(2024, 1, 2)),
+        ):
+            pnl = add_trade(pnl, trade, sec, unmatched, matched, None)
+        pnl = add_trade(pnl, Trade(-3 * side, 104), sec, unmatched, matched, None)
+        assert tuple(
+            opening.key for _, opening, _ in matched.pool(None)
+        ) == expected_keys
+
+
+def test_heap_pool_sorted_view() -> None:
+    """The sorted lots are kept until the heap changes"""
+
+    with pytest.raises(TypeError):
+        _HeapPricePool()  # type: ignore
+
+    sec = Security("aapl", 1, False)
+    unmatched = UnmatchedPool.HeapBestPrice()
+    matched = MatchedPool()
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+    for trade in (Trade(1, 102, 1), Trade(1, 101, 2), Trade(1, 103, 3)):
+        pnl = add_trade(pnl, trade, sec, unmatched, matched, None)
+
+    view = unmatched.pool(None)
+    assert tuple(opening.trade.key for opening in view) == (2, 1, 3)
+    assert unmatched.pool(None) is view
+
+    pnl = add_trade(pnl, Trade(-1, 104), sec, unmatched, matched, None)
+    assert tuple(opening.trade.key for opening in unmatched.pool(None)) == (1, 3)
+    assert tuple(opening.trade.key for opening in view) == (2, 1, 3)
+
+def test_tax_minimizing() -> None:
+    sec = Security("aapl", 1, False)
+    unmatched = UnmatchedPool.TaxMinimizing(timedelta(days=365))
+    matched = MatchedPool()
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+
+    for trade in (
+        Trade(1, 100, 1, datetime(2022, 1, 1)),
+        Trade(1, 101, 2, datetime(2022, 6, 1)),
+        Trade(1, 110, 3, datetime(2023, 3, 1)),
+        Trade(1, 108, 4, datetime(2023, 4, 1)),
+        Trade(1, 109, 5),
+    ):
+        pnl = add_trade(pnl, trade, sec, unmatched, matched, None)
+
+    # Lots 1 and 2 are long term, highest price first; then lot 3, the
+    # highest short term lot.
+    pnl = add_trade(
+        pnl,
+        Trade(-3, 120, 10, datetime(2023, 7, 1)),
+        sec,
+        unmatched,
+        matched,
+        None
+    )
+    # A year later lot 4 is long term.
+    pnl = add_trade(
+        pnl,
+        Trade(-1, 120, 11, datetime(2024, 4, 1)),
+        sec,
+        unmatched,
+        matched,
+        None
+    )
+    assert tuple(
+        opening.key for _, opening, _ in matched.pool(None)
+    ) == (2, 1, 3, 4)
+    assert unmatched.pool(None) == (
+        SplitTrade(Decimal(1), Trade(1, 109, 5)),
+    )
+
+
+def test_columnar_fifo_ring_buffer() -> None:
+    """The ring buffer wraps and grows while keeping FIFO order"""
+
+    unmatched = UnmatchedPool.ColumnarFifo()
+    closing = SplitTrade(Decimal(-1), Trade(-1, 100))
+    expected: list[SplitTrade[Trade]] = []
+    for key in range(40):
+        price = Decimal(100) + key / Decimal(4)
+        opening = SplitTrade(Decimal(1), Trade(1, price, key))
+        unmatched.append(opening, None)
+        expected.append(opening)
+        if key % 3 == 0:
+            assert unmatched.pop(closing, None) == expected.pop(0)
+    remainder = SplitTrade(Decimal(1), Trade(2, "99.99"))
+    unmatched.insert(remainder, None)
+    assert unmatched.pool(None) == (remainder, *expected)
+
+    # Only the remaining quantity is scaled, so any price is kept.
+    for price in (Decimal("100.123456789123"), Decimal("1e20")):
+        opening = SplitTrade(Decimal(1), Trade(1, price))
+        unmatched.append(opening, None)
+        assert unmatched.pool(None)[-1] == opening
+
+    with pytest.raises(ValueError):
+        unmatched.append(SplitTrade(Decimal("0.5"), Trade("0.5", 100)), None)
+
+
+def test_columnar_fifo_keeps_trades() -> None:
+    """Lots taken from the pool refer to the original trades"""
+
+    sec = Security("aapl", 1, False)
+    unmatched = UnmatchedPool.ColumnarFifo()
+    matched = MatchedPool()
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+    first = Trade(2, 100, 1, datetime(2024, 1, 2, 9, 30))
+    second = Trade(2, 101, 2, datetime(2024, 1, 2, 9, 31))
+    for trade in (first, second):
+        pnl = add_trade(pnl, trade, sec, unmatched, matched, None)
+    assert unmatched.pool(None)[0].trade is first
+
+    pnl = add_trade(pnl, Trade(-3, 105), sec, unmatched, matched, None)
+    assert matched.pool(None)[0][1] is first
+    assert matched.pool(None)[1][1] is second
+    opening = unmatched.pool(None)[0]
+    assert opening.remaining_quantity == 1
+    assert opening.trade is second
+    assert opening.trade.timestamp == datetime(2024, 1, 2, 9, 31)
+
+
+def test_split_trade_has_no_dict() -> None:
+    assert not hasattr(SplitTrade(Decimal(1), Trade(1, 100)), '__dict__')
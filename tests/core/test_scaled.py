@@ -0,0 +1,174 @@
+"""Tests for scaled integer P&L"""
+
+from decimal import Decimal
+from typing import Any, Callable
+
+import pytest
+
+from jetblack_pnl.core import (
+    AverageCostPool,
+    IMatchedPool,
+    TradingPnl,
+    ScaledPnl,
+    ScaledSecurity,
+    add_trade,
+    add_scaled_trade,
+    add_scaled_trades,
+    from_scaled,
+    to_scaled,
+)
+from jetblack_pnl.impl.simple import (
+    Security,
+    Trade,
+    MatchedPool,
+    UnmatchedPool,
+)
+
+SCENARIOS: list[list[tuple[str, str]]] = [
+    [('6', '100'), ('6', '106'), ('6', '103'), ('-9', '105'), ('-9', '107')],
+    [('6', '100'), ('6', '106'), ('6', '103'), ('-9', '105'), ('-12', '107'),
+     ('3', '103')],
+    [('1', '101'), ('-2', '102')],
+    [('-1', '102'), ('2', '101')],
+    [('10', '101'), ('-5', '102'), ('-5', '104')],
+    [('1', '100'), ('1', '102'), ('1', '101'), ('1', '104'), ('1', '103'),
+     ('-5', '104')],
+    [('-1', '100'), ('-1', '102'), ('-1', '101'), ('-1', '104'),
+     ('-1', '103'), ('5', '104')],
+    [('10.17', '2.54'), ('-8.17', '2.12'), ('-1.5', '2.05')],
+]
+
+
+class PopOnly:
+    """A pool wrapper without consume, peek or reduce"""
+
+    def __init__(self, pool) -> None:
+        self._pool = pool
+
+    def append(self, opening, context):
+        self._pool.append(opening, context)
+
+    def insert(self, opening, context):
+        self._pool.insert(opening, context)
+
+    def pop(self, closing, context):
+        return self._pool.pop(closing, context)
+
+    def has(self, closing, context):
+        return self._pool.has(closing, context)
+
+    def pool(self, context):
+        return self._pool.pool(context)
+
+
+class ReduceOnly(PopOnly):
+    """A pool wrapper with peek and reduce, but without consume"""
+
+    def peek(self, closing, context):
+        return self._pool.peek(closing, context)
+
+    def reduce(self, quantity, closing, context):
+        self._pool.reduce(quantity, closing, context)
+
+
+POOLS: list[Callable[[], Any]] = [
+    UnmatchedPool.Fifo,
+    UnmatchedPool.Lifo,
+    UnmatchedPool.BestPrice,
+    UnmatchedPool.WorstPrice,
+    lambda: PopOnly(UnmatchedPool.Fifo()),
+    lambda: ReduceOnly(UnmatchedPool.Fifo()),
+]
+
+
+def test_to_scaled() -> None:
+    assert to_scaled(Decimal("1.25"), 2) == 125
+    assert to_scaled(Decimal("-1.5"), 2) == -150
+    assert to_scaled(3, 0) == 3
+    assert from_scaled(-150, 2) == Decimal("-1.5")
+    with pytest.raises(ValueError):
+        to_scaled(Decimal("1.255"), 2)
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+@pytest.mark.parametrize("pool_factory", POOLS)
+def test_scaled_matches_decimal(
+        scenario: list[tuple[str, str]],
+        pool_factory: Callable,
+) -> None:
+    """The scaled path gives identical results to the decimal path"""
+
+    sec = Security("aapl", 10, False, price_scale=2, quantity_scale=2)
+    scaled_sec = ScaledSecurity(sec)
+
+    matched = MatchedPool()
+    unmatched = pool_factory()
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+
+    # The simple pools hold the scaled trades unchanged.
+    scaled_matched: IMatchedPool[Any, None] = MatchedPool()
+    scaled_unmatched = pool_factory()
+    scaled_pnl = scaled_sec.scale_pnl(pnl)
+
+    for quantity, price in scenario:
+        trade = Trade(quantity, price)
+        pnl = add_trade(pnl, trade, sec, unmatched, matched, None)
+        scaled_pnl = add_scaled_trade(
+            scaled_pnl,
+            scaled_sec.scale_trade(trade),
+            scaled_sec,
+            scaled_unmatched,
+            scaled_matched,
+            None
+        )
+        assert isinstance(scaled_pnl.cost, int)
+        assert scaled_sec.unscale_pnl(scaled_pnl) == pnl
+        assert tuple(
+            scaled_sec.unscale_lot(lot)
+            for lot in scaled_unmatched.pool(None)
+        ) == tuple(unmatched.pool(None))
+        assert tuple(
+            scaled_sec.unscale_match(match)
+            for match in scaled_matched.pool(None)
+        ) == tuple(matched.pool(None))
+
+
+def test_scaled_trades_and_cash() -> None:
+    sec = Security("aapl", 1, False, price_scale=0, quantity_scale=0)
+    scaled_sec = ScaledSecurity(sec)
+    pnl = add_scaled_trades(
+        ScaledPnl(0, 0, 0),
+        [
+            scaled_sec.scale_trade(trade)
+            for trade in (Trade(6, 100), Trade(6, 106), Trade(-12, 107))
+        ],
+        scaled_sec,
+        UnmatchedPool.Fifo(),
+        MatchedPool(),
+        None
+    )
+    assert pnl == (0, 0, 48)
+
+    usd = ScaledSecurity(Security("USD", 1, True, price_scale=2))
+    pnl = add_scaled_trade(
+        usd.scale_pnl(TradingPnl(Decimal(0), Decimal(0), Decimal(0))),
+        usd.scale_trade(Trade(1000, 1)),
+        usd,
+        UnmatchedPool.Fifo(),
+        MatchedPool(),
+        None
+    )
+    assert usd.unscale_pnl(pnl) == (0, 0, 1000)
+
+
+def test_scaled_average_cost_rejected() -> None:
+    scaled_sec = ScaledSecurity(Security("aapl", 1, False))
+    with pytest.raises(TypeError):
+        add_scaled_trade(
+            ScaledPnl(0, 0, 0),
+            scaled_sec.scale_trade(Trade(6, 100)),
+            scaled_sec,
+            AverageCostPool(),
+            MatchedPool(),
+            None
+        )
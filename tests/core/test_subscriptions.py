@@ -0,0 +1,148 @@
+"""Tests for subscriptions to changes in P/L"""
+
+from jetblack_pnl.core import NullMatchedPool, PnlBook, PnlPublisher
+from jetblack_pnl.impl.simple import (
+    Book,
+    MatchedPool,
+    PnlBookStore,
+    Security,
+    SimplePnlBook,
+    Trade,
+    UnmatchedPool,
+)
+
+
+def test_subscription_filters() -> None:
+    pnl_book = SimplePnlBook()
+    apple = Security('AAPL', 1, False)
+    google = Security('GOOG', 1, False)
+    tech = Book('tech')
+    retail = Book('retail')
+
+    everything = pnl_book.subscribe()
+    apples = pnl_book.subscribe(security_key='AAPL')
+    techs = pnl_book.subscribe(book_key='tech')
+    google_tech = pnl_book.subscribe('GOOG', 'tech')
+
+    for security in (apple, google):
+        for book in (tech, retail):
+            pnl_book.add_trade(security, book, Trade(1, 100), None)
+
+    def keys(changes) -> list[tuple[str, str]]:
+        return [(change.security.key, change.book.key) for change in changes]
+
+    assert keys(everything.read()) == [
+        ('AAPL', 'tech'),
+        ('AAPL', 'retail'),
+        ('GOOG', 'tech'),
+        ('GOOG', 'retail'),
+    ]
+    assert keys(apples.read()) == [('AAPL', 'tech'), ('AAPL', 'retail')]
+    assert keys(techs.read()) == [('AAPL', 'tech'), ('GOOG', 'tech')]
+    assert keys(google_tech.read()) == [('GOOG', 'tech')]
+    assert everything.read() == []
+
+    apples.close()
+    pnl_book.add_trade(apple, tech, Trade(1, 100), None)
+    assert apples.pending == 0
+    assert everything.pending == 1
+
+
+def test_subscription_coalescing() -> None:
+    pnl_book = SimplePnlBook()
+    apple = Security('AAPL', 1, False)
+    tech = Book('tech')
+
+    notifications: list[int] = []
+    subscription = pnl_book.subscribe(notify=lambda: notifications.append(1))
+
+    pnl_book.add_trades(
+        apple,
+        tech,
+        [Trade(10, 100), Trade(10, 102), Trade(-15, 104)],
+        None
+    )
+    # The trades are added together, so publish a single change.
+    assert len(notifications) == 1
+    assert subscription.pending == 1
+    assert subscription.coalesced == 0
+
+    (change,) = subscription.read()
+    assert change.previous == (0, 0, 0)
+    assert change.pnl == (5, -510, 50)
+    assert change.lots == 2
+
+    pnl_book.add_trade(apple, tech, Trade(-5, 104), None)
+    assert len(notifications) == 2
+    (change,) = subscription.read()
+    assert change.previous == (5, -510, 50)
+    assert change.pnl == (0, 0, 60)
+    assert change.lots == 1
+
+
+def test_shared_publisher() -> None:
+    publisher = PnlPublisher()
+    first = PnlBook(
+        PnlBookStore(),
+        lambda security, book, context: NullMatchedPool(),
+        lambda security, book, context: UnmatchedPool.Fifo(),
+        publisher=publisher
+    )
+    second = PnlBook(
+        PnlBookStore(),
+        lambda security, book, context: MatchedPool(),
+        lambda security, book, context: UnmatchedPool.Fifo(),
+        publisher=publisher
+    )
+    assert not publisher.active
+
+    subscription = publisher.subscribe(book_key='tech')
+    assert publisher.active
+    apple = Security('AAPL', 1, False)
+    first.add_trades(apple, Book('tech'), [Trade(1, 100), Trade(-1, 101)], None)
+    second.add_trade(apple, Book('retail'), Trade(1, 100), None)
+
+    (change,) = subscription.read()
+    # Matches are counted even when they are not recorded.
+    assert change.lots == 1
+    assert len(first.get(apple, Book('tech'), None)[2].pool(None)) == 0
+
+    subscription.close()
+    subscription.close()
+    assert not publisher.active
+
+
+def test_publish_after_store() -> None:
+    apple = Security('AAPL', 1, False)
+    tech = Book('tech')
+    metrics: list = []
+    pnl_book = PnlBook(
+        PnlBookStore(),
+        lambda security, book, context: NullMatchedPool(),
+        lambda security, book, context: UnmatchedPool.Fifo(),
+        observer=lambda security, book, trade_metrics: metrics.append(trade_metrics)
+    )
+    stored: list = []
+    subscription = pnl_book.subscribe(
+        notify=lambda: stored.append(pnl_book.get(apple, tech, None)[0])
+    )
+
+    pnl_book.add_trade(apple, tech, Trade(10, 100), None)
+    (change,) = subscription.read()
+    assert stored == [change.pnl]
+
+    # An abandoned sequence publishes what was added and stored.
+    pnls = pnl_book.iter_add_trades(
+        apple,
+        tech,
+        [Trade(5, 101), Trade(-12, 102), Trade(1, 103)],
+        None
+    )
+    next(pnls)
+    next(pnls)
+    assert subscription.pending == 0
+    pnls.close()  # type: ignore
+    (change,) = subscription.read()
+    assert stored[-1] == change.pnl == (3, -303, 22)
+    assert change.previous == (10, -1000, 0)
+    assert change.lots == sum(m.lots for m in metrics[1:]) == 2
@@ -0,0 +1,168 @@
+"""Tests for what-if evaluation"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from decimal import Decimal
+import multiprocessing
+from typing import Callable
+
+import pytest
+
+from jetblack_pnl.core import (
+    AverageCostPool,
+    ConcurrentPnlBook,
+    ISnapshotUnmatchedPool,
+    IUnmatchedPool,
+    SplitTrade,
+    snapshot_unmatched_pool,
+)
+from jetblack_pnl.impl.simple import (
+    Book,
+    MatchedPool,
+    PnlBookStore,
+    Security,
+    SimplePnlBook,
+    Trade,
+    UnmatchedPool,
+)
+
+
+class UnmatchedPoolWithoutSnapshot(IUnmatchedPool):
+
+    def append(self, opening, context):
+        pass
+
+    def insert(self, opening, context):
+        pass
+
+    def pop(self, closing, context):
+        raise IndexError('empty')
+
+    def has(self, closing, context):
+        return False
+
+    def pool(self, context):
+        return ()
+
+
+@pytest.mark.parametrize(
+    'pool_factory',
+    [
+        UnmatchedPool.Fifo,
+        UnmatchedPool.BestPrice,
+        UnmatchedPool.PersistentFifo,
+        UnmatchedPool.DequeFifo,
+        UnmatchedPool.HeapBestPrice,
+        AverageCostPool,
+    ]
+)
+def test_what_if(pool_factory: Callable[[], IUnmatchedPool]) -> None:
+    pnl_book = SimplePnlBook(
+        unmatched_factory=lambda security, book, context: pool_factory()
+    )
+    apple = Security('AAPL', 1, False)
+    tech = Book('tech')
+    pnl_book.add_trades(
+        apple,
+        tech,
+        [Trade(10, 100), Trade(10, 102), Trade(10, 101)],
+        None
+    )
+    pnl, unmatched, matched = pnl_book.get(apple, tech, None)
+    lots = tuple(unmatched.pool(None))
+
+    trades = [Trade(-15, 105), Trade(-20, 99)]
+    result = pnl_book.what_if(apple, tech, trades, None)
+
+    # The position is unchanged.
+    assert pnl_book.get(apple, tech, None)[0] == pnl
+    assert tuple(unmatched.pool(None)) == lots
+    assert len(matched.pool(None)) == 0
+
+    # The outcome is what adding the trades would have produced.
+    pnls = [pnl_book.add_trade(apple, tech, trade, None) for trade in trades]
+    assert result.pnl == pnls[-1]
+    assert result.pnls == tuple(pnls)
+    if isinstance(unmatched, AverageCostPool):
+        assert result.matches == ()
+    else:
+        assert result.matches == tuple(pnl_book.get(apple, tech, None)[2].pool(None))
+        assert sum(abs(quantity) for quantity, _, _ in result.matches) == 30
+
+
+def test_what_if_new_position() -> None:
+    pnl_book = SimplePnlBook()
+    apple = Security('AAPL', 1, False)
+    tech = Book('tech')
+
+    result = pnl_book.what_if(apple, tech, [Trade(5, 100), Trade(-2, 110)], None)
+    assert result.pnl == (3, -300, 20)
+    assert not pnl_book.store.has(apple, tech, None)
+
+
+def test_what_if_many() -> None:
+    pnl_book = ConcurrentPnlBook(
+        PnlBookStore(),
+        lambda security, book, context: MatchedPool(),
+        lambda security, book, context: UnmatchedPool.PersistentFifo()
+    )
+    securities = [Security(f"SEC{i}", 1, False) for i in range(4)]
+    tech = Book('tech')
+    for security in securities:
+        pnl_book.add_trades(security, tech, [Trade(10, 100), Trade(10, 110)], None)
+
+    candidates = [
+        (security, tech, [Trade(-quantity, 120)])
+        for security in securities
+        for quantity in (5, 15, 25)
+    ]
+    expected = pnl_book.what_if_many(candidates, None)
+    # The book, which holds lambdas, is not sent to the processes.
+    with ProcessPoolExecutor(
+            2,
+            mp_context=multiprocessing.get_context('spawn')
+    ) as process_executor:
+        assert pnl_book.what_if_many(
+            candidates,
+            None,
+            process_executor
+        ) == expected
+    with ThreadPoolExecutor(4) as executor:
+        assert pnl_book.what_if_many(candidates, None, executor) == expected
+
+    # Each candidate is evaluated against the current position.
+    assert [result.pnl.realized for result in expected[:3]] == [100, 250, 300]
+    assert [result.pnl.quantity for result in expected[:3]] == [15, 5, -5]
+
+
+def test_snapshot_unmatched_pool() -> None:
+    lot = SplitTrade(Decimal(10), Trade(10, 100))
+    for unmatched in (
+        UnmatchedPool.Fifo((lot,)),
+        UnmatchedPool.Lifo((lot,)),
+        UnmatchedPool.WorstPrice((lot,)),
+        UnmatchedPool.PersistentLifo((lot,)),
+    ):
+        assert isinstance(unmatched, ISnapshotUnmatchedPool)
+        snapshot = snapshot_unmatched_pool(unmatched)
+        snapshot.append(SplitTrade(Decimal(5), Trade(5, 101)), None)
+        snapshot.pop(SplitTrade(Decimal(-1), Trade(-1, 102)), None)
+        assert tuple(unmatched.pool(None)) == (lot,)
+        assert len(snapshot.pool(None)) == 1
+
+    # Mutable pools copy their lots.
+    mutable_pools: tuple[IUnmatchedPool, ...] = (
+        UnmatchedPool.DequeFifo((lot,)),
+        UnmatchedPool.HeapBestPrice((lot,)),
+        UnmatchedPool.SpecificId(pool=(lot,)),
+        UnmatchedPool.TaxMinimizing(pool=(lot,)),
+        UnmatchedPool.ColumnarFifo(pool=(lot,)),
+    )
+    for mutable_pool in mutable_pools:
+        snapshot = snapshot_unmatched_pool(mutable_pool)
+        snapshot.pop(SplitTrade(Decimal(-1), Trade(-1, 102)), None)
+        assert tuple(mutable_pool.pool(None)) == (lot,)
+        assert len(snapshot.pool(None)) == 0
+
+    # Pools without snapshots are refused rather than copied.
+    with pytest.raises(TypeError):
+        snapshot_unmatched_pool(UnmatchedPoolWithoutSnapshot())
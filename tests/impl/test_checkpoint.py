@@ -0,0 +1,316 @@
+"""Tests for checkpoints of the simple implementation"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+from jetblack_pnl.core import (
+    AverageCostPool,
+    NullMatchedPool,
+    SplitTrade,
+    SummaryMatchedPool,
+    TradingPnl,
+)
+from jetblack_pnl.impl.simple import (
+    Book,
+    ChunkedMatchedPool,
+    LazyPnlBookStore,
+    MatchedPool,
+    PnlBookStore,
+    Security,
+    SimplePnlBook,
+    SummarizingMatchedPool,
+    Trade,
+    UnmatchedPool,
+    load_checkpoint,
+    restore_unmatched_pool,
+    save_checkpoint,
+)
+from jetblack_pnl.impl.simple.checkpoint import _matched_state, _unmatched_state
+
+
+def _make_book() -> SimplePnlBook:
+    def unmatched_factory(security, book, context):
+        if book.key == 'average':
+            return AverageCostPool()
+        if book.key == 'coalesce':
+            return UnmatchedPool.Fifo(coalesce=True)
+        if book.key == 'heap':
+            return UnmatchedPool.HeapBestPrice()
+        return UnmatchedPool.Fifo()
+
+    pnl_book = SimplePnlBook(unmatched_factory=unmatched_factory)
+    apple = Security('AAPL', 1, False)
+    google = Security('GOOG', 10, False)
+    for book in (Book('fifo'), Book('average'), Book('coalesce'), Book('heap')):
+        pnl_book.add_trades(
+            apple,
+            book,
+            [
+                Trade(10, '100.25', 1, datetime(2024, 1, 2, 9, 30)),
+                Trade(5, 100, 2),
+                Trade(5, 101, 3),
+                Trade(-12, '102.125', 4),
+                Trade('0.5', '123456789.0123456789012345', 5),
+            ],
+            None
+        )
+        pnl_book.add_trades(google, book, [Trade(-3, 50), Trade(3, 40)], None)
+    return pnl_book
+
+
+def _assert_restored(original: SimplePnlBook, restored: SimplePnlBook) -> None:
+    for security in (Security('AAPL', 1, False), Security('GOOG', 10, False)):
+        for book in (Book('fifo'), Book('average'), Book('coalesce'), Book('heap')):
+            pnl, unmatched, matched = original.get(security, book, None)
+            restored_pnl, restored_unmatched, restored_matched = restored.get(
+                security,
+                book,
+                None
+            )
+            assert restored_pnl == pnl
+            assert type(restored_unmatched) is type(unmatched)
+            assert restored_unmatched.pool(None) == unmatched.pool(None)
+            assert restored_matched.pool(None) == matched.pool(None)
+
+
+def test_save_and_load() -> None:
+    original = _make_book()
+    file = BytesIO()
+    save_checkpoint(original.store, file)  # type: ignore
+
+    file.seek(0)
+    restored = SimplePnlBook(store=load_checkpoint(file))
+    _assert_restored(original, restored)
+
+    # Trades shared between lots and matches are shared when restored.
+    apple, fifo = Security('AAPL', 1, False), Book('fifo')
+    _, unmatched, matched = restored.get(apple, fifo, None)
+    assert unmatched.pool(None)[0].trade is matched.pool(None)[-1][1]
+
+    # The restored book carries on from where the original stopped.
+    trade = Trade(-8, 99)
+    assert (
+        restored.add_trade(apple, fifo, trade, None) ==
+        original.add_trade(apple, fifo, trade, None)
+    )
+
+
+def test_save_without_matches() -> None:
+    original = _make_book()
+    file = BytesIO()
+    save_checkpoint(original.store, file, matches=False)  # type: ignore
+    assert len(file.getvalue()) < len(_checkpoint(original))
+
+    file.seek(0)
+    store = load_checkpoint(file)
+    pnl, unmatched, matched = store.get(
+        Security('AAPL', 1, False),
+        Book('fifo'),
+        None
+    )
+    assert pnl == original.get(Security('AAPL', 1, False), Book('fifo'), None)[0]
+    assert len(unmatched.pool(None)) == 3
+    assert matched == MatchedPool()
+
+
+def test_lazy_store(tmp_path: Path) -> None:
+    original = _make_book()
+    path = tmp_path / 'book.ckpt'
+    path.write_bytes(_checkpoint(original))
+
+    store = LazyPnlBookStore(str(path))
+    assert store.pending == 8
+    assert store.has(Security('AAPL', 1, False), Book('fifo'), None)
+    assert not store.has(Security('MSFT', 1, False), Book('fifo'), None)
+
+    restored = SimplePnlBook(store=store)
+    restored.get(Security('AAPL', 1, False), Book('fifo'), None)
+    assert store.pending == 7
+
+    _assert_restored(original, restored)
+    assert store.pending == 0
+    store.close()
+
+
+def test_invalid_checkpoint() -> None:
+    with pytest.raises(ValueError):
+        load_checkpoint(BytesIO(b'not a checkpoint at all'))
+
+    data = bytearray(_checkpoint(_make_book()))
+    data[4] = 99
+    with pytest.raises(ValueError):
+        load_checkpoint(BytesIO(bytes(data)))
+
+    store = PnlBookStore([(
+        ('AAPL', 'fifo'),
+        (
+            TradingPnl(Decimal(1), Decimal(-1), Decimal(0)),
+            UnmatchedPool.Fifo((SplitTrade(Decimal(1), object()),)),  # type: ignore
+            MatchedPool()
+        )
+    )])
+    with pytest.raises(TypeError):
+        save_checkpoint(store, BytesIO())
+
+
+def test_truncated_checkpoint(tmp_path: Path) -> None:
+    data = _checkpoint(_make_book())
+    for size in (10, len(data) // 2, len(data) - 1):
+        with pytest.raises(ValueError):
+            load_checkpoint(BytesIO(data[:size]))
+
+    path = tmp_path / 'book.ckpt'
+    path.write_bytes(data[:len(data) - 1])
+    with pytest.raises(ValueError):
+        LazyPnlBookStore(str(path))
+
+
+def test_negative_zero() -> None:
+    """The sign of a negative zero is kept"""
+    store = PnlBookStore([(
+        ('AAPL', 'fifo'),
+        (
+            TradingPnl(Decimal('-0.00'), Decimal('-0'), Decimal('0.00')),
+            UnmatchedPool.Fifo(),
+            MatchedPool()
+        )
+    )])
+    file = BytesIO()
+    save_checkpoint(store, file)
+
+    file.seek(0)
+    pnl, _, _ = load_checkpoint(file).get(
+        Security('AAPL', 1, False),
+        Book('fifo'),
+        None
+    )
+    assert [str(value) for value in pnl] == ['-0.00', '-0', '0.00']
+
+
+def _checkpoint(pnl_book: SimplePnlBook) -> bytes:
+    file = BytesIO()
+    save_checkpoint(pnl_book.store, file)  # type: ignore
+    return file.getvalue()
+
+
+@pytest.mark.parametrize(
+    "unmatched_factory",
+    [
+        AverageCostPool,
+        UnmatchedPool.Fifo,
+        lambda: UnmatchedPool.Fifo(coalesce=True),
+        lambda: UnmatchedPool.Lifo(coalesce=True),
+        lambda: UnmatchedPool.BestPrice(coalesce=True),
+        lambda: UnmatchedPool.WorstPrice(coalesce=True),
+        lambda: UnmatchedPool.DequeFifo(coalesce=True),
+        lambda: UnmatchedPool.DequeLifo(coalesce=True),
+        UnmatchedPool.HeapBestPrice,
+        UnmatchedPool.HeapWorstPrice,
+        lambda: UnmatchedPool.PersistentFifo(coalesce=True),
+        lambda: UnmatchedPool.PersistentLifo(coalesce=True),
+        UnmatchedPool.PersistentBestPrice,
+        UnmatchedPool.PersistentWorstPrice,
+        UnmatchedPool.SpecificId,
+        UnmatchedPool.Hifo,
+        UnmatchedPool.Lofo,
+        lambda: UnmatchedPool.TaxMinimizing(timedelta(days=30, seconds=1)),
+        lambda: UnmatchedPool.ColumnarFifo(quantity_scale=1),
+    ]
+)
+@pytest.mark.parametrize(
+    "matched_factory",
+    [
+        MatchedPool,
+        lambda: ChunkedMatchedPool(max_matches=2, chunk_size=2),
+        lambda: ChunkedMatchedPool(since_key=5),
+        NullMatchedPool,
+        SummaryMatchedPool,
+        lambda: SummarizingMatchedPool(contract_size=10),
+    ]
+)
+@pytest.mark.parametrize("matches", [True, False])
+def test_pool_round_trip(unmatched_factory, matched_factory, matches) -> None:
+    """Every pool of the package is restored with its options and totals"""
+
+    original = SimplePnlBook(
+        matched_factory=lambda security, book, context: matched_factory(),
+        unmatched_factory=lambda security, book, context: unmatched_factory()
+    )
+    apple, tech = Security('AAPL', 10, False), Book('tech')
+    trades = [
+        Trade(10, '100.25', 1, datetime(2024, 1, 2)),
+        Trade(5, 101, 2, datetime(2024, 2, 1)),
+        Trade(5, 101, 3, datetime(2024, 2, 1)),
+        Trade(-12, '102.125', 4, datetime(2024, 3, 1)),
+        Trade('0.5', 99, 5, datetime(2024, 3, 2)),
+        Trade(-3, 103, 6, datetime(2024, 3, 3)),
+    ]
+    original.add_trades(apple, tech, trades, None)
+
+    file = BytesIO()
+    save_checkpoint(original.store, file, matches=matches)  # type: ignore
+    file.seek(0)
+    restored = SimplePnlBook(store=load_checkpoint(file))
+
+    pnl, unmatched, matched = original.get(apple, tech, None)
+    restored_pnl, restored_unmatched, restored_matched = restored.get(apple, tech, None)
+    assert restored_pnl == pnl
+    assert type(restored_unmatched) is type(unmatched)
+    assert _unmatched_state(restored_unmatched) == _unmatched_state(unmatched)
+    assert restored_unmatched.pool(None) == unmatched.pool(None)
+    assert type(restored_matched) is type(matched)
+    if matches:
+        assert restored_matched == matched
+    assert _matched_state(restored_matched, restored_matched.pool(None)) == (
+        _matched_state(matched, matched.pool(None) if matches else ())
+    )
+
+    # The restored pools carry on as the originals would.
+    for trade in (Trade(5, 101, 7, datetime(2024, 4, 1)), Trade(-8, 104, 8)):
+        assert (
+            restored.add_trade(apple, tech, trade, None) ==
+            original.add_trade(apple, tech, trade, None)
+        )
+    assert (
+        restored.get(apple, tech, None)[1].pool(None) ==
+        original.get(apple, tech, None)[1].pool(None)
+    )
+
+
+def test_specific_id_selector() -> None:
+    """The selector of a specific id pool must be given when restoring"""
+
+    selector = lambda closing, context: (2,)  # noqa: E731
+    original = SimplePnlBook(
+        unmatched_factory=lambda security, book, context: UnmatchedPool.SpecificId(
+            selector
+        )
+    )
+    apple, tech = Security('AAPL', 1, False), Book('tech')
+    original.add_trades(apple, tech, [Trade(1, 100, 1), Trade(1, 101, 2)], None)
+    file = BytesIO()
+    save_checkpoint(original.store, file)  # type: ignore
+
+    file.seek(0)
+    with pytest.raises(ValueError):
+        load_checkpoint(file)
+
+    def unmatched_factory(name, lots, state):
+        if state.get('selector'):
+            return UnmatchedPool.SpecificId(selector, lots)
+        return restore_unmatched_pool(name, lots, state)
+
+    file.seek(0)
+    restored = SimplePnlBook(store=load_checkpoint(file, unmatched_factory))
+    trade = Trade(-1, 102, 3)
+    assert (
+        restored.add_trade(apple, tech, trade, None) ==
+        original.add_trade(apple, tech, trade, None)
+    )
+    assert restored.get(apple, tech, None)[1].pool(None) == (
+        SplitTrade(Decimal(1), Trade(1, 100, 1)),
+    )
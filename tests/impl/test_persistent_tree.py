@@ -0,0 +1,62 @@
+"""Tests for the persistent tree"""
+
+import random
+
+import pytest
+
+from jetblack_pnl.impl.simple.persistent_tree import PersistentTree
+
+
+def test_persistent_tree_random() -> None:
+    rng = random.Random(0)
+    tree: PersistentTree[int] = PersistentTree()
+    expected: list[int] = []
+    versions: list[tuple[PersistentTree[int], list[int]]] = []
+
+    for _ in range(2000):
+        action = rng.random()
+        if action < 0.5 or not expected:
+            key = rng.randint(0, 1_000_000)
+            while key in expected:
+                key = rng.randint(0, 1_000_000)
+            tree = tree.insert(key, key)
+            expected = sorted((*expected, key))
+        elif action < 0.7:
+            value, tree = tree.pop_first()
+            assert value == expected[0]
+            expected = expected[1:]
+        elif action < 0.9:
+            value, tree = tree.pop_last()
+            assert value == expected[-1]
+            expected = expected[:-1]
+        else:
+            index = rng.randrange(len(expected))
+            assert tree[index] == expected[index]
+            assert tree[-1] == expected[-1]
+        versions.append((tree, expected))
+
+    for version, values in versions:
+        assert list(version) == values
+        assert list(reversed(version)) == values[::-1]
+        assert len(version) == len(values)
+
+
+def test_persistent_tree_replace() -> None:
+    tree: PersistentTree[str] = PersistentTree()
+    for key in (3, 1, 2):
+        tree = tree.insert(key, str(key))
+    first = tree.replace_first('one')
+    last = first.replace_last('three')
+    assert tree == ('1', '2', '3')
+    assert first == ('one', '2', '3')
+    assert last == ('one', '2', 'three')
+    assert tree[1:] == ('2', '3')
+
+
+def test_persistent_tree_empty() -> None:
+    tree: PersistentTree[int] = PersistentTree()
+    assert len(tree) == 0
+    with pytest.raises(IndexError):
+        tree.pop_first()
+    with pytest.raises(IndexError):
+        tree[0]
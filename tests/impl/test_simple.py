@@ -1,9 +1,33 @@
 """Tests for the simple implementation"""
 
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from pathlib import Path
+import sqlite3
 
-from jetblack_pnl.core import SplitTrade
-from jetblack_pnl.impl.simple import Security, Book, Trade, SimplePnlBook
+import pytest
+
+from jetblack_pnl.core import (
+    NullMatchedPool,
+    PnlBook,
+    SplitTrade,
+    SummaryMatchedPool,
+    TradingPnl,
+)
+from jetblack_pnl.impl.simple import (
+    ChunkedMatchedPool,
+    MatchSummary,
+    Security,
+    SummarizingMatchedPool,
+    Book,
+    Trade,
+    MatchedPool,
+    PnlBookStore,
+    SimplePnlBook,
+    SpillingPnlBookStore,
+    UnmatchedPool,
+)
+from jetblack_pnl.impl.simple.spilling_pnl_book_store import count_lots
 
 
 def test_fifo() -> None:
@@ -68,3 +92,261 @@ def test_fifo() -> None:
         (Decimal(-3), Trade(6, 106), Trade(-9, 107)),
         (Decimal(-6), Trade(6, 103), Trade(-9, 107))
     )
+
+
+def test_add_trades() -> None:
+    """Test adding a batch of trades to the SimplePnl class."""
+
+    pnl_book = SimplePnlBook()
+    tech = Book('tech')
+    apple = Security('AAPL', 1000, False)
+
+    pnls = list(
+        pnl_book.iter_add_trades(
+            apple,
+            tech,
+            [Trade(6, 100), Trade(6, 106), Trade(6, 103)],
+            None
+        )
+    )
+    assert [pnl.strip(apple, 103) for pnl in pnls] == [
+        (6, 100, 103, 0, 18000),
+        (12, 103, 103, 0, 0),
+        (18, 103, 103, 0, 0),
+    ]
+
+    pnl = pnl_book.add_trades(
+        apple,
+        tech,
+        [Trade(-9, 105), Trade(-9, 107)],
+        None
+    )
+    assert pnl.strip(apple, 107) == (0, 0, 107, 54000, 0)
+    stored, unmatched, matched = pnl_book.get(apple, tech, None)
+    assert stored == pnl
+    assert unmatched.pool(None) == ()
+    assert len(matched.pool(None)) == 4
+
+    assert pnl_book.add_trades(apple, tech, [], None) == pnl
+
+
+def test_match_recording_per_book() -> None:
+    """The way matches are recorded can be chosen for each book."""
+
+    policies = {
+        'audit': MatchedPool,
+        'summary': SummaryMatchedPool,
+        'fast': NullMatchedPool,
+    }
+    pnl_book = SimplePnlBook(
+        matched_factory=lambda security, book, context: policies[book.key]()
+    )
+    apple = Security('AAPL', 1, False)
+    trades = [Trade(6, 100), Trade(6, 106), Trade(-9, 105)]
+
+    for key in policies:
+        pnl = pnl_book.add_trades(apple, Book(key), trades, None)
+        assert pnl == (3, -318, 27)
+
+    _, _, matched = pnl_book.get(apple, Book('audit'), None)
+    assert matched.pool(None) == (
+        (Decimal(-6), Trade(6, 100), Trade(-9, 105)),
+        (Decimal(-3), Trade(6, 106), Trade(-9, 105)),
+    )
+
+    _, _, matched = pnl_book.get(apple, Book('summary'), None)
+    assert isinstance(matched, SummaryMatchedPool)
+    assert (matched.count, matched.quantity) == (2, 9)
+    assert matched.pool(None) == ()
+
+    _, _, matched = pnl_book.get(apple, Book('fast'), None)
+    assert matched.pool(None) == ()
+
+
+def test_chunked_matched_pool() -> None:
+    buys = [Trade(1, 100 + i, i) for i in range(10)]
+    sells = [Trade(-1, 110, 10 + i) for i in range(10)]
+
+    unbounded = ChunkedMatchedPool(chunk_size=3)
+    last = ChunkedMatchedPool(max_matches=4, chunk_size=3)
+    since = ChunkedMatchedPool(since_key=15, chunk_size=3)
+    totals = ChunkedMatchedPool(max_matches=0)
+    expected = MatchedPool()
+    view = last.pool(None)
+    for buy, sell in zip(buys, sells):
+        for matched in (unbounded, last, since, totals, expected):
+            matched.append(Decimal(-1), buy, sell, None)
+
+    assert unbounded.pool(None) == expected.pool(None)
+    assert view == expected.pool(None)[-4:]
+    assert view[0] == expected.pool(None)[6]
+    assert view[-1] == expected.pool(None)[-1]
+    assert since.pool(None) == expected.pool(None)[5:]
+    assert len(totals) == 0
+    for matched in (unbounded, last, since, totals):
+        assert matched.count == 10
+        assert matched.quantity == 10
+
+
+def test_summarizing_matched_pool() -> None:
+    pnl_book = PnlBook(
+        PnlBookStore(),
+        lambda security, book, context: SummarizingMatchedPool(
+            security.contract_size
+        ),
+        lambda security, book, context: UnmatchedPool.Fifo()
+    )
+    apple = Security('AAPL', 10, False)
+    tech = Book('tech')
+
+    for trade in (
+        Trade(6, 100, 1),
+        Trade(6, 106, 2),
+        Trade(-9, 105, 3),
+        Trade(-5, 104, 4),
+    ):
+        pnl = pnl_book.add_trade(apple, tech, trade, None)
+
+    _, _, matched = pnl_book.get(apple, tech, None)
+    assert isinstance(matched, SummarizingMatchedPool)
+    assert len(matched) == 3
+    assert matched.realized == pnl.realized == 210
+    assert matched.opening(1) == MatchSummary(Decimal(6), Decimal(300), 1, 3, 3)
+    assert matched.opening(2) == MatchSummary(Decimal(6), Decimal(-90), 2, 3, 4)
+    assert matched.closing(3) == MatchSummary(Decimal(9), Decimal(270), 2, 1, 2)
+    assert matched.closing(4) == MatchSummary(Decimal(3), Decimal(-60), 1, 2, 2)
+    assert matched.opening(4) is None
+
+
+def test_summarizing_matched_pool_coalesced() -> None:
+    """Matches against a coalesced lot are spread over its trades"""
+    pnl_book = PnlBook(
+        PnlBookStore(),
+        lambda security, book, context: SummarizingMatchedPool(
+            security.contract_size
+        ),
+        lambda security, book, context: UnmatchedPool.Fifo(coalesce=True)
+    )
+    apple = Security('AAPL', 10, False)
+    tech = Book('tech')
+
+    for trade in (
+        Trade(2, 100, 1),
+        Trade(3, 100, 2),
+        Trade(-4, 105, 3),
+        Trade(-1, 106, 4),
+    ):
+        pnl = pnl_book.add_trade(apple, tech, trade, None)
+
+    _, _, matched = pnl_book.get(apple, tech, None)
+    assert isinstance(matched, SummarizingMatchedPool)
+    assert len(matched) == 3
+    assert matched.realized == pnl.realized == 260
+    assert matched.opening(1) == MatchSummary(Decimal(2), Decimal(100), 1, 3, 3)
+    assert matched.opening(2) == MatchSummary(Decimal(3), Decimal(160), 2, 3, 4)
+    assert matched.closing(3) == MatchSummary(Decimal(4), Decimal(200), 2, 1, 2)
+    assert matched.closing(4) == MatchSummary(Decimal(1), Decimal(60), 1, 2, 2)
+    assert SummarizingMatchedPool(
+        10,
+        matched.openings,
+        matched.closings
+    ) == matched
+
+    pnl_book.add_trade(apple, tech, Trade(1, 100), None)
+    with pytest.raises(ValueError):
+        pnl_book.add_trade(apple, tech, Trade(-1, 101), None)
+
+
+def test_spilling_pnl_book_store() -> None:
+    store = SpillingPnlBookStore(max_lots=8, shards=2)
+    pnl_book = PnlBook(
+        store,
+        lambda security, book, context: MatchedPool(),
+        lambda security, book, context: UnmatchedPool.Fifo()
+    )
+    expected_book = SimplePnlBook()
+    tech = Book('tech')
+    securities = [Security(f'SEC{i}', 1, False) for i in range(20)]
+
+    for round_ in range(3):
+        for i, security in enumerate(securities):
+            # Every fourth position is closed in the second round.
+            trade = (
+                Trade(-(round_ + 1), 101 + round_)
+                if round_ == 1 and i % 4 == 0
+                else Trade(1, 100 + i + round_)
+            )
+            pnl = pnl_book.add_trade(security, tech, trade, None)
+            expected = expected_book.add_trade(security, tech, trade, None)
+            assert pnl == expected
+
+    assert store.evictions > 0
+    assert store.weight <= 8
+    for security in securities:
+        assert store.has(security, tech, None)
+        assert store.get(security, tech, None) == expected_book.get(
+            security,
+            tech,
+            None
+        )
+    assert not store.has(Security('OTHER', 1, False), tech, None)
+    store.close()
+
+
+def test_count_lots_unsized() -> None:
+    """The lots of a pool without a length are not read to weigh it"""
+
+    class Unsized:
+        def pool(self, context):
+            raise AssertionError("the lots should not be read")
+
+    pnl = TradingPnl(Decimal(0), Decimal(0), Decimal(0))
+    matched = MatchedPool([(Decimal(-1), Trade(1, 100), Trade(-1, 101))])
+    assert count_lots(pnl, Unsized(), matched) == 2  # type: ignore
+    assert count_lots(pnl, UnmatchedPool.Fifo(), Unsized()) == 1  # type: ignore
+
+
+def test_spilling_pnl_book_store_file(tmp_path: Path) -> None:
+    """Spilled positions are committed, discarded by the next store, and
+    the store can be used from other threads"""
+
+    path = str(tmp_path / 'spill.db')
+    store = SpillingPnlBookStore(max_lots=2, shards=1, path=path)
+    pnl_book = PnlBook(
+        store,
+        lambda security, book, context: MatchedPool(),
+        lambda security, book, context: UnmatchedPool.Fifo()
+    )
+    tech = Book('tech')
+    securities = [Security(f'SEC{i}', 1, False) for i in range(8)]
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(
+            lambda security: pnl_book.add_trade(security, tech, Trade(1, 100), None),
+            securities
+        ))
+    assert store.resident == 1
+
+    with sqlite3.connect(path) as other:
+        spilled = other.execute('SELECT COUNT(*) FROM spilled_position').fetchone()
+    assert spilled == (7,)
+
+    def spilled_rows(security: Security) -> int:
+        with sqlite3.connect(path) as other:
+            return other.execute(
+                'SELECT COUNT(*) FROM spilled_position WHERE security_key = ?',
+                (security.key,)
+            ).fetchone()[0]
+
+    # A loaded position leaves the database, and is spilled first once flat.
+    first = securities[0]
+    pnl_book.add_trade(first, tech, Trade(-1, 101), None)
+    assert spilled_rows(first) == 0
+    pnl_book.add_trade(securities[1], tech, Trade(1, 100), None)
+    assert spilled_rows(first) == 1
+    assert spilled_rows(securities[1]) == 0
+    assert store.get(first, tech, None)[0] == (0, 0, 1)
+    store.close()
+
+    reopened = SpillingPnlBookStore(max_lots=2, shards=1, path=path)
+    assert not reopened.has(first, tech, None)
+    reopened.close()
@@ -0,0 +1,60 @@
+"""SQLite example"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+import sqlite3
+
+from jetblack_pnl.core import SplitTrade
+from jetblack_pnl.impl.sqlite3_v1 import (
+    register_handlers,
+    Trade,
+    Security,
+    Book,
+    TradeDb,
+    UnmatchedPool,
+)
+
+
+def test_sqlite3_v1_consume() -> None:
+    """A sweep of more lots than SQLite allows parameters is consumed"""
+    register_handlers()
+
+    with sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES) as con:
+        con.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 20)
+        trade_db = TradeDb(con)
+        trade_db.create_tables()
+
+        apple = Security.create(con, 'AAPL', Decimal(1), False)
+        tech = Book.create(con, 'tech')
+        retail = Book.create(con, 'retail')
+
+        ts = datetime(2000, 1, 1, 9, 0, 0, 0)
+        for i in range(30):
+            trade = Trade.create(con, ts, apple, tech, 1, 100 + i)
+            trade_db.add_trade(apple, tech, trade)
+            # Lots of another book are interleaved with those matched.
+            other = Trade.create(con, ts, apple, retail, 1, 100)
+            trade_db.add_trade(apple, retail, other)
+            ts += timedelta(seconds=1)
+
+        trade = Trade.create(con, ts, apple, tech, Decimal('-25.5'), 130)
+        pnl = trade_db.add_trade(apple, tech, trade)
+        assert pnl.quantity == Decimal('4.5')
+        assert pnl.realized == sum(130 - (100 + i) for i in range(25)) + Decimal('0.5') * 5
+
+        cur = con.cursor()
+        try:
+            unmatched = UnmatchedPool.Fifo(apple, tech)
+            assert sorted(
+                (opening.trade.price, opening.remaining_quantity)
+                for opening in unmatched.pool(cur)
+            ) == [(125, Decimal('0.5')), *((100 + i, 1) for i in range(26, 30))]
+
+            others = UnmatchedPool.Fifo(apple, retail).pool(cur)
+            assert len(others) == 30
+            assert all(
+                isinstance(opening, SplitTrade) and opening.remaining_quantity == 1
+                for opening in others
+            )
+        finally:
+            cur.close()
@@ -6,6 +6,8 @@ from decimal import Decimal
 import sqlite3
 from typing import Generator
 
+import pytest
+
 from jetblack_pnl.core import SplitTrade
 from jetblack_pnl.impl.sqlite3_v2 import (
     create_tables,
@@ -72,6 +74,15 @@ def test_sqlite3_v2() -> None:
         trade = Trade.create(con, ts, apple, tech, -9, 105)
         with cursor(con) as cur:
             pnl = pnl_book.add_trade(apple, tech, trade, cur)
+            _, unmatched, matched = pnl_book.get(apple, tech, cur)
+            assert sorted(
+                (opening.remaining_quantity, opening.trade.price)
+                for opening in unmatched.pool(cur)
+            ) == [(3, 106), (6, 103)]
+            assert sorted(
+                (quantity, opening.price, closing.price)
+                for quantity, opening, closing in matched.pool(cur)
+            ) == [(-6, 100, 105), (-3, 106, 105)]
         assert pnl == (9, -936, 27)
 
         # Sell 12 @ 107
@@ -87,3 +98,67 @@ def test_sqlite3_v2() -> None:
         with cursor(con) as cur:
             pnl = pnl_book.add_trade(apple, tech, trade, cur)
         assert pnl == (0, 0, 66)
+
+
+def test_sqlite3_v2_what_if_refused() -> None:
+    """A what-if evaluation must not write to the database"""
+    register_handlers()
+
+    with sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES) as con:
+        pnl_book = DbPnlBook()
+        create_tables(con.cursor())
+
+        apple = Security.create(con, 'AAPL', Decimal(1), False)
+        tech = Book.create(con, 'tech')
+        ts = datetime(2000, 1, 1, 9, 0, 0, 0)
+        for quantity, price in ((6, 100), (6, 106)):
+            trade = Trade.create(con, ts, apple, tech, quantity, price)
+            with cursor(con) as cur:
+                pnl_book.add_trade(apple, tech, trade, cur)
+            ts += timedelta(seconds=1)
+
+        def unmatched_rows() -> list:
+            return con.execute(
+                "SELECT * FROM unmatched_trade ORDER BY trade_id, valid_from"
+            ).fetchall()
+
+        rows = unmatched_rows()
+        hypothetical = Trade(999, ts, apple, tech, -9, 110)
+        with cursor(con) as cur:
+            with pytest.raises(TypeError):
+                pnl_book.what_if(apple, tech, [hypothetical], cur)
+        assert unmatched_rows() == rows
+
+
+def test_sqlite3_v2_consume() -> None:
+    """A sweep of more lots than SQLite allows parameters is consumed"""
+    register_handlers()
+
+    with sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES) as con:
+        con.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 20)
+        pnl_book = DbPnlBook()
+        create_tables(con.cursor())
+
+        apple = Security.create(con, 'AAPL', Decimal(1), False)
+        tech = Book.create(con, 'tech')
+        retail = Book.create(con, 'retail')
+        ts = datetime(2000, 1, 1, 9, 0, 0, 0)
+        for i in range(30):
+            with cursor(con) as cur:
+                trade = Trade.create(con, ts, apple, tech, 1, 100 + i)
+                pnl_book.add_trade(apple, tech, trade, cur)
+                other = Trade.create(con, ts, apple, retail, 1, 100)
+                pnl_book.add_trade(apple, retail, other, cur)
+            ts += timedelta(seconds=1)
+
+        trade = Trade.create(con, ts, apple, tech, -25, 130)
+        with cursor(con) as cur:
+            pnl = pnl_book.add_trade(apple, tech, trade, cur)
+            assert pnl.quantity == 5
+            assert pnl.realized == sum(130 - (100 + i) for i in range(25))
+            _, unmatched, _ = pnl_book.get(apple, tech, cur)
+            assert sorted(
+                opening.trade.price for opening in unmatched.pool(cur)
+            ) == [125, 126, 127, 128, 129]
+            _, others, _ = pnl_book.get(apple, retail, cur)
+            assert len(others.pool(cur)) == 30